@@ -0,0 +1,172 @@
+from html_parsers import get_backend
+from density_extractor import extract_by_density
+
+EXTRACTION_METHODS = ["density", "cascade"]
+
+# Containers tried, in order, for MSN articles
+MSN_SELECTORS = [
+    'div.articlecontent, div.mainarticle, div.contentid, div.primary-content',
+    'div[data-testid="article-body"], div[data-testid="content-canvas"]',
+    'article',
+    'div.article-body',
+]
+
+# Common article containers, tried in order for every other site
+CONTENT_SELECTORS = [
+    'article', '.article', '.post-content', '.story', 'main', '#content', '.content',
+    '.post', '.entry-content', '.article-content', '.article__content', '.article-body'
+]
+
+_backends = {}
+_default_backend = "auto"
+_default_method = "cascade"
+
+def configure_parser_backend(name="auto"):
+    """
+    Set the HTML parser backend used when none is passed to extract_article_text
+
+    Args:
+        name: Backend name accepted by html_parsers.get_backend
+    """
+    global _default_backend
+    get_backend(name)  # Fail early if the backend is not installed
+    _default_backend = name
+
+def configure_extraction_method(method="cascade"):
+    """
+    Set the extraction method used when none is passed to extract_article_text
+
+    Args:
+        method: "density" for the single-pass density scorer or "cascade" for the selector cascade
+    """
+    global _default_method
+    if method not in EXTRACTION_METHODS:
+        raise ValueError(f"Unknown extraction method '{method}'")
+    _default_method = method
+
+def _get_backend(name):
+    name = name or _default_backend
+    if name not in _backends:
+        _backends[name] = get_backend(name)
+    return _backends[name]
+
+def _paragraph_texts(backend, node):
+    # get_text is computed once per paragraph and reused by the filters below
+    return [backend.text(p, strip=True) for p in backend.select(node, 'p')]
+
+def _clean_lines(text):
+    return '\n\n'.join([' '.join(line.split()) for line in text.split('\n')
+                        if line.strip() and len(line.strip()) > 30])
+
+def extract_article_text(html, url, backend=None, method=None):
+    """
+    Extract the article text from the HTML of a page
+
+    Args:
+        html: HTML of the page
+        url: URL the HTML was downloaded from
+        backend: Parser backend name for the cascade, defaults to the configured backend
+        method: "density" or "cascade", defaults to the configured method
+
+    Returns:
+        Extracted text content
+    """
+    if (method or _default_method) == "density":
+        content = extract_by_density(html)
+        if len(content) >= 100:
+            return content
+        # Nothing substantial found; the selector cascade has more fallbacks for odd pages
+
+    return extract_with_selectors(html, url, backend)
+
+def extract_with_selectors(html, url, backend=None):
+    """
+    Extract the article text by trying known content selectors in turn
+
+    Args:
+        html: HTML of the page
+        url: URL the HTML was downloaded from
+        backend: Parser backend name, defaults to the configured backend
+
+    Returns:
+        Extracted text content
+    """
+    backend = _get_backend(backend)
+    document = backend.parse(html)
+
+    # Special handling for MSN URLs
+    if 'msn.com' in url:
+        print(f"Special handling for MSN URL: {url}")
+        # Find the main content container in MSN articles
+        article_body = None
+        for selector in MSN_SELECTORS:
+            article_body = backend.select_one(document, selector)
+            if article_body is not None:
+                break
+
+        if article_body is not None:
+            # Process only the article content
+            backend.remove(article_body, 'script, style, nav, aside')
+
+            # Extract paragraphs from the article body
+            paragraphs = _paragraph_texts(backend, article_body)
+            if paragraphs:
+                return "\n\n".join([text for text in paragraphs if text])
+
+    # Remove script, style, and nav elements for any site
+    backend.remove(document, 'script, style, nav, header, footer, aside, form')
+
+    # Try to find the article content using common selectors
+    article_content = None
+    for selector in CONTENT_SELECTORS:
+        for element in backend.select(document, selector):
+            # Only consider elements with substantial text
+            if len(backend.text(element, strip=True)) > 150:
+                article_content = element
+                break
+        if article_content is not None:
+            break
+
+    # If no article content found, try to find all paragraphs
+    if article_content is None:
+        paragraphs = _paragraph_texts(backend, document)
+        if paragraphs:
+            # Only include paragraphs with reasonable length
+            text_paragraphs = [text for text in paragraphs if len(text) > 30]
+            if text_paragraphs:
+                return "\n\n".join(text_paragraphs[:20])  # Limit to first 20 paragraphs
+
+    # Get text from article content if found
+    if article_content is not None:
+        # Extract all paragraphs
+        paragraphs = _paragraph_texts(backend, article_content)
+        if paragraphs:
+            return "\n\n".join([text for text in paragraphs if text])
+        # Fallback: get all text with paragraph structure
+        text = backend.text(article_content, separator='\n', strip=True)
+        # Clean up white spaces but preserve paragraph structure
+        return '\n\n'.join([' '.join(line.split()) for line in text.split('\n') if line.strip() and len(line) > 30])
+
+    # If no specific content found, use the whole body with cleaning
+    body_text = ""
+    body = backend.body(document)
+    if body is not None:
+        # Get all paragraphs in the body
+        paragraphs = _paragraph_texts(backend, body)
+        if paragraphs:
+            body_text = "\n\n".join([text for text in paragraphs if len(text) > 30])
+
+    # If we still don't have content, use the whole page text as a last resort
+    if not body_text:
+        body_text = _clean_lines(backend.text(document, separator='\n', strip=True))
+
+    # Check if we have meaningful content
+    if len(body_text) < 100 or len(body_text.split()) < 20:
+        print(f"Warning: Extracted content is suspiciously short for {url}")
+        # Try a different approach for very short content
+        all_text = backend.text(document, separator=' ', strip=True)
+        if len(all_text) > 200:
+            return all_text[:10000]  # Use raw text as a last resort
+
+    # Limit the content length
+    return body_text[:10000]
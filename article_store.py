@@ -0,0 +1,342 @@
+import os
+import json
+import sqlite3
+import datetime
+import threading
+from collections.abc import Mapping, MutableMapping
+from blob_store import BlobStore
+
+class ArticleStore(MutableMapping):
+    """
+    Article cache backed by SQLite in WAL mode.
+
+    Behaves like the dictionary returned by loading news_cache.json, but
+    entries are read by key on demand and every assignment is committed
+    immediately, so a crash mid-run keeps everything fetched so far.
+    Article bodies (full_content) live in a compressed BlobStore; the
+    database only keeps the small metadata of each entry.
+    """
+
+    def __init__(self, path, blob_dir=None):
+        """
+        Args:
+            path: Path of the SQLite database file, created if missing
+            blob_dir: Directory of the article bodies, defaults to <path without extension>_blobs
+        """
+        self.path = path
+        self.blobs = BlobStore(blob_dir or os.path.splitext(path)[0] + "_blobs")
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        with self._conn:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS articles ("
+                " key TEXT PRIMARY KEY,"
+                " data TEXT NOT NULL,"
+                " updated_at TEXT NOT NULL,"
+                " last_used_at TEXT,"
+                " content_hash TEXT,"
+                " alias_of TEXT,"
+                " blob TEXT,"
+                " body_size INTEGER)"
+            )
+            columns = [row[1] for row in self._conn.execute("PRAGMA table_info(articles)")]
+            for column, column_type in (("last_used_at", "TEXT"), ("content_hash", "TEXT"), ("alias_of", "TEXT"),
+                                        ("blob", "TEXT"), ("body_size", "INTEGER")):
+                if column not in columns:
+                    self._conn.execute(f"ALTER TABLE articles ADD COLUMN {column} {column_type}")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS articles_content_hash ON articles (content_hash)")
+        self._move_bodies_to_blobs()
+
+    def _move_bodies_to_blobs(self):
+        # Entries written before bodies moved out of the database have no blob column yet
+        with self._lock:
+            rows = self._conn.execute("SELECT key, data, updated_at FROM articles WHERE blob IS NULL").fetchall()
+        if not rows:
+            return
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "UPDATE articles SET data = ?2, updated_at = ?3, content_hash = ?4, alias_of = ?5, blob = ?6,"
+                " body_size = ?7 WHERE key = ?1",
+                [self._row(key, json.loads(data), updated_at) for key, data, updated_at in rows],
+            )
+        print(f"Moved {len(rows)} article bodies to {self.blobs.directory}")
+
+    def __getitem__(self, key):
+        with self._lock:
+            row = self._conn.execute("SELECT data, blob FROM articles WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            raise KeyError(key)
+        entry = json.loads(row[0])
+        if row[1]:
+            entry["full_content"] = self.blobs.get(row[1])
+        return entry
+
+    def _row(self, key, entry, now):
+        metadata = {name: value for name, value in entry.items() if name != "full_content"}
+        body = entry.get("full_content") or ""
+        if body:
+            blob = self.blobs.put(body)
+        else:
+            # Keep the (empty) field so entries read back exactly as they were written
+            blob = ""
+            if "full_content" in entry:
+                metadata["full_content"] = ""
+        return (key, json.dumps(metadata, ensure_ascii=False), now, entry.get("content_hash"),
+                entry.get("alias_of"), blob, len(body.encode('utf-8')))
+
+    def metadata(self, key):
+        """
+        Read an entry without its body
+        
+        Args:
+            key: Cache key
+            
+        Returns:
+            Entry dictionary where "blob" and "body_size" stand in for full_content
+            
+        Raises:
+            KeyError: If there is no entry with that key
+        """
+        with self._lock:
+            row = self._conn.execute("SELECT data, blob, body_size FROM articles WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            raise KeyError(key)
+        entry = json.loads(row[0])
+        if row[1]:
+            entry["blob"] = row[1]
+            entry["body_size"] = row[2]
+        return entry
+
+    @property
+    def index(self):
+        """
+        Read-only mapping of keys to entries without bodies, see metadata
+        """
+        return MetadataView(self)
+
+    def read_body(self, blob):
+        """
+        Read the body an entry's metadata refers to
+        
+        Args:
+            blob: Value of the "blob" field returned by metadata
+            
+        Returns:
+            Article text
+        """
+        return self.blobs.get(blob)
+
+    def __setitem__(self, key, entry):
+        now = datetime.datetime.now(datetime.timezone.utc).isoformat(timespec='seconds')
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO articles (key, data, updated_at, content_hash, alias_of, blob, body_size)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                self._row(key, entry, now),
+            )
+
+    def __delitem__(self, key):
+        with self._lock, self._conn:
+            cursor = self._conn.execute("DELETE FROM articles WHERE key = ?", (key,))
+        if cursor.rowcount == 0:
+            raise KeyError(key)
+
+    def __contains__(self, key):
+        with self._lock:
+            return self._conn.execute("SELECT 1 FROM articles WHERE key = ?", (key,)).fetchone() is not None
+
+    def __iter__(self):
+        with self._lock:
+            keys = [row[0] for row in self._conn.execute("SELECT key FROM articles ORDER BY rowid")]
+        return iter(keys)
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM articles").fetchone()[0]
+
+    def update_many(self, entries):
+        """
+        Insert or replace many entries in a single transaction
+
+        Args:
+            entries: Dictionary mapping cache keys to article dictionaries
+        """
+        now = datetime.datetime.now(datetime.timezone.utc).isoformat(timespec='seconds')
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO articles (key, data, updated_at, content_hash, alias_of, blob, body_size)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                [self._row(key, entry, now) for key, entry in entries.items()],
+            )
+
+    def replace_all(self, entries):
+        """
+        Replace every entry with the given ones in a single transaction, so a
+        crash or a failed body write leaves the old entries in place
+
+        Args:
+            entries: Dictionary mapping cache keys to article dictionaries
+        """
+        now = datetime.datetime.now(datetime.timezone.utc).isoformat(timespec='seconds')
+        # Bodies are written before the transaction; unused ones are removed by retention
+        rows = [self._row(key, entry, now) for key, entry in entries.items()]
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM articles")
+            self._conn.executemany(
+                "INSERT INTO articles (key, data, updated_at, content_hash, alias_of, blob, body_size)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+
+    def migrate_from_json(self, json_file):
+        """
+        Import every entry of a news_cache.json file
+
+        Args:
+            json_file: Path to the JSON cache file
+
+        Returns:
+            Number of imported entries
+        """
+        with open(json_file, 'r', encoding='utf-8') as f:
+            entries = json.load(f)
+        self.update_many(entries)
+        return len(entries)
+
+    @property
+    def format_version(self):
+        """
+        Version of the key scheme the entries were written with
+        """
+        with self._lock:
+            return self._conn.execute("PRAGMA user_version").fetchone()[0]
+
+    @format_version.setter
+    def format_version(self, version):
+        with self._lock, self._conn:
+            self._conn.execute(f"PRAGMA user_version = {int(version)}")
+
+    def find_by_content_hash(self, digest, exclude_key=None):
+        """
+        Find an entry holding content with the given hash
+        
+        Args:
+            digest: Content hash to look up
+            exclude_key: Key to ignore, usually the entry being stored
+            
+        Returns:
+            Key of a non-alias entry with that content, or None
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT key FROM articles WHERE content_hash = ? AND alias_of IS NULL AND key != ? LIMIT 1",
+                (digest, exclude_key or ""),
+            ).fetchone()
+        return row[0] if row else None
+
+    def alias_targets(self, keys):
+        """
+        Get the entries that aliases among the given keys point to
+        
+        Args:
+            keys: Cache keys to look up
+            
+        Returns:
+            Set of target keys
+        """
+        with self._lock:
+            targets = set()
+            for key in keys:
+                row = self._conn.execute("SELECT alias_of FROM articles WHERE key = ?", (key,)).fetchone()
+                if row and row[0]:
+                    targets.add(row[0])
+            return targets
+
+    def touch(self, keys):
+        """
+        Record that entries are still referenced by the current news items
+
+        Args:
+            keys: Cache keys to mark as used now
+        """
+        now = datetime.datetime.now(datetime.timezone.utc).isoformat(timespec='seconds')
+        with self._lock, self._conn:
+            self._conn.executemany("UPDATE articles SET last_used_at = ? WHERE key = ?",
+                                   [(now, key) for key in keys])
+
+    def entry_stats(self):
+        """
+        Get the size and last use of every entry without decoding them
+
+        Returns:
+            List of (key, size in bytes, last used ISO timestamp) tuples
+        """
+        with self._lock:
+            return self._conn.execute(
+                "SELECT key, LENGTH(CAST(data AS BLOB)) + COALESCE(body_size, 0), COALESCE(last_used_at, updated_at)"
+                " FROM articles"
+            ).fetchall()
+
+    def delete_many(self, keys):
+        """
+        Delete entries in a single transaction
+
+        Args:
+            keys: Cache keys to delete
+        """
+        with self._lock, self._conn:
+            self._conn.executemany("DELETE FROM articles WHERE key = ?", [(key,) for key in keys])
+
+    def remove_orphan_blobs(self):
+        """
+        Delete the bodies no entry refers to any more
+        
+        Returns:
+            (number of removed blobs, bytes freed)
+        """
+        with self._lock:
+            referenced = {row[0] for row in self._conn.execute("SELECT DISTINCT blob FROM articles WHERE blob != ''")}
+        return self.blobs.remove_unreferenced(referenced)
+
+    def vacuum(self):
+        """
+        Rewrite the database file so space freed by deleted entries is returned
+        """
+        with self._lock:
+            self._conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+            self._conn.execute("VACUUM")
+            # VACUUM goes through the write-ahead log too; fold it back in
+            self._conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+
+    def close(self):
+        """
+        Fold the write-ahead log into the database file and close the connection
+        """
+        with self._lock:
+            self._conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+            self._conn.close()
+
+class MetadataView(Mapping):
+    """
+    Mapping view of an ArticleStore that never reads article bodies.
+
+    Lookups cost one indexed query each, so scanning the current news items
+    takes time proportional to their number, not to the size of the cache.
+    """
+
+    def __init__(self, store):
+        self._store = store
+
+    def __getitem__(self, key):
+        return self._store.metadata(key)
+
+    def __contains__(self, key):
+        return key in self._store
+
+    def __iter__(self):
+        return iter(self._store)
+
+    def __len__(self):
+        return len(self._store)
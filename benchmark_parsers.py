@@ -0,0 +1,212 @@
+#!/usr/bin/env python3
+"""
+Benchmark the HTML parser backends used for article extraction.
+
+Runs the selector cascade of extract_article_text, the extraction method
+that goes through the parser backend, with every installed backend over a
+corpus of article pages, reporting throughput and how closely each
+backend's output matches the reference html.parser backend.
+
+The committed extraction_corpus directory is the fixed corpus. Its
+index.json records the URL and SHA-256 of every page, and a corpus whose
+pages do not match their hashes is refused, so results are always
+comparable between runs and machines.
+
+Usage:
+    python benchmark_parsers.py               # benchmark the fixed corpus
+    python benchmark_parsers.py --save        # download the pages in aggregated-news.csv
+                                              # into benchmark_corpus
+    python benchmark_parsers.py --corpus benchmark_corpus
+"""
+
+import os
+import io
+import sys
+import json
+import time
+import hashlib
+import argparse
+import contextlib
+from difflib import SequenceMatcher
+from article_extractor import extract_article_text
+from html_parsers import available_backends
+
+REFERENCE_BACKEND = "html.parser"
+DEFAULT_CORPUS_DIR = "extraction_corpus"
+# Pages of the current news items; not committed, as they change with the news
+LIVE_CORPUS_DIR = "benchmark_corpus"
+
+class CorpusMismatchError(Exception):
+    """
+    Raised when a corpus page is missing or differs from its recorded hash
+    """
+
+def page_hash(data):
+    """
+    SHA-256 hex digest of a saved page's bytes
+    """
+    return hashlib.sha256(data).hexdigest()
+
+def load_corpus(corpus_dir=DEFAULT_CORPUS_DIR):
+    """
+    Load the saved article pages, checking each against its recorded hash
+
+    Args:
+        corpus_dir: Directory containing index.json and the saved .html files
+
+    Returns:
+        List of (url, html) tuples
+
+    Raises:
+        CorpusMismatchError: If a page is missing, has no recorded hash, or
+            differs from it
+    """
+    index_file = os.path.join(corpus_dir, "index.json")
+    if not os.path.exists(index_file):
+        return []
+    with open(index_file, 'r', encoding='utf-8') as f:
+        index = json.load(f)
+    pages = []
+    for file_name, entry in sorted(index.items()):
+        if not isinstance(entry, dict) or not entry.get("sha256"):
+            raise CorpusMismatchError(f"{file_name} in {corpus_dir} has no recorded hash; save the corpus again")
+        path = os.path.join(corpus_dir, file_name)
+        if not os.path.exists(path):
+            raise CorpusMismatchError(f"{file_name} is missing from {corpus_dir}")
+        with open(path, 'rb') as f:
+            data = f.read()
+        if page_hash(data) != entry["sha256"]:
+            raise CorpusMismatchError(f"{file_name} in {corpus_dir} does not match its recorded hash")
+        pages.append((entry["url"], data.decode('utf-8')))
+    return pages
+
+def save_corpus(csv_file="aggregated-news.csv", corpus_dir=LIVE_CORPUS_DIR):
+    """
+    Download the pages of the current news items into the corpus directory
+
+    Args:
+        csv_file: CSV file listing the news items
+        corpus_dir: Directory to save the pages to
+    """
+    from data_loader import load_news_items
+    from web_utils import download_page, close_sessions
+
+    os.makedirs(corpus_dir, exist_ok=True)
+    index_file = os.path.join(corpus_dir, "index.json")
+    index = {}
+    if os.path.exists(index_file):
+        with open(index_file, 'r', encoding='utf-8') as f:
+            index = json.load(f)
+    known_urls = {entry["url"] for entry in index.values() if isinstance(entry, dict)}
+
+    try:
+        for item in load_news_items(csv_file):
+            url = item.get("url") or ""
+            if not url.startswith("http") or url in known_urls:
+                continue
+            try:
+                page = download_page(url)
+            except Exception as e:
+                print(f"Skipping {url}: {e}")
+                continue
+            file_name = hashlib.sha1(url.encode('utf-8')).hexdigest()[:16] + ".html"
+            data = page["html"].encode('utf-8')
+            with open(os.path.join(corpus_dir, file_name), 'wb') as f:
+                f.write(data)
+            index[file_name] = {"url": url, "sha256": page_hash(data)}
+            known_urls.add(url)
+            print(f"Saved {url}")
+    finally:
+        close_sessions()
+
+    with open(index_file, 'w', encoding='utf-8') as f:
+        json.dump(index, f, indent=2, sort_keys=True)
+    print(f"Corpus has {len(index)} pages")
+
+def run_backend(backend, pages, repeat=1):
+    """
+    Extract every page with one backend through the selector cascade
+
+    Args:
+        backend: Parser backend name
+        pages: List of (url, html) tuples
+        repeat: Number of passes over the corpus to time
+
+    Returns:
+        (seconds per pass, list of extracted texts)
+    """
+    outputs = []
+    # The extractor prints warnings for short pages; keep the report readable
+    with contextlib.redirect_stdout(io.StringIO()):
+        start = time.perf_counter()
+        for _ in range(repeat):
+            # The density extractor never uses the backend, so always time the cascade
+            outputs = [extract_article_text(html, url, backend=backend, method="cascade") for url, html in pages]
+        elapsed = time.perf_counter() - start
+    return elapsed / repeat, outputs
+
+def similarity(a, b):
+    """
+    Word-level similarity between two extracted texts, from 0 to 1
+    """
+    if a == b:
+        return 1.0
+    return SequenceMatcher(None, a.split(), b.split(), autojunk=False).ratio()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark HTML parser backends for article extraction")
+    parser.add_argument("--corpus", default=None,
+                        help=f"Directory of saved article pages (default: {DEFAULT_CORPUS_DIR}, "
+                             f"or {LIVE_CORPUS_DIR} with --save)")
+    parser.add_argument("--save", action="store_true", help="Download the pages in aggregated-news.csv first")
+    parser.add_argument("--repeat", type=int, default=3, help="Number of timed passes per backend")
+    parser.add_argument("--backends", nargs="+", default=None, help="Backends to compare (default: all installed)")
+    parser.add_argument("--min-similarity", type=float, default=0.95,
+                        help="Fail if a backend's mean similarity to html.parser is below this")
+    args = parser.parse_args(argv)
+
+    corpus_dir = args.corpus or (LIVE_CORPUS_DIR if args.save else DEFAULT_CORPUS_DIR)
+    if args.save:
+        if os.path.abspath(corpus_dir) == os.path.abspath(DEFAULT_CORPUS_DIR):
+            print(f"{DEFAULT_CORPUS_DIR} is the fixed corpus; save live pages to another directory")
+            return 1
+        save_corpus(corpus_dir=corpus_dir)
+
+    try:
+        pages = load_corpus(corpus_dir)
+    except CorpusMismatchError as e:
+        print(f"Refusing to benchmark: {e}")
+        return 1
+    if not pages:
+        print(f"No pages in {corpus_dir}; run with --save first")
+        return 1
+
+    backends = args.backends or available_backends()
+    if REFERENCE_BACKEND not in backends:
+        backends.append(REFERENCE_BACKEND)
+    total_mb = sum(len(html.encode('utf-8')) for _, html in pages) / (1024 * 1024)
+
+    results = {backend: run_backend(backend, pages, args.repeat) for backend in backends}
+    _, reference = results[REFERENCE_BACKEND]
+
+    print(f"{len(pages)} pages, {total_mb:.1f} MB, {args.repeat} passes")
+    print(f"{'backend':<12} {'pages/s':>9} {'MB/s':>7} {'speedup':>8} {'identical':>10} {'similarity':>11}")
+    reference_time = results[REFERENCE_BACKEND][0]
+    failed = False
+    for backend in backends:
+        elapsed, outputs = results[backend]
+        scores = [similarity(ref, out) for ref, out in zip(reference, outputs)]
+        identical = sum(1 for ref, out in zip(reference, outputs) if ref == out)
+        mean_similarity = sum(scores) / len(scores)
+        print(f"{backend:<12} {len(pages) / elapsed:>9.1f} {total_mb / elapsed:>7.2f} "
+              f"{reference_time / elapsed:>7.1f}x {identical:>5}/{len(pages):<4} {mean_similarity:>11.3f}")
+        for (url, _), score in zip(pages, scores):
+            if score < args.min_similarity:
+                print(f"    {backend} differs on {url} (similarity {score:.3f})")
+        if mean_similarity < args.min_similarity:
+            failed = True
+
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,144 @@
+import os
+import gzip
+import hashlib
+from file_utils import atomic_write
+
+# Blobs are committed to git and read on machines without optional packages, so
+# they are always written with gzip; .zst blobs from earlier runs stay readable
+# where the zstandard package is installed
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+BLOB_EXTENSION = ".gz"
+BLOB_EXTENSIONS = (".gz", ".zst")
+
+def _compress(data):
+    # A fixed mtime keeps the file identical for identical content
+    return gzip.compress(data, compresslevel=9, mtime=0)
+
+def _decompress(data, extension):
+    if extension == ".zst":
+        if zstandard is None:
+            raise RuntimeError("The zstandard package is needed to read .zst blobs")
+        return zstandard.ZstdDecompressor().decompress(data)
+    return gzip.decompress(data)
+
+class BlobStore:
+    """
+    Content-addressed store of compressed article bodies.
+
+    Each body is written once to <directory>/<2 hex chars>/<sha256>.gz and
+    never modified, so identical articles share a file and a git history
+    only ever gains files instead of rewriting one.
+    """
+
+    def __init__(self, directory):
+        """
+        Args:
+            directory: Directory holding the blobs, created on first write
+        """
+        self.directory = directory
+
+    def _path(self, digest, extension):
+        return os.path.join(self.directory, digest[:2], digest + extension)
+
+    def _find(self, digest):
+        for extension in BLOB_EXTENSIONS:
+            path = self._path(digest, extension)
+            if os.path.exists(path):
+                return path, extension
+        return None, None
+
+    def __contains__(self, digest):
+        return self._find(digest)[0] is not None
+
+    def put(self, text):
+        """
+        Store a body unless identical content is already stored
+
+        Args:
+            text: Article text
+
+        Returns:
+            Hex SHA-256 digest of the text, which identifies the blob
+        """
+        data = text.encode('utf-8')
+        digest = hashlib.sha256(data).hexdigest()
+        existing, extension = self._find(digest)
+        if existing and extension == BLOB_EXTENSION:
+            return digest
+        path = self._path(digest, BLOB_EXTENSION)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Written through a temporary file so a crash never leaves a truncated blob
+        with atomic_write(path, 'wb') as f:
+            f.write(_compress(data))
+        if existing:
+            # Replaces a .zst copy that machines without zstandard can't read
+            os.unlink(existing)
+        return digest
+
+    def get(self, digest):
+        """
+        Read and decompress a body
+
+        Args:
+            digest: Digest returned by put
+
+        Returns:
+            Article text
+
+        Raises:
+            KeyError: If no blob with that digest exists
+        """
+        path, extension = self._find(digest)
+        if path is None:
+            raise KeyError(digest)
+        with open(path, 'rb') as f:
+            return _decompress(f.read(), extension).decode('utf-8')
+
+    def blobs(self):
+        """
+        List the stored blobs
+
+        Returns:
+            List of (digest, path) tuples
+        """
+        found = []
+        if not os.path.isdir(self.directory):
+            return found
+        for prefix in os.listdir(self.directory):
+            prefix_dir = os.path.join(self.directory, prefix)
+            if not os.path.isdir(prefix_dir):
+                continue
+            for name in os.listdir(prefix_dir):
+                digest, extension = os.path.splitext(name)
+                if extension in BLOB_EXTENSIONS:
+                    found.append((digest, os.path.join(prefix_dir, name)))
+        return found
+
+    def total_bytes(self):
+        """
+        Get the size of all stored blobs on disk
+        """
+        return sum(os.path.getsize(path) for _, path in self.blobs())
+
+    def remove_unreferenced(self, referenced):
+        """
+        Delete blobs no entry points to any more
+
+        Args:
+            referenced: Set of digests that are still in use
+
+        Returns:
+            (number of removed blobs, bytes freed)
+        """
+        removed = 0
+        freed = 0
+        for digest, path in self.blobs():
+            if digest not in referenced:
+                freed += os.path.getsize(path)
+                os.unlink(path)
+                removed += 1
+        return removed, freed
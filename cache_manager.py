@@ -1,109 +1,726 @@
 import json
 import os
-import time
-import random
+import hashlib
+import datetime
+from article_store import ArticleStore
+from urllib.parse import urlsplit, parse_qsl
+from canonical_urls import canonicalize_url
+from telemetry import get_telemetry
+from web_utils import get_host, DeadlineExceeded
+from rate_limiter import CircuitOpenError, RateLimitedError
+from fetch_engine import (fetch_all, fetch_and_extract_all, FetchDeferred, DEFAULT_MAX_WORKERS,
+                          DEFAULT_PARSE_WORKERS, DEFAULT_POLITE_DELAY)
 
-def load_cache(cache_file="news_cache.json"):
+DEFAULT_CACHE_FILE = "news_cache.sqlite3"
+LEGACY_CACHE_FILE = "news_cache.json"
+
+# Version of the cache layout: 1 keys articles by canonical URL instead of url_title,
+# 2 also drops stored bodies that only hold an extraction error, 3 drops aliases to
+# bodies another article stored under a shared rel=canonical URL, 4 keeps generic
+# query parameters such as ref and src in the key
+CACHE_KEY_VERSION = 4
+
+# Failed articles are retried after 1, 2, 4, ... days, but at least once a month
+DEFAULT_RETRY_BASE_HOURS = 24
+MAX_RETRY_DAYS = 30
+
+# Fetch errors that only skip an article for this run, e.g. a host given up on after
+# repeated 403s; the article is deferred to the next run instead of recorded as failed
+DEFERRING_ERRORS = (FetchDeferred, DeadlineExceeded, CircuitOpenError, RateLimitedError)
+
+def load_cache(cache_file=DEFAULT_CACHE_FILE, legacy_cache_file=LEGACY_CACHE_FILE):
     """
-    Load the article content cache from a JSON file
+    Load the article content cache
+    
+    A .json path is read into a dictionary as before. Any other path is opened
+    as an SQLite ArticleStore that reads entries on demand and commits every
+    update immediately; a new store is first filled from the legacy JSON cache.
     
     Args:
         cache_file: Path to the cache file
+        legacy_cache_file: JSON cache migrated into a newly created store
         
     Returns:
-        Dictionary containing cached article content
+        Dictionary or ArticleStore containing cached article content
     """
-    cached_news_data = {}
-    if os.path.exists(cache_file):
+    if cache_file.endswith(".json"):
+        cached_news_data = {}
+        if os.path.exists(cache_file):
+            try:
+                with open(cache_file, 'r', encoding='utf-8') as f:
+                    cached_news_data = json.load(f)
+                print(f"Loaded {len(cached_news_data)} cached articles")
+            except Exception as e:
+                print(f"Error loading cache: {e}")
+        migrate_cache_keys(cached_news_data)
+        return cached_news_data
+    
+    store = ArticleStore(cache_file)
+    if len(store) == 0 and legacy_cache_file and os.path.exists(legacy_cache_file):
         try:
-            with open(cache_file, 'r', encoding='utf-8') as f:
-                cached_news_data = json.load(f)
-            print(f"Loaded {len(cached_news_data)} cached articles")
+            migrated = store.migrate_from_json(legacy_cache_file)
+            print(f"Migrated {migrated} cached articles from {legacy_cache_file} to {cache_file}")
         except Exception as e:
-            print(f"Error loading cache: {e}")
-    return cached_news_data
+            print(f"Error migrating cache: {e}")
+    if store.format_version < CACHE_KEY_VERSION:
+        if store.format_version < 2:
+            migrate_cache_keys(store)
+        if store.format_version < 3:
+            drop_shared_canonical_aliases(store)
+        rekey_kept_query_params(store)
+        store.format_version = CACHE_KEY_VERSION
+    print(f"Opened cache {cache_file} with {len(store)} articles")
+    return store
 
-def save_cache(cached_news_data, cache_file="news_cache.json"):
+def save_cache(cached_news_data, cache_file=DEFAULT_CACHE_FILE):
     """
-    Save the article content cache to a JSON file
+    Save the article content cache
+    
+    An ArticleStore already holds every update, so it is only checkpointed
+    and closed; a dictionary is written to a JSON file.
     
     Args:
-        cached_news_data: Dictionary containing article content to cache
-        cache_file: Path to the cache file
+        cached_news_data: Dictionary or ArticleStore containing article content to cache
+        cache_file: Path to the JSON cache file when saving a dictionary
     """
     try:
+        if isinstance(cached_news_data, ArticleStore):
+            count = len(cached_news_data)
+            cached_news_data.close()
+            print(f"Saved {count} articles to cache")
+            return
         with open(cache_file, 'w', encoding='utf-8') as f:
             json.dump(cached_news_data, f, ensure_ascii=False, indent=2)
         print(f"Saved {len(cached_news_data)} articles to cache")
     except Exception as e:
         print(f"Error saving cache: {e}")
 
-def prepare_news_data(news_items, cached_news_data, fetch_url_content):
+def cache_key_for(item):
+    """
+    Get the cache key of a news item
+    
+    Articles are keyed by canonical URL, so a retitled story or a link with
+    different tracking parameters still hits the cache. Items without a web
+    URL fall back to the URL and title.
+    
+    Args:
+        item: NewsItem or article dictionary with url and title
+        
+    Returns:
+        Cache key string
+    """
+    url = str(item.get('url', '#'))
+    if url.startswith("http"):
+        return canonicalize_url(url)
+    return f"{url}_{item.get('title', 'No title')}"
+
+def alias_entry(target_key, article_data):
+    """
+    Build a cache entry that shares the stored body of another entry
+    
+    Args:
+        target_key: Cache key of the entry holding the body
+        article_data: Article dictionary the alias is stored for
+        
+    Returns:
+        Cache entry dictionary
+    """
+    return {
+        "alias_of": target_key,
+        "url": article_data["url"],
+        "title": article_data["title"],
+        "checked_at": _utc_now().isoformat(timespec='seconds'),
+    }
+
+def resolve_cache_entry(cached_news_data, cache_key, max_hops=3):
+    """
+    Look up a cache entry, following aliases to the entry holding the body
+    
+    Args:
+        cached_news_data: Dictionary or ArticleStore of cached article content
+        cache_key: Cache key of the article
+        max_hops: Maximum number of aliases followed
+        
+    Returns:
+        (key, entry) tuple; entry is None if there is no usable entry, in which
+        case key is the cache key the article should be stored under
+    """
+    key = cache_key
+    entry = cached_news_data.get(key)
+    for _ in range(max_hops):
+        if entry is None or not entry.get("alias_of"):
+            break
+        key = entry["alias_of"]
+        entry = cached_news_data.get(key)
+    if entry is None or entry.get("alias_of"):
+        # Dangling alias, e.g. the target was evicted: store the article afresh
+        return cache_key, None
+    return key, entry
+
+def find_duplicate(cached_news_data, digest, exclude_key=None):
+    """
+    Find a stored body with the given content hash
+    
+    Args:
+        cached_news_data: Dictionary or ArticleStore of cached article content
+        digest: Content hash of the article text
+        exclude_key: Key to ignore, usually the entry being stored
+        
+    Returns:
+        Key of the entry holding identical content, or None
+    """
+    if isinstance(cached_news_data, ArticleStore):
+        return cached_news_data.find_by_content_hash(digest, exclude_key)
+    for key, entry in cached_news_data.items():
+        if key != exclude_key and not entry.get("alias_of") and entry.get("content_hash") == digest:
+            return key
+    return None
+
+def migrate_cache_keys(cached_news_data):
+    """
+    Re-key entries stored under url_title keys by canonical URL
+    
+    Entries that end up with the same key keep the one with content, and
+    entries with identical content become aliases of the first one. Bodies
+    that only hold an extraction error are dropped, so every stored body is
+    usable content.
+    
+    Args:
+        cached_news_data: Dictionary or ArticleStore of cached article content
+        
+    Returns:
+        Number of entries that were re-keyed, merged or turned into aliases
+    """
+    rekeyed = {}
+    changed = 0
+    for key in list(cached_news_data):
+        entry = cached_news_data[key]
+        new_key = key if entry.get("alias_of") else cache_key_for(entry)
+        if entry.get("full_content", "").startswith("Content extraction failed"):
+            entry["full_content"] = ""
+            entry.pop("content_hash", None)
+            changed += 1
+        elif entry.get("full_content") and not entry.get("content_hash"):
+            entry["content_hash"] = content_hash(entry["full_content"])
+            changed += 1
+        elif new_key != key:
+            changed += 1
+        previous = rekeyed.get(new_key)
+        if previous is None or (entry.get("full_content") and not previous.get("full_content")):
+            rekeyed[new_key] = entry
+    
+    bodies = {}
+    for key, entry in rekeyed.items():
+        digest = entry.get("content_hash")
+        if digest in bodies:
+            rekeyed[key] = alias_entry(bodies[digest], entry)
+            changed += 1
+        elif digest:
+            bodies[digest] = key
+    
+    if not changed:
+        return 0
+    if isinstance(cached_news_data, ArticleStore):
+        cached_news_data.replace_all(rekeyed)
+    else:
+        cached_news_data.clear()
+        cached_news_data.update(rekeyed)
+    print(f"Re-keyed the cache by canonical URL: {len(rekeyed)} entries, {len(bodies)} distinct articles")
+    return changed
+
+def drop_shared_canonical_aliases(store):
+    """
+    Drop aliases whose body was stored under a rel=canonical URL by another article
+    
+    Before store_article checked the canonical entry, an article naming the
+    same canonical URL as another one, e.g. a section page, replaced that
+    article's body, and the first article's alias has served the wrong text
+    since. The entries can't tell an overwritten body from one both pages
+    share, so all such aliases are dropped and their articles fetched again.
+    
+    Args:
+        store: ArticleStore
+        
+    Returns:
+        Number of dropped aliases
+    """
+    index = store.index
+    dropped = []
+    for key in index:
+        entry = index[key]
+        target = entry.get("alias_of")
+        if not target or target not in index:
+            continue
+        target_entry = index[target]
+        # A body stored under a canonical URL keeps the URL of the article it was fetched for
+        fetched_for = cache_key_for(target_entry) if target_entry.get("url") else target
+        if fetched_for not in (target, key):
+            dropped.append(key)
+    store.delete_many(dropped)
+    if dropped:
+        print(f"Dropped {len(dropped)} cache aliases to bodies stored under a shared canonical URL")
+    return len(dropped)
+
+def rekey_kept_query_params(store):
+    """
+    Move entries keyed by their own URL to the key it has now that fewer query
+    parameters count as tracking
+    
+    An entry is moved when its URL's canonical form only adds query parameters
+    to the entry's key; bodies stored under another page's rel=canonical URL
+    keep their key. Aliases follow their moved targets.
+    
+    Args:
+        store: ArticleStore
+        
+    Returns:
+        Number of moved entries
+    """
+    index = store.index
+    moves = {}
+    for key in index:
+        url = index[key].get("url") or ""
+        if not url.startswith("http"):
+            continue
+        new_key = canonicalize_url(url)
+        if new_key == key or new_key in index or new_key in moves.values():
+            continue
+        old_parts, new_parts = urlsplit(key), urlsplit(new_key)
+        if (old_parts.netloc, old_parts.path) == (new_parts.netloc, new_parts.path) and \
+                set(parse_qsl(old_parts.query, keep_blank_values=True)) <= \
+                set(parse_qsl(new_parts.query, keep_blank_values=True)):
+            moves[key] = new_key
+    if not moves:
+        return 0
+    
+    rekeyed = {}
+    for key in list(store):
+        entry = store[key]
+        if entry.get("alias_of") in moves:
+            entry["alias_of"] = moves[entry["alias_of"]]
+        rekeyed[moves.get(key, key)] = entry
+    store.replace_all(rekeyed)
+    print(f"Re-keyed {len(moves)} cached articles whose URLs have query parameters no longer stripped")
+    return len(moves)
+
+def content_hash(content):
+    """
+    Compute the hash used to detect whether article content changed
+    
+    Args:
+        content: Article text
+        
+    Returns:
+        Hex SHA-256 digest of the content
+    """
+    return hashlib.sha256(content.encode('utf-8')).hexdigest()
+
+def needs_revalidation(cache_entry, revalidate_days):
+    """
+    Check whether a cached article is due for a freshness check
+    
+    Args:
+        cache_entry: Cached article dictionary
+        revalidate_days: Days after which cached content is revalidated, or None to never revalidate
+        
+    Returns:
+        True if the entry should be revalidated with a conditional request
+    """
+    if revalidate_days is None:
+        return False
+    checked_at = cache_entry.get("checked_at")
+    if not checked_at:
+        return True
+    try:
+        checked = datetime.datetime.fromisoformat(checked_at)
+    except ValueError:
+        return True
+    return _utc_now() - checked >= datetime.timedelta(days=revalidate_days)
+
+def _utc_now():
+    return datetime.datetime.now(datetime.timezone.utc)
+
+def retry_delay(failure_count, retry_base_hours=DEFAULT_RETRY_BASE_HOURS):
+    """
+    Get how long to wait before retrying an article that keeps failing
+    
+    Args:
+        failure_count: Number of failed attempts so far
+        retry_base_hours: Wait after the first failure; it doubles with every further failure
+        
+    Returns:
+        datetime.timedelta to wait, capped at MAX_RETRY_DAYS
+    """
+    hours = retry_base_hours * (2 ** max(0, failure_count - 1))
+    return min(datetime.timedelta(hours=hours), datetime.timedelta(days=MAX_RETRY_DAYS))
+
+def is_retry_due(cache_entry):
+    """
+    Check whether a failed article may be fetched again
+    
+    Args:
+        cache_entry: Cached failure entry with a next_retry_at timestamp
+        
+    Returns:
+        True if the retry time has passed or is unknown
+    """
+    next_retry_at = cache_entry.get("next_retry_at")
+    if not next_retry_at:
+        return True
+    try:
+        return _utc_now() >= datetime.datetime.fromisoformat(next_retry_at)
+    except ValueError:
+        return True
+
+def mark_failed(article_data, status, error=None):
+    """
+    Set the status and fallback content of an article whose extraction failed
+    
+    Args:
+        article_data: Article dictionary to update
+        status: "error" or "content_too_short"
+        error: Error message for "error" articles
+    """
+    article_data["extraction_status"] = status
+    if status == "error":
+        article_data["full_content"] = f"Error extracting content: {error}"
+    else:
+        article_data["full_content"] = f"Note: Content could not be properly extracted from this source. Using summary instead.\n\n{article_data['body']}"
+
+def record_failure(cached_news_data, cache_key, article_data, failure_count, error=None,
+                   retry_base_hours=DEFAULT_RETRY_BASE_HOURS):
+    """
+    Store a failed extraction in the cache so it is not retried before its next retry time
+    
+    Args:
+        cached_news_data: Dictionary of cached article content
+        cache_key: Cache key of the article
+        article_data: Article dictionary whose extraction failed
+        failure_count: Number of failed attempts including this one
+        error: Error message, if any
+        retry_base_hours: Wait after the first failure; it doubles with every further failure
+    """
+    now = _utc_now()
+    cached_news_data[cache_key] = {
+        **article_data,
+        # The fallback text is rebuilt from the summary, so don't store it as content
+        "full_content": "",
+        "failure_count": failure_count,
+        "last_error": error,
+        "checked_at": now.isoformat(timespec='seconds'),
+        "next_retry_at": (now + retry_delay(failure_count, retry_base_hours)).isoformat(timespec='seconds'),
+    }
+    print(f"Will retry '{article_data['title']}' after {cached_news_data[cache_key]['next_retry_at']}")
+
+def store_article(cached_news_data, cache_key, article_data, result):
+    """
+    Store freshly fetched content, sharing one body between copies of the same article
+    
+    The body is stored under the page's rel=canonical URL when it names one
+    that is free or already holds the same content, or under the key of an
+    entry that already holds identical content; the article's own key then
+    becomes an alias of that entry. A canonical URL holding other content,
+    e.g. a section page several articles point at, is left alone and the
+    body is stored under the article's own key.
+    
+    Args:
+        cached_news_data: Dictionary or ArticleStore of cached article content
+        cache_key: Cache key of the article
+        article_data: Article dictionary with the new full_content
+        result: Fetch result with the validators and canonical_url
+    """
+    digest = content_hash(article_data["full_content"])
+    body_key = cache_key
+    canonical_url = result.get("canonical_url")
+    if canonical_url and canonical_url != cache_key:
+        cache_index = cached_news_data.index if isinstance(cached_news_data, ArticleStore) else cached_news_data
+        existing = cache_index.get(canonical_url)
+        if existing is None or (not existing.get("alias_of") and existing.get("content_hash") in (None, digest)):
+            body_key = canonical_url
+        else:
+            print(f"'{article_data['title']}' names {canonical_url} as canonical, which holds other content")
+    duplicate = find_duplicate(cached_news_data, digest, exclude_key=body_key)
+    if duplicate:
+        print(f"'{article_data['title']}' has the same content as {duplicate}")
+        body_key = duplicate
+    else:
+        # Keep the validators for the next revalidation
+        cached_news_data[body_key] = {
+            **article_data,
+            "etag": result.get("etag"),
+            "last_modified": result.get("last_modified"),
+            "content_hash": digest,
+            "checked_at": _utc_now().isoformat(timespec='seconds'),
+        }
+    if body_key != cache_key:
+        cached_news_data[cache_key] = alias_entry(body_key, article_data)
+
+def fetch_priority(task):
+    """
+    Sort key putting never-attempted articles first, then earlier failures,
+    then revalidations of cached articles
+    
+    Args:
+        task: (article_data, cache_key, revalidating, validators, failure_count) tuple
+        
+    Returns:
+        Priority group, lower is fetched first
+    """
+    _, _, revalidating, _, failure_count = task
+    if revalidating:
+        return 2
+    return 1 if failure_count else 0
+
+def prepare_news_data(news_items, cached_news_data, fetch_url_content,
+                      max_workers=DEFAULT_MAX_WORKERS, delay_range=DEFAULT_POLITE_DELAY,
+                      revalidate_days=None, retry_base_hours=DEFAULT_RETRY_BASE_HOURS,
+                      download=None, extract=None, parse_workers=DEFAULT_PARSE_WORKERS, deadline=None,
+                      refresh=None):
     """
     Prepare news data for JavaScript, fetching full content where needed
     
     Args:
-        news_items: List of news items as dictionaries
+        news_items: List of data_loader.NewsItem records
         cached_news_data: Dictionary of cached article content
-        fetch_url_content: Function to fetch content from URLs
+        fetch_url_content: Function to fetch content from URLs. It may return the
+            content as a string, or a dictionary like web_utils.fetch_article, in
+            which case the ETag / Last-Modified validators are stored in the cache
+        max_workers: Maximum number of URLs fetched concurrently
+        delay_range: (min, max) polite delay in seconds between requests to the same host
+        revalidate_days: Revalidate cached articles last checked this many days ago
+            with a conditional request, or None to always trust the cache. Requires
+            a fetch function accepting etag and last_modified keyword arguments
+        retry_base_hours: Hours before a failed article is retried, doubling with every
+            further failure
+        download: Optional network half of fetch_url_content, like web_utils.download_article.
+            Together with extract it replaces fetch_url_content with a two-stage
+            pipeline: I/O threads download and a process pool extracts
+        extract: Optional CPU half of fetch_url_content taking (page, url), like
+            web_utils.extract_article; must be picklable
+        parse_workers: Number of extraction processes used by the pipeline
+        deadline: time.monotonic() value by which fetching must be done, or None.
+            URLs are fetched by priority and those not fetched in time are
+            marked "deferred" and left for the next run. Fetch functions taking a
+            deadline keyword argument are also told when a running fetch must stop
+        refresh: Optional predicate taking a NewsItem; items it rejects are served
+            from the cache only and never fetched, e.g. to fetch only the articles of
+            companies whose news changed. Failed articles it rejects keep their summary
+            fallback even when their retry is due; uncached ones are marked "deferred"
         
     Returns:
-        List of news items with full content and a updated cache dictionary
+        List of news items with full content and a updated cache dictionary. Cached
+        articles from an ArticleStore carry a "content_ref" instead of their
+        full_content until load_article_bodies is called
     """
+    # An ArticleStore is scanned through its metadata only; bodies of cached
+    # articles are read when the dashboard is rendered (see load_article_bodies)
+    cache_index = cached_news_data.index if isinstance(cached_news_data, ArticleStore) else cached_news_data
+    telemetry = get_telemetry()
     news_data_for_js = []
+    to_fetch = []
+    scheduled = {}  # cache key -> article_data of the task fetching it
+    duplicates = []  # (article_data, article_data of the task fetching the same article)
     for item in news_items:
-        url = str(item.get("url", "#"))
-        title = str(item.get("title", "No title"))
+        url = item.url
+        title = item.title
         
         article_data = {
-            "company": str(item.get("company", "")),
+            "company": item.company,
             "title": title,
             "url": url,
-            "source": str(item.get("source", "Unknown source")),
-            "body": str(item.get("body", "No description available")),
-            "date": str(item.get("date", "")),
+            "source": item.source,
+            "body": item.body,
+            "date": item.date,
             "full_content": "",
             "extraction_status": "not_attempted"
         }
         
-        # Check if we already have the content in cache
-        cache_key = f"{url}_{title}"
-        if cache_key in cached_news_data and cached_news_data[cache_key].get("full_content"):
-            content = cached_news_data[cache_key]["full_content"]
-            # Verify the cached content is substantial
-            if content and len(content) > 100 and not content.startswith("Content extraction failed"):
-                print(f"Using cached content for: {title}")
-                article_data["full_content"] = content
+        # Check if we already have the content in cache; aliases recorded from
+        # rel=canonical links and identical content lead to the shared body
+        item_key = cache_key_for(article_data)
+        cache_key, cache_entry = resolve_cache_entry(cache_index, item_key)
+        revalidating = False
+        failure_count = 0
+        if cache_entry is not None and cache_entry.get("failure_count"):
+            # Negative cache entry: only try again once the retry time has passed
+            failure_count = cache_entry["failure_count"]
+            retry_due = is_retry_due(cache_entry)
+            if not retry_due or (refresh is not None and not refresh(item)):
+                if retry_due:
+                    # Served like any other failure; retried once the company's news changes
+                    print(f"Not retrying '{title}' yet: its company's news did not change")
+                    telemetry.increment("fetch", "not_refreshed")
+                else:
+                    print(f"Skipping '{title}': failed {failure_count} time(s), next retry after {cache_entry['next_retry_at']}")
+                telemetry.increment("cache", "negative_hit")
+                mark_failed(article_data, cache_entry.get("extraction_status", "error"), cache_entry.get("last_error"))
+                news_data_for_js.append(article_data)
+                continue
+            print(f"Retrying '{title}' after {failure_count} failed attempt(s)")
+            telemetry.increment("cache", "retry_due")
+            article_data["extraction_status"] = "cache_inadequate"
+        elif cache_entry is not None and (cache_entry.get("full_content") or cache_entry.get("blob")):
+            content = cache_entry.get("full_content", "")
+            # Verify the cached content is substantial; a stored blob always passed
+            # this check when it was written, so only its size is looked at
+            if cache_entry.get("blob"):
+                adequate = cache_entry["body_size"] > 100
+            else:
+                adequate = len(content) > 100 and not content.startswith("Content extraction failed")
+            if adequate:
+                if cache_entry.get("blob"):
+                    article_data["content_ref"] = cache_entry["blob"]
+                else:
+                    article_data["full_content"] = content
                 article_data["extraction_status"] = "cached"
+                # A shared body is revalidated through the URL it was fetched from
+                revalidating = (cache_key == item_key and needs_revalidation(cache_entry, revalidate_days)
+                                and (refresh is None or refresh(item)))
+                if revalidating:
+                    print(f"Revalidating cached content for: {title}")
+                    telemetry.increment("revalidation", "started")
+                else:
+                    print(f"Using cached content for: {title}")
+                telemetry.increment("cache", "hit")
             else:
                 print(f"Cached content for '{title}' seems inadequate. Re-fetching...")
                 article_data["extraction_status"] = "cache_inadequate"
+                telemetry.increment("cache", "inadequate")
+        else:
+            telemetry.increment("cache", "miss" if cache_entry is None else "inadequate")
         
         # Only fetch content if we have a real URL and it's not adequately cached
-        if (article_data["extraction_status"] != "cached" and 
+        if ((article_data["extraction_status"] != "cached" or revalidating) and 
             url and url != "#" and url.startswith("http")):
-            try:
-                print(f"Fetching content from {url}")
-                content = fetch_url_content(url)
-                
-                # Verify the fetched content is substantial
-                if content and len(content) > 100:
-                    article_data["full_content"] = content
-                    article_data["extraction_status"] = "success"
-                    # Update the cache with new content
-                    cached_news_data[cache_key] = article_data
-                else:
-                    print(f"Warning: Fetched content for '{title}' is too short or empty")
-                    article_data["extraction_status"] = "content_too_short"
-                    article_data["full_content"] = f"Note: Content could not be properly extracted from this source. Using summary instead.\n\n{article_data['body']}"
-                
-                # Polite delay to avoid hammering websites
-                time.sleep(random.uniform(1.5, 4))
-            except Exception as e:
-                print(f"Error processing URL {url}: {e}")
-                article_data["extraction_status"] = "error"
-                article_data["full_content"] = f"Error extracting content: {str(e)}"
+            if not revalidating and refresh is not None and not refresh(item):
+                article_data["extraction_status"] = "deferred"
+                telemetry.increment("fetch", "not_refreshed")
+                news_data_for_js.append(article_data)
+                continue
+            if cache_key in scheduled:
+                # Same article under another title or link: fetch it once
+                duplicates.append((article_data, scheduled[cache_key]))
+                telemetry.increment("fetch", "deduplicated")
+                news_data_for_js.append(article_data)
+                continue
+            validators = {}
+            if revalidating:
+                validators = {name: cache_entry[name] for name in ("etag", "last_modified")
+                              if cache_entry.get(name)}
+            scheduled[cache_key] = article_data
+            to_fetch.append((article_data, cache_key, revalidating, validators, failure_count))
         
         news_data_for_js.append(article_data)
     
+    # Most valuable first: never-attempted articles, then earlier failures, then
+    # revalidation of cached copies; newest first within each group
+    to_fetch.sort(key=lambda task: task[0]["date"], reverse=True)
+    to_fetch.sort(key=fetch_priority)
+    
+    def store_result(index, result, error):
+        # Called as soon as each fetch is done, so a crash keeps everything fetched so far
+        article_data, cache_key, revalidating, validators, failure_count = to_fetch[index]
+        url = article_data["url"]
+        title = article_data["title"]
+        if isinstance(error, DEFERRING_ERRORS):
+            out_of_time = isinstance(error, (FetchDeferred, DeadlineExceeded))
+            if not out_of_time:
+                telemetry.increment("fetch", "host_skipped")
+            if not revalidating:
+                reason = "out of time" if out_of_time else str(error)
+                print(f"Deferred '{title}' to the next run: {reason}")
+                article_data["extraction_status"] = "deferred"
+            return
+        
+        if error is not None:
+            print(f"Error processing URL {url}: {error}")
+            if revalidating:
+                # Keep serving the cached copy; it is checked again next run
+                return
+            mark_failed(article_data, "error", str(error))
+            record_failure(cached_news_data, cache_key, article_data, failure_count + 1, str(error),
+                           retry_base_hours)
+            return
+        
+        if not isinstance(result, dict):
+            result = {"content": result}
+        if result.get("extract_seconds") is not None:
+            telemetry.record_extraction(get_host(url), result["extract_seconds"])
+        
+        if result.get("not_modified"):
+            print(f"Cached content for '{title}' is still current")
+            telemetry.increment("revalidation", "not_modified")
+            cache_entry = cached_news_data[cache_key]
+            cache_entry["etag"] = result.get("etag") or cache_entry.get("etag")
+            cache_entry["last_modified"] = result.get("last_modified") or cache_entry.get("last_modified")
+            cache_entry["checked_at"] = _utc_now().isoformat(timespec='seconds')
+            cached_news_data[cache_key] = cache_entry
+            return
+        
+        content = result.get("content")
+        if revalidating and (not content or content.startswith("Content extraction failed")):
+            print(f"Warning: Revalidation of '{title}' failed, keeping cached copy")
+            return
+        
+        if content and content.startswith("Content extraction failed"):
+            error = content[len("Content extraction failed: "):]
+            mark_failed(article_data, "error", error)
+            record_failure(cached_news_data, cache_key, article_data, failure_count + 1, error,
+                           retry_base_hours)
+            return
+        
+        # Verify the fetched content is substantial
+        if content and len(content) > 100:
+            article_data["full_content"] = content
+            article_data.pop("content_ref", None)
+            article_data["extraction_status"] = "success"
+            store_article(cached_news_data, cache_key, article_data, result)
+            if revalidating:
+                telemetry.increment("revalidation", "refreshed")
+        elif revalidating:
+            print(f"Warning: Revalidation of '{title}' returned too little content, keeping cached copy")
+        else:
+            print(f"Warning: Fetched content for '{title}' is too short or empty")
+            mark_failed(article_data, "content_too_short")
+            record_failure(cached_news_data, cache_key, article_data, failure_count + 1,
+                           retry_base_hours=retry_base_hours)
+    
+    # Fetch concurrently, storing every article as soon as it is extracted
+    urls = [task[0]["url"] for task in to_fetch]
+    fetch_kwargs = [task[3] for task in to_fetch]
+    with telemetry.stage("fetch"):
+        if download is not None and extract is not None:
+            fetch_and_extract_all(urls, download, extract, max_workers=max_workers,
+                                  parse_workers=parse_workers, delay_range=delay_range,
+                                  fetch_kwargs=fetch_kwargs, deadline=deadline, on_result=store_result)
+        else:
+            fetch_all(urls, fetch_url_content, max_workers=max_workers, delay_range=delay_range,
+                      fetch_kwargs=fetch_kwargs, deadline=deadline, on_result=store_result)
+    
+    for article_data, primary in duplicates:
+        if primary["extraction_status"] == "content_too_short":
+            mark_failed(article_data, "content_too_short")
+        else:
+            article_data["full_content"] = primary["full_content"]
+            article_data["extraction_status"] = primary["extraction_status"]
+            if "content_ref" in primary:
+                article_data["content_ref"] = primary["content_ref"]
+    
+    for article_data in news_data_for_js:
+        telemetry.increment("articles", article_data["extraction_status"])
+    
     return news_data_for_js, cached_news_data
+
+def load_article_bodies(news_data, cached_news_data):
+    """
+    Read the bodies of cached articles that prepare_news_data left as references
+    
+    Args:
+        news_data: List of article dictionaries returned by prepare_news_data
+        cached_news_data: Dictionary or ArticleStore the articles came from; an
+            ArticleStore may already be closed, bodies are read from its blob store
+    """
+    for article_data in news_data:
+        content_ref = article_data.pop("content_ref", None)
+        if content_ref:
+            article_data["full_content"] = cached_news_data.read_body(content_ref)
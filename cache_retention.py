@@ -0,0 +1,129 @@
+import os
+import datetime
+from article_store import ArticleStore
+from cache_manager import load_cache
+
+DEFAULT_TTL_DAYS = 90
+DEFAULT_MAX_ENTRIES = 10000
+DEFAULT_MAX_BYTES = 100 * 1024 * 1024
+
+def select_evictions(entry_stats, keep_keys, ttl_days=DEFAULT_TTL_DAYS, max_entries=DEFAULT_MAX_ENTRIES,
+                     max_bytes=DEFAULT_MAX_BYTES, now=None):
+    """
+    Choose which cache entries to evict
+
+    Entries in keep_keys are never evicted. Every other entry not used for
+    ttl_days is evicted, then the least recently used ones until the cache
+    fits within max_entries and max_bytes.
+
+    Args:
+        entry_stats: List of (key, size in bytes, last used ISO timestamp) tuples
+        keep_keys: Set of keys referenced by the current news items
+        ttl_days: Days after their last use at which entries expire, or None for no TTL
+        max_entries: Maximum number of entries to keep, or None for no limit
+        max_bytes: Maximum total entry size in bytes, or None for no limit
+        now: Current UTC datetime, for testing
+
+    Returns:
+        List of keys to evict, least recently used first
+    """
+    now = now or datetime.datetime.now(datetime.timezone.utc)
+    # Timestamps are all UTC ISO strings, so they sort chronologically as text
+    candidates = sorted((last_used or "", key, size) for key, size, last_used in entry_stats
+                        if key not in keep_keys)
+    cutoff = (now - datetime.timedelta(days=ttl_days)).isoformat(timespec='seconds') if ttl_days is not None else ""
+
+    remaining_entries = len(entry_stats)
+    remaining_bytes = sum(size for _, size, _ in entry_stats)
+    evicted = []
+    for last_used, key, size in candidates:
+        expired = last_used < cutoff
+        over_limit = ((max_entries is not None and remaining_entries > max_entries) or
+                      (max_bytes is not None and remaining_bytes > max_bytes))
+        if not expired and not over_limit:
+            # Candidates are oldest first, so nothing later is expired either
+            break
+        evicted.append(key)
+        remaining_entries -= 1
+        remaining_bytes -= size
+    return evicted
+
+def apply_retention(cached_news_data, keep_keys, ttl_days=DEFAULT_TTL_DAYS, max_entries=DEFAULT_MAX_ENTRIES,
+                    max_bytes=DEFAULT_MAX_BYTES):
+    """
+    Mark the referenced entries as used, evict expired or excess entries
+    and delete the bodies no entry refers to any more
+
+    Args:
+        cached_news_data: ArticleStore to apply the policy to
+        keep_keys: Set of keys referenced by the current news items
+        ttl_days: Days after their last use at which entries expire
+        max_entries: Maximum number of entries to keep
+        max_bytes: Maximum total entry size in bytes
+
+    Returns:
+        Dictionary with the number of removed entries, removed bytes, remaining entries and removed bodies
+    """
+    if not isinstance(cached_news_data, ArticleStore):
+        print("Retention is only applied to the SQLite cache")
+        return {"removed": 0, "removed_bytes": 0, "remaining": len(cached_news_data), "removed_blobs": 0}
+
+    # Bodies shared through aliases are referenced too
+    keep_keys = set(keep_keys)
+    targets = cached_news_data.alias_targets(keep_keys) - keep_keys
+    while targets:
+        keep_keys |= targets
+        targets = cached_news_data.alias_targets(targets) - keep_keys
+    cached_news_data.touch(keep_keys)
+    entry_stats = cached_news_data.entry_stats()
+    evicted = select_evictions(entry_stats, keep_keys, ttl_days, max_entries, max_bytes)
+    sizes = {key: size for key, size, _ in entry_stats}
+    cached_news_data.delete_many(evicted)
+    result = {
+        "removed": len(evicted),
+        "removed_bytes": sum(sizes[key] for key in evicted),
+        "remaining": len(entry_stats) - len(evicted),
+        "removed_blobs": 0,
+    }
+    # Bodies are also orphaned by entries whose content was replaced, not only by evictions
+    result["removed_blobs"], _ = cached_news_data.remove_orphan_blobs()
+    if evicted or result["removed_blobs"]:
+        print(f"Evicted {result['removed']} cached articles ({result['removed_bytes']} bytes) and "
+              f"{result['removed_blobs']} unused bodies, {result['remaining']} remain")
+    return result
+
+def _cache_size(store):
+    database = sum(os.path.getsize(name) for name in (store.path, store.path + "-wal") if os.path.exists(name))
+    return database + store.blobs.total_bytes()
+
+def compact_cache(cache_file, keep_keys, ttl_days=DEFAULT_TTL_DAYS, max_entries=DEFAULT_MAX_ENTRIES,
+                  max_bytes=DEFAULT_MAX_BYTES):
+    """
+    Apply the retention policy, delete unused bodies and rewrite the cache database to reclaim space
+
+    The cache is opened through load_cache, so an older cache is migrated to the
+    current key layout first and no entry is evicted for still having an old key.
+
+    Args:
+        cache_file: Path of the SQLite cache
+        keep_keys: Set of keys referenced by the current news items
+        ttl_days: Days after their last use at which entries expire
+        max_entries: Maximum number of entries to keep
+        max_bytes: Maximum total entry size in bytes
+
+    Returns:
+        Dictionary with the retention result plus the cache size (database and bodies) before and after
+    """
+    store = load_cache(cache_file)
+    try:
+        size_before = _cache_size(store)
+        result = apply_retention(store, keep_keys, ttl_days, max_entries, max_bytes)
+        store.vacuum()
+        result["size_before"] = size_before
+        result["size_after"] = _cache_size(store)
+    finally:
+        store.close()
+    print(f"Compacted {cache_file}: removed {result['removed']} entries and {result['removed_blobs']} bodies, "
+          f"{result['size_before']} -> {result['size_after']} bytes "
+          f"({result['size_before'] - result['size_after']} reclaimed)")
+    return result
@@ -0,0 +1,78 @@
+import re
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode, urljoin
+
+# Query parameters of known click and campaign trackers. Generic names such as
+# ref, src or partner also select content on some sites, so they are kept
+TRACKING_PARAMS = {
+    'fbclid', 'gclid', 'gbraid', 'wbraid', 'dclid', 'msclkid', 'yclid', 'igshid', 'mc_cid', 'mc_eid',
+    'ocid', 'cvid', 'ref_src', 'cmpid', 'soc_src', 'soc_trk', 'guccounter', 'guce_referrer',
+    'guce_referrer_sig', 'smid', 'taid', 'spm', '_ga', '_gl', '_hsenc', '_hsmi', 'mkt_tok',
+}
+TRACKING_PREFIXES = ('utm_', 'pk_', 'mtm_', 'hsa_')
+
+_HEAD_END = re.compile(r'</head\s*>', re.IGNORECASE)
+_LINK_TAG = re.compile(r'<link\b[^>]*>', re.IGNORECASE)
+_ATTRIBUTE = re.compile(r'([a-zA-Z:-]+)\s*=\s*(?:"([^"]*)"|\'([^\']*)\'|([^\s>]+))')
+
+def canonicalize_url(url):
+    """
+    Normalize a URL so that links to the same article compare equal
+
+    Lowercases the scheme and host, drops the default port, the fragment,
+    trailing slashes and tracking parameters, and sorts the remaining query.
+
+    Args:
+        url: Absolute URL
+
+    Returns:
+        Canonical form of the URL, or the URL unchanged if it is not http(s)
+    """
+    try:
+        parts = urlsplit(url.strip())
+    except ValueError:
+        return url
+    scheme = parts.scheme.lower()
+    if scheme not in ('http', 'https') or not parts.hostname:
+        return url
+
+    host = parts.hostname
+    if host.startswith('www.'):
+        host = host[4:]
+    if parts.port and parts.port != (443 if scheme == 'https' else 80):
+        host = f"{host}:{parts.port}"
+    path = parts.path.rstrip('/') or '/'
+    query = [(name, value) for name, value in parse_qsl(parts.query, keep_blank_values=True)
+             if name.lower() not in TRACKING_PARAMS and not name.lower().startswith(TRACKING_PREFIXES)]
+    # Both schemes serve the same article, so they share one key
+    return urlunsplit(('https', host, path, urlencode(sorted(query)), ''))
+
+def find_canonical_url(html, url):
+    """
+    Find the rel=canonical link of a page
+
+    Args:
+        html: HTML of the page
+        url: URL the page was downloaded from, to resolve relative links
+
+    Returns:
+        Canonical form of the linked URL, or None if the page has no usable canonical link
+    """
+    # The link belongs in <head>, so the article body does not need scanning
+    head_end = _HEAD_END.search(html)
+    head = html[:head_end.start()] if head_end else html[:100000]
+    for tag in _LINK_TAG.findall(head):
+        attributes = {name.lower(): double or single or bare
+                      for name, double, single, bare in _ATTRIBUTE.findall(tag)}
+        if 'canonical' not in attributes.get('rel', '').lower().split() or not attributes.get('href'):
+            continue
+        canonical = canonicalize_url(urljoin(url, attributes['href'].strip()))
+        # Some sites point every page at their home page, which would merge unrelated articles
+        if not canonical.startswith('https://') or urlsplit(canonical).path == '/':
+            return None
+        # Others point it at the section the article is in, e.g. /news for /news/some-story
+        page = urlsplit(canonicalize_url(url))
+        target = urlsplit(canonical)
+        if target.netloc == page.netloc and page.path.startswith(target.path.rstrip('/') + '/'):
+            return None
+        return canonical
+    return None
@@ -0,0 +1,207 @@
+import os
+import csv
+import json
+import hashlib
+from canonical_urls import canonicalize_url
+from file_utils import atomic_write
+
+DEFAULT_COMPANY_INDEX_FILE = "company-index.json"
+COMPANY_CSV_PREFIX = "news-"
+COMPANY_CSV_SUFFIX = ".csv"
+
+def stat_cache_path(path):
+    """
+    Path of the local file the mtimes behind an index are kept in
+
+    Mtimes differ on every checkout, so they are kept out of the committed
+    index, which would otherwise be rewritten on every run.
+    """
+    root, _ = os.path.splitext(path)
+    return f"{root}.local.json"
+
+def _url_key(url):
+    return canonicalize_url(url) if url.startswith("http") else url
+
+class CompanyIndex:
+    """
+    Persistent index of the news in the per-company CSV files.
+
+    For every news-<company>.csv the index keeps the file's size and hash
+    with its (title, url) rows, and a local stat cache next to it the mtime
+    the file had, so a refresh only re-reads files that changed. Lookups by
+    title or canonical URL are dictionary hits, however many companies are
+    tracked.
+    """
+
+    def __init__(self, path=DEFAULT_COMPANY_INDEX_FILE):
+        """
+        Args:
+            path: JSON file the index is kept in; missing or unreadable files start empty
+        """
+        self.path = path
+        self.stat_path = stat_cache_path(path)
+        self.files = {}
+        # name -> [size, mtime_ns, sha256] of the files when they were last read
+        self.stats = {}
+        # True once refresh changed anything in the index that save has not written yet
+        self.modified = False
+        self._stats_modified = False
+        if os.path.exists(path):
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    self.files = json.load(f).get("files", {})
+            except (OSError, ValueError) as e:
+                print(f"Error loading company index {path}: {e}")
+        for entry in self.files.values():
+            # Indexes written before the stat cache kept the mtime themselves
+            if entry.pop("mtime", None) is not None:
+                self.modified = True
+        if os.path.exists(self.stat_path):
+            try:
+                with open(self.stat_path, 'r', encoding='utf-8') as f:
+                    self.stats = json.load(f).get("files", {})
+            except (OSError, ValueError):
+                pass
+        self._build_lookups()
+
+    def _build_lookups(self):
+        self.by_title = {}
+        self.by_url = {}
+        for entry in self.files.values():
+            for title, url in entry["items"]:
+                # The same story can be listed under several companies
+                if title:
+                    self.by_title.setdefault(title, set()).add(entry["company"])
+                if url:
+                    self.by_url.setdefault(_url_key(url), set()).add(entry["company"])
+
+    def refresh(self, directory="."):
+        """
+        Bring the index up to date with the company CSV files of a directory
+
+        Files whose size and mtime are unchanged since they were last read
+        are skipped; other files are hashed and only parsed if their content
+        changed, e.g. not after a fresh checkout.
+
+        Args:
+            directory: Directory holding the news-<company>.csv files
+
+        Returns:
+            (number of files parsed, number of files removed from the index)
+        """
+        parsed = 0
+        seen = set()
+        for dir_entry in os.scandir(directory):
+            name = dir_entry.name
+            if not (name.startswith(COMPANY_CSV_PREFIX) and name.endswith(COMPANY_CSV_SUFFIX)):
+                continue
+            seen.add(name)
+            stat = dir_entry.stat()
+            entry = self.files.get(name)
+            if entry and self.stats.get(name) == [stat.st_size, stat.st_mtime_ns, entry["sha256"]]:
+                continue
+            try:
+                with open(dir_entry.path, 'rb') as f:
+                    data = f.read()
+            except OSError as e:
+                print(f"Error reading {name}: {e}")
+                continue
+            digest = hashlib.sha256(data).hexdigest()
+            if not entry or entry["sha256"] != digest:
+                rows = csv.DictReader(data.decode('utf-8').splitlines())
+                self.files[name] = {
+                    "company": name[len(COMPANY_CSV_PREFIX):-len(COMPANY_CSV_SUFFIX)],
+                    "sha256": digest,
+                    "size": len(data),
+                    "items": [[row.get("title") or "", row.get("url") or ""] for row in rows],
+                }
+                parsed += 1
+                self.modified = True
+            self.stats[name] = [stat.st_size, stat.st_mtime_ns, digest]
+            self._stats_modified = True
+        removed = [name for name in self.files if name not in seen]
+        for name in removed:
+            del self.files[name]
+            self.stats.pop(name, None)
+            self.modified = True
+            self._stats_modified = True
+        if parsed or removed:
+            self._build_lookups()
+        return parsed, len(removed)
+
+    def save(self):
+        """
+        Write the index and its local stat cache, each only if it changed,
+        replacing the files atomically
+        """
+        if self.modified or not os.path.exists(self.path):
+            with atomic_write(self.path) as f:
+                json.dump({"files": self.files}, f, indent=1, sort_keys=True)
+            self.modified = False
+        if self._stats_modified:
+            with atomic_write(self.stat_path) as f:
+                json.dump({"files": self.stats}, f, sort_keys=True)
+            self._stats_modified = False
+
+    def companies(self):
+        """
+        Get the indexed company names
+        """
+        return sorted(entry["company"] for entry in self.files.values())
+
+    def company_items(self, company):
+        """
+        Get the (title, url) pairs of a company's news
+
+        Args:
+            company: Company name
+
+        Returns:
+            List of [title, url] pairs, empty for an unknown company
+        """
+        entry = self.files.get(f"{COMPANY_CSV_PREFIX}{company}{COMPANY_CSV_SUFFIX}")
+        return entry["items"] if entry else []
+
+    def lookup(self, title="", url=""):
+        """
+        Find the companies a news item is listed under
+
+        Args:
+            title: News title
+            url: News URL, matched by its canonical form
+
+        Returns:
+            Set of company names, empty if neither the URL nor the title is indexed
+        """
+        if url:
+            companies = self.by_url.get(_url_key(url))
+            if companies:
+                return companies
+        return self.by_title.get(title, set()) if title else set()
+
+def attribute_companies(news_items, index):
+    """
+    Fill in missing company names of news items and check the others
+
+    Args:
+        news_items: List of data_loader.NewsItem records, updated in place
+        index: CompanyIndex
+
+    Returns:
+        (number of items filled in, number of items whose company disagrees with the index)
+    """
+    filled = 0
+    mismatched = 0
+    for item in news_items:
+        if item.title == "No news":
+            continue
+        companies = index.lookup(item.title, item.url if item.url != "#" else "")
+        if not companies:
+            continue
+        if not item.company:
+            item.company = min(companies)
+            filled += 1
+        elif item.company not in companies:
+            print(f"Warning: '{item.title}' is listed under {item.company} but found under {', '.join(sorted(companies))}")
+            mismatched += 1
+    return filled, mismatched
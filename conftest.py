@@ -0,0 +1 @@
+# Makes the modules in the repository root importable from tests/
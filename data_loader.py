@@ -1,43 +1,77 @@
 import csv
-import os
+import sys
+import datetime
+from dataclasses import dataclass, fields
 
-def load_news_items(csv_file="aggregated-news.csv"):
+@dataclass(slots=True)
+class NewsItem:
     """
-    Load news items from the aggregated CSV file
-    
+    One row of the aggregated news CSV
+    """
+
+    company: str = ""
+    title: str = "No title"
+    url: str = "#"
+    source: str = "Unknown source"
+    body: str = "No description available"
+    date: str = ""
+    image: str = ""
+
+    def get(self, field, default=None):
+        """
+        Dictionary-style access for helpers shared with plain CSV rows
+        """
+        return getattr(self, field, default)
+
+NEWS_ITEM_FIELDS = tuple(field.name for field in fields(NewsItem))
+
+def normalize_date(value):
+    """
+    Format a date to YYYY-MM-DD, dropping any time component
+
     Args:
-        csv_file: Path to the CSV file to load
-        
+        value: ISO date or datetime string, or datetime object
+
     Returns:
-        List of news items as dictionaries
+        Date string, or the value unchanged if it is not recognized
     """
-    news_items = []
-    with open(csv_file, "r", encoding="utf-8") as file:
-        reader = csv.DictReader(file)
-        for row in reader:
-            news_items.append(row)
-    return news_items
+    if not value:
+        return ""
+    if isinstance(value, datetime.datetime):
+        return value.strftime("%Y-%m-%d")
+    return str(value).split('T', 1)[0]
 
-def create_company_mapping():
+def iter_news_items(csv_file="aggregated-news.csv"):
     """
-    Create a mapping of titles to company names from individual company CSV files
+    Read news items from the aggregated CSV file one at a time
+
+    Missing columns get the NewsItem defaults and dates are normalized
+    while parsing, so no later stage needs to convert the fields again.
+
+    Args:
+        csv_file: Path to the CSV file to read
+
+    Yields:
+        NewsItem records
+    """
+    with open(csv_file, "r", encoding="utf-8", newline="") as file:
+        for row in csv.DictReader(file):
+            values = {name: row[name] for name in NEWS_ITEM_FIELDS if row.get(name) is not None}
+            if "date" in values:
+                values["date"] = normalize_date(values["date"])
+            if "company" in values:
+                # The same few company names repeat on every row
+                values["company"] = sys.intern(values["company"])
+            yield NewsItem(**values)
+
+def load_news_items(csv_file="aggregated-news.csv"):
+    """
+    Load news items from the aggregated CSV file
     
+    Args:
+        csv_file: Path to the CSV file to load
+        
     Returns:
-        Dictionary mapping news titles to company names
+        List of NewsItem records
     """
-    company_mapping = {}
-    
-    # First, create a mapping of titles to companies from individual CSV files
-    for csv_file in os.listdir():
-        if (csv_file.startswith("news-") and csv_file.endswith(".csv")):
-            company_name = csv_file[5:-4]  # Remove "news-" and ".csv"
-            try:
-                with open(csv_file, 'r', encoding="utf-8") as f:
-                    reader = csv.DictReader(f)
-                    for row in reader:
-                        if "title" in row:
-                            company_mapping[row["title"]] = company_name
-            except Exception as e:
-                print(f"Error reading {csv_file}: {e}")
-                
-    return company_mapping
+    return list(iter_news_items(csv_file))
@@ -0,0 +1,73 @@
+import os
+import json
+import hashlib
+from search_index import segment_article
+from file_utils import atomic_write
+
+DEFAULT_DATA_DIR = "news-data"
+# Article fields moved out of the page into the shards or not needed by the chatbot
+SHARD_ONLY_FIELDS = ("full_content", "extraction_status", "content_ref")
+
+def _write_hashed_json(directory, value):
+    data = json.dumps(value, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+    name = hashlib.sha256(data).hexdigest()[:16] + ".json"
+    path = os.path.join(directory, name)
+    if not os.path.exists(path):
+        with atomic_write(path, 'wb') as f:
+            f.write(data)
+    return name
+
+def write_data_shards(news_data_for_js, directory=DEFAULT_DATA_DIR, extra=None):
+    """
+    Write the full article content as one JSON shard per company
+
+    A shard is a JSON array with one [text, paragraphs, lead] entry per
+    article of the company in page order, the segments coming from
+    search_index.segment_article. It is named after the hash of its
+    content, so browsers can cache it for good and a company whose
+    articles did not change keeps its file. Files no longer used by the
+    page are removed.
+
+    Args:
+        news_data_for_js: List of news items prepared for JavaScript
+        directory: Directory of the shards, relative to the dashboard
+        extra: Optional dictionary of further JSON files to write the same way,
+            e.g. {"index": search index}; each appears in the manifest under its key
+
+    Returns:
+        (card data without the full content, each item pointing at its "shard" and
+        "offset", and the manifest {"shards": [shard URL, ...], ...} for the page)
+    """
+    os.makedirs(directory, exist_ok=True)
+    shard_of_company = {}
+    shard_contents = []
+    cards = []
+    for article in news_data_for_js:
+        company = article.get("company", "")
+        if company not in shard_of_company:
+            shard_of_company[company] = len(shard_contents)
+            shard_contents.append([])
+        shard = shard_of_company[company]
+        card = {name: value for name, value in article.items() if name not in SHARD_ONLY_FIELDS}
+        card["shard"] = shard
+        card["offset"] = len(shard_contents[shard])
+        text = article.get("full_content", "")
+        shard_contents[shard].append([text] + segment_article(text))
+        cards.append(card)
+
+    prefix = directory.replace(os.sep, "/").rstrip("/")
+    shard_names = [_write_hashed_json(directory, contents) for contents in shard_contents]
+    manifest = {"shards": [f"{prefix}/{name}" for name in shard_names]}
+    used = set(shard_names)
+    for key, value in (extra or {}).items():
+        name = _write_hashed_json(directory, value)
+        manifest[key] = f"{prefix}/{name}"
+        used.add(name)
+
+    removed = 0
+    for name in os.listdir(directory):
+        if name.endswith(".json") and name not in used:
+            os.unlink(os.path.join(directory, name))
+            removed += 1
+    print(f"Wrote article content as {len(shard_names)} shards in {directory}, removed {removed} stale files")
+    return cards, manifest
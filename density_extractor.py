@@ -0,0 +1,223 @@
+import re
+from html.parser import HTMLParser
+
+# Elements whose content is never article text
+SKIPPED_TAGS = {'script', 'style', 'noscript', 'template', 'svg', 'nav', 'header', 'footer',
+                'aside', 'form', 'head', 'iframe', 'select', 'button'}
+# Elements that can hold the main content and are scored as candidates
+CANDIDATE_TAGS = {'body', 'article', 'main', 'section', 'div', 'td', 'blockquote'}
+# Elements that end the current run of text
+BLOCK_TAGS = CANDIDATE_TAGS | {'p', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'li', 'ul', 'ol', 'br',
+                               'tr', 'table', 'dd', 'dt', 'pre', 'figure', 'figcaption'}
+VOID_TAGS = {'br', 'img', 'hr', 'input', 'meta', 'link', 'source', 'wbr', 'area', 'base', 'col'}
+
+POSITIVE_NAMES = re.compile(r'article|body|content|entry|main|post|story|text', re.IGNORECASE)
+NEGATIVE_NAMES = re.compile(r'comment|sidebar|footer|nav|menu|related|promo|share|social|'
+                            r'advert|sponsor|banner|cookie|newsletter|subscribe|popup', re.IGNORECASE)
+
+MIN_SEGMENT_CHARS = 25
+# Siblings of the best block are merged into the content when they score at least
+# this much, or this fraction of the best score, e.g. an article split into several
+# sections around ads
+SIBLING_MIN_SCORE = 10
+SIBLING_SCORE_RATIO = 0.2
+MAX_CONTENT_CHARS = 10000
+
+class _Frame:
+    """
+    Running totals for an open candidate element
+    """
+
+    __slots__ = ('tag', 'id', 'parent', 'names', 'weight', 'score', 'first_segment', 'text_before',
+                 'links_before')
+
+    def __init__(self, tag, frame_id, parent, names, weight, first_segment, text_before, links_before):
+        self.tag = tag
+        self.id = frame_id
+        self.parent = parent
+        self.names = names
+        self.weight = weight
+        self.score = 0
+        self.first_segment = first_segment
+        self.text_before = text_before
+        self.links_before = links_before
+
+class DensityExtractor(HTMLParser):
+    """
+    Find the main content block of a page in a single pass over its HTML.
+
+    Text is cut into segments at block boundaries. Every segment of
+    substantial length scores its enclosing candidate block (and half of that
+    for the block above it), weighted by its length and commas. When a block
+    closes its score is scaled down by its link density and adjusted by its
+    class/id names; the best block wins, together with those of its siblings
+    that score close to it. Running totals per segment let every block's text
+    and link counts be computed without walking the tree again.
+    """
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.segments = []  # (text, is_paragraph)
+        self.total_text = 0
+        self.total_links = 0
+        self.candidates = []  # (score, first_segment, last_segment, parent id, class/id names)
+        self.best = None  # Best entry of candidates
+        self._stack = []
+        self._frame_count = 0
+        self._skip_depth = 0
+        self._skip_tags = []
+        self._link_depth = 0
+        self._in_paragraph = False
+        self._buffer = []
+        self._buffer_links = 0
+
+    def _flush(self):
+        text = ' '.join(''.join(self._buffer).split())
+        if text:
+            self.segments.append((text, self._in_paragraph))
+            self.total_text += len(text)
+            self.total_links += min(self._buffer_links, len(text))
+            if len(text) >= MIN_SEGMENT_CHARS and self._stack:
+                points = 1 + text.count(',') + min(len(text) // 100, 3)
+                self._stack[-1].score += points
+                if len(self._stack) > 1:
+                    self._stack[-2].score += points / 2
+        self._buffer = []
+        self._buffer_links = 0
+
+    def _close_frame(self):
+        frame = self._stack.pop()
+        text = self.total_text - frame.text_before
+        # Only blocks that directly hold substantial text are candidates
+        if frame.score and text:
+            link_density = (self.total_links - frame.links_before) / text
+            score = (frame.score + frame.weight) * (1 - link_density)
+            candidate = (score, frame.first_segment, len(self.segments), frame.parent, frame.names)
+            self.candidates.append(candidate)
+            if self.best is None or score > self.best[0]:
+                self.best = candidate
+
+    def handle_starttag(self, tag, attrs):
+        if self._skip_depth and tag == 'body':
+            # A missing </head> must not hide the whole page
+            self._skip_depth = 0
+            self._skip_tags = []
+        if self._skip_depth:
+            if tag in SKIPPED_TAGS and tag not in VOID_TAGS:
+                self._skip_depth += 1
+                self._skip_tags.append(tag)
+            return
+        if tag in SKIPPED_TAGS:
+            self._flush()
+            self._skip_depth = 1
+            self._skip_tags = [tag]
+            return
+        if tag in BLOCK_TAGS:
+            self._flush()
+            if tag == 'p':
+                self._in_paragraph = True
+            elif tag != 'br':
+                self._in_paragraph = False
+        if tag == 'a':
+            self._link_depth += 1
+        if tag in CANDIDATE_TAGS:
+            attributes = dict(attrs)
+            names = f"{attributes.get('class') or ''} {attributes.get('id') or ''}"
+            weight = 0
+            if NEGATIVE_NAMES.search(names):
+                weight -= 25
+            if POSITIVE_NAMES.search(names):
+                weight += 25
+            if tag in ('article', 'main'):
+                weight += 10
+            parent = self._stack[-1].id if self._stack else None
+            self._frame_count += 1
+            self._stack.append(_Frame(tag, self._frame_count, parent, names.strip(), weight,
+                                      len(self.segments), self.total_text, self.total_links))
+
+    def handle_endtag(self, tag):
+        if self._skip_depth:
+            if self._skip_tags and tag == self._skip_tags[-1]:
+                self._skip_tags.pop()
+                self._skip_depth -= 1
+            return
+        if tag in BLOCK_TAGS:
+            self._flush()
+            if tag == 'p':
+                self._in_paragraph = False
+        if tag == 'a' and self._link_depth:
+            self._link_depth -= 1
+        if tag in CANDIDATE_TAGS and any(frame.tag == tag for frame in self._stack):
+            # Close unclosed children along with the element
+            while self._stack[-1].tag != tag:
+                self._close_frame()
+            self._close_frame()
+
+    def handle_data(self, data):
+        if self._skip_depth:
+            return
+        self._buffer.append(data)
+        if self._link_depth:
+            self._buffer_links += len(data.strip())
+
+    def close(self):
+        super().close()
+        self._flush()
+        while self._stack:
+            self._close_frame()
+
+    def content_ranges(self):
+        """
+        Get the segments of the best block and of its siblings that score close to it
+
+        Returns:
+            List of (first_segment, last_segment) ranges in document order
+        """
+        if self.best is None:
+            return []
+        score, first, last, parent, names = self.best
+        if parent is None:
+            return [(first, last)]
+        threshold = max(SIBLING_MIN_SCORE, score * SIBLING_SCORE_RATIO)
+        ranges = []
+        for candidate in self.candidates:
+            sibling_score, sibling_first, sibling_last, sibling_parent, sibling_names = candidate
+            if candidate is self.best:
+                ranges.append((first, last))
+                continue
+            if sibling_parent != parent:
+                continue
+            # Sections of one article usually share their class
+            if names and sibling_names == names:
+                sibling_score += score * SIBLING_SCORE_RATIO
+            if sibling_score >= threshold:
+                ranges.append((sibling_first, sibling_last))
+        return sorted(ranges)
+
+    def content(self):
+        """
+        Get the text of the best scoring block and its merged siblings
+
+        Returns:
+            Paragraphs of the blocks joined by blank lines, or an empty string
+        """
+        block = [segment for first, last in self.content_ranges() for segment in self.segments[first:last]]
+        paragraphs = [text for text, is_paragraph in block if is_paragraph]
+        if not paragraphs:
+            paragraphs = [text for text, _ in block if len(text) > 30]
+        return "\n\n".join(paragraphs)[:MAX_CONTENT_CHARS]
+
+def extract_by_density(html):
+    """
+    Extract the main content of a page by text and link density
+
+    Args:
+        html: HTML of the page
+
+    Returns:
+        Extracted text content, or an empty string if no content block was found
+    """
+    extractor = DensityExtractor()
+    extractor.feed(html)
+    extractor.close()
+    return extractor.content()
@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+Regression checks for the density extractor on stored article pages.
+
+Compares the density extractor (with its fallback to the cascade for pages
+where it finds nothing) with the selector cascade on every page of the
+benchmark corpus, and optionally against snapshots of earlier density output.
+
+Usage:
+    python extraction_regression.py              # compare density with the cascade
+    python extraction_regression.py --snapshot   # store the current density output
+    python extraction_regression.py --check      # fail if output changed since the snapshot
+"""
+
+import os
+import io
+import sys
+import time
+import hashlib
+import argparse
+import contextlib
+from collections import Counter
+from article_extractor import extract_article_text
+from benchmark_parsers import load_corpus, similarity, CorpusMismatchError, DEFAULT_CORPUS_DIR
+
+def word_recall(expected, actual):
+    """
+    Fraction of the words of the expected text that also appear in the actual text
+    """
+    expected_words = Counter(expected.lower().split())
+    if not expected_words:
+        return 1.0
+    actual_words = Counter(actual.lower().split())
+    return sum((expected_words & actual_words).values()) / sum(expected_words.values())
+
+def snapshot_path(corpus_dir, url):
+    return os.path.join(corpus_dir, "expected", hashlib.sha1(url.encode('utf-8')).hexdigest()[:16] + ".txt")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare the density extractor with the selector cascade")
+    parser.add_argument("--corpus", default=DEFAULT_CORPUS_DIR, help="Directory of saved article pages")
+    parser.add_argument("--min-recall", type=float, default=0.8,
+                        help="Fail if the density output misses more of a page's cascade words than this allows")
+    parser.add_argument("--snapshot", action="store_true", help="Store the density output as the expected output")
+    parser.add_argument("--check", action="store_true", help="Fail if density output differs from the snapshot")
+    parser.add_argument("--verbose", action="store_true", help="Show every page, not only regressions")
+    args = parser.parse_args(argv)
+
+    try:
+        pages = load_corpus(args.corpus)
+    except CorpusMismatchError as e:
+        print(f"Refusing to compare: {e}")
+        return 1
+    if not pages:
+        print(f"No pages in {args.corpus}; run benchmark_parsers.py --save first")
+        return 1
+
+    failures = 0
+    recalls = []
+    cascade_time = density_time = 0.0
+    for url, html in pages:
+        with contextlib.redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            cascade = extract_article_text(html, url, method="cascade")
+            cascade_time += time.perf_counter() - start
+            start = time.perf_counter()
+            density = extract_article_text(html, url, method="density")
+            density_time += time.perf_counter() - start
+
+        recall = word_recall(cascade[:10000], density)
+        recalls.append(recall)
+        problems = []
+        if recall < args.min_recall:
+            problems.append(f"recall {recall:.2f}")
+
+        path = snapshot_path(args.corpus, url)
+        if args.snapshot:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, 'w', encoding='utf-8') as f:
+                f.write(density)
+        elif args.check:
+            if not os.path.exists(path):
+                problems.append("no snapshot")
+            else:
+                with open(path, 'r', encoding='utf-8') as f:
+                    expected = f.read()
+                if expected != density:
+                    problems.append(f"changed since snapshot (similarity {similarity(expected, density):.3f})")
+
+        if problems:
+            failures += 1
+        if problems or args.verbose:
+            print(f"{'FAIL' if problems else 'ok  '} {url}: cascade {len(cascade)} chars, "
+                  f"density {len(density)} chars, recall {recall:.2f} {'; '.join(problems)}")
+
+    print(f"{len(pages)} pages, mean recall {sum(recalls) / len(recalls):.3f}, "
+          f"{failures} failing; cascade {cascade_time:.2f}s, density {density_time:.2f}s")
+    if args.snapshot:
+        print(f"Stored {len(pages)} snapshots in {os.path.join(args.corpus, 'expected')}")
+    return 1 if failures else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
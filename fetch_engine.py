@@ -0,0 +1,389 @@
+import os
+import queue
+import inspect
+import multiprocessing
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, FIRST_COMPLETED, wait
+from concurrent.futures.process import BrokenProcessPool
+from web_utils import get_host
+
+DEFAULT_MAX_WORKERS = 4
+DEFAULT_POLITE_DELAY = (1.5, 4)
+DEFAULT_PARSE_WORKERS = os.cpu_count() or 1
+# Downloaded pages allowed to wait for a parser before downloads pause
+DEFAULT_QUEUE_SIZE = 16
+# No new fetch is started, and running fetches give up, when less than this many
+# seconds are left before the deadline
+DEFAULT_DEADLINE_MARGIN = 30
+# Parser processes start while download threads are running; a forked child could
+# inherit a lock, e.g. the one of stdout, held by one of them and hang on it
+PARSE_START_METHOD = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+# A parse pool whose process died is replaced this many times before the remaining
+# pages are left for the next run; extracting them in this process instead could
+# take the whole run down with the page that killed the parser
+MAX_PARSE_POOL_RESTARTS = 2
+# Seconds a download thread waits on a full queue before checking whether to stop
+QUEUE_PUT_INTERVAL = 1
+
+class FetchDeferred(Exception):
+    """
+    Result error for URLs that were not fetched because the deadline came first
+    """
+
+class HostScheduler:
+    """
+    Hand out fetch tasks so that each host only has one request in flight
+    and consecutive requests to the same host are separated by a polite delay.
+    Requests to different hosts are never delayed by each other. Among the
+    hosts that are ready, the task with the lowest index goes first, and no
+    task is handed out once the deadline is near.
+    """
+
+    def __init__(self, tasks, delay_range=DEFAULT_POLITE_DELAY, deadline=None,
+                 deadline_margin=DEFAULT_DEADLINE_MARGIN):
+        """
+        Args:
+            tasks: List of (index, url) tuples in the order they should be fetched
+            delay_range: (min, max) seconds to wait between requests to the same host
+            deadline: time.monotonic() value after which no work may run, or None
+            deadline_margin: Seconds before the deadline at which new tasks stop
+        """
+        self.delay_range = delay_range
+        self.stop_at = None if deadline is None else deadline - deadline_margin
+        self._cond = threading.Condition()
+        self._pending = {}
+        self._busy = set()
+        self._next_allowed = {}
+        for index, url in tasks:
+            self._pending.setdefault(get_host(url), deque()).append((index, url))
+
+    def next_task(self):
+        """
+        Block until a task whose host is ready is available
+
+        Returns:
+            (index, url) tuple, or None when there is nothing left to fetch
+            or the deadline is near
+        """
+        with self._cond:
+            while True:
+                if not self._pending:
+                    return None
+                now = time.monotonic()
+                if self.stop_at is not None and now >= self.stop_at:
+                    return None
+                best_host = None
+                earliest = None
+                for host, queue in self._pending.items():
+                    if host in self._busy:
+                        continue
+                    ready_at = self._next_allowed.get(host, 0)
+                    if ready_at <= now:
+                        # Prefer the task that came first in the original order
+                        if best_host is None or queue[0][0] < self._pending[best_host][0][0]:
+                            best_host = host
+                    elif earliest is None or ready_at < earliest:
+                        earliest = ready_at
+                if best_host is not None:
+                    queue = self._pending[best_host]
+                    task = queue.popleft()
+                    if not queue:
+                        del self._pending[best_host]
+                    self._busy.add(best_host)
+                    return task
+                timeout = None if earliest is None else earliest - now
+                if self.stop_at is not None:
+                    timeout = self.stop_at - now if timeout is None else min(timeout, self.stop_at - now)
+                self._cond.wait(timeout=timeout)
+
+    def task_done(self, url):
+        """
+        Release the host of a finished task and schedule its polite delay
+
+        Args:
+            url: URL of the task that finished
+        """
+        host = get_host(url)
+        with self._cond:
+            self._busy.discard(host)
+            self._next_allowed[host] = time.monotonic() + random.uniform(*self.delay_range)
+            self._cond.notify_all()
+
+class FetchResults:
+    """
+    Results of a batch of fetches in URL order, each handed to an optional
+    callback as soon as its URL is done, so callers can store it right away.
+    Callbacks run one at a time; URLs never fetched are reported last with
+    a FetchDeferred error.
+    """
+
+    def __init__(self, count, on_result=None):
+        """
+        Args:
+            count: Number of URLs in the batch
+            on_result: Optional function taking (index, result, error)
+        """
+        self.items = [(None, FetchDeferred("Deadline reached before the fetch started"))] * count
+        self._pending = set(range(count))
+        self._on_result = on_result
+        self._lock = threading.Lock()
+
+    def set(self, index, result, error=None):
+        """
+        Record the outcome of one URL and report it to the callback
+        """
+        self.items[index] = (result, error)
+        with self._lock:
+            self._pending.discard(index)
+            if self._on_result is not None:
+                self._on_result(index, result, error)
+
+    def finish(self):
+        """
+        Report the URLs that were never fetched
+
+        Returns:
+            List of (result, error) tuples in URL order
+        """
+        for index in sorted(self._pending):
+            self.set(index, *self.items[index])
+        return self.items
+
+def accepts_keyword(function, name):
+    """
+    Check whether a function can be called with a keyword argument
+
+    Args:
+        function: Function, functools.partial or other callable
+        name: Keyword argument name
+
+    Returns:
+        True if the function takes the argument by name or takes **kwargs
+    """
+    try:
+        parameters = inspect.signature(function).parameters.values()
+    except (TypeError, ValueError):
+        return False
+    return any(parameter.kind == parameter.VAR_KEYWORD or
+               (parameter.name == name and parameter.kind != parameter.POSITIONAL_ONLY)
+               for parameter in parameters)
+
+def _task_kwargs(fetch_kwargs, index, scheduler, pass_deadline):
+    kwargs = dict(fetch_kwargs[index]) if fetch_kwargs else {}
+    if pass_deadline and scheduler.stop_at is not None:
+        # Retries, backoff and slow bodies of a running fetch must not run past it either
+        kwargs["deadline"] = scheduler.stop_at
+    return kwargs
+
+def fetch_all(urls, fetch_url_content, max_workers=DEFAULT_MAX_WORKERS, delay_range=DEFAULT_POLITE_DELAY,
+              fetch_kwargs=None, deadline=None, on_result=None):
+    """
+    Fetch a list of URLs concurrently with per-host politeness
+
+    Args:
+        urls: List of URLs to fetch
+        fetch_url_content: Function taking a URL and returning its content
+        max_workers: Maximum number of fetches running at the same time
+        delay_range: (min, max) seconds to wait between requests to the same host
+        fetch_kwargs: Optional list of keyword argument dictionaries, one per URL,
+            passed on to fetch_url_content
+        deadline: time.monotonic() value; URLs are fetched in list order of priority
+            and those not started before the deadline nears are skipped. With a
+            deadline, a fetch_url_content accepting a "deadline" keyword argument is
+            passed the time by which a running fetch has to give up
+        on_result: Optional function taking (index, content, error), called once per
+            URL as soon as it is done, see FetchResults
+
+    Returns:
+        List of (content, error) tuples in the same order as urls, where error
+        is the exception raised by fetch_url_content, a FetchDeferred for URLs
+        skipped because of the deadline, or None
+    """
+    results = FetchResults(len(urls), on_result)
+    if not urls:
+        return results.items
+
+    scheduler = HostScheduler(list(enumerate(urls)), delay_range, deadline)
+    pass_deadline = accepts_keyword(fetch_url_content, "deadline")
+
+    def worker():
+        while True:
+            task = scheduler.next_task()
+            if task is None:
+                return
+            index, url = task
+            try:
+                print(f"Fetching content from {url}")
+                kwargs = _task_kwargs(fetch_kwargs, index, scheduler, pass_deadline)
+                outcome = (fetch_url_content(url, **kwargs), None)
+            except Exception as e:
+                outcome = (None, e)
+            finally:
+                scheduler.task_done(url)
+            results.set(index, *outcome)
+
+    worker_count = max(1, min(max_workers, len(urls)))
+    with ThreadPoolExecutor(max_workers=worker_count) as executor:
+        futures = [executor.submit(worker) for _ in range(worker_count)]
+        for future in futures:
+            future.result()
+
+    return results.finish()
+
+def fetch_and_extract_all(urls, download, extract, max_workers=DEFAULT_MAX_WORKERS,
+                          parse_workers=DEFAULT_PARSE_WORKERS, delay_range=DEFAULT_POLITE_DELAY,
+                          fetch_kwargs=None, queue_size=DEFAULT_QUEUE_SIZE, deadline=None, on_result=None):
+    """
+    Download URLs on I/O threads and extract them on a process pool.
+
+    Download threads only fetch raw pages and hand them over through a bounded
+    queue, so a slow parse never holds up the network and downloads pause when
+    the parsers fall behind. Extraction runs on all cores. Pages whose parser
+    process died get a FetchDeferred error, as the page itself may be fine,
+    and the pool is replaced; if it keeps dying, the rest of the batch is
+    deferred as well.
+
+    Args:
+        urls: List of URLs to fetch
+        download: Picklable-result function taking a URL and returning a downloaded page
+        extract: Picklable function taking (page, url) and returning the final result
+        max_workers: Maximum number of downloads running at the same time
+        parse_workers: Number of extraction processes; 0 extracts on the calling thread
+        delay_range: (min, max) seconds to wait between requests to the same host
+        fetch_kwargs: Optional list of keyword argument dictionaries, one per URL,
+            passed on to download
+        queue_size: Maximum number of downloaded pages waiting to be parsed
+        deadline: time.monotonic() value; URLs are downloaded in list order of priority
+            and those not started before the deadline nears are skipped. With a
+            deadline, a download accepting a "deadline" keyword argument is passed
+            the time by which a running download has to give up
+        on_result: Optional function taking (index, result, error), called once per
+            URL as soon as it is extracted or failed, see FetchResults
+
+    Returns:
+        List of (result, error) tuples in the same order as urls, where error
+        is the exception raised by download or extract, a FetchDeferred for URLs
+        skipped because of the deadline or whose parser process died, or None
+    """
+    results = FetchResults(len(urls), on_result)
+    if not urls:
+        return results.items
+
+    scheduler = HostScheduler(list(enumerate(urls)), delay_range, deadline)
+    pass_deadline = accepts_keyword(download, "deadline")
+    pages = queue.Queue(maxsize=queue_size)
+    # Set when the pages are no longer read, so no download thread waits on a full queue forever
+    stop = threading.Event()
+
+    def hand_over(item):
+        # Blocks while the parsers are behind
+        while not stop.is_set():
+            try:
+                pages.put(item, timeout=QUEUE_PUT_INTERVAL)
+                return
+            except queue.Full:
+                pass
+
+    def downloader():
+        try:
+            while not stop.is_set():
+                task = scheduler.next_task()
+                if task is None:
+                    return
+                index, url = task
+                try:
+                    print(f"Fetching content from {url}")
+                    kwargs = _task_kwargs(fetch_kwargs, index, scheduler, pass_deadline)
+                    item = (index, url, download(url, **kwargs), None)
+                except Exception as e:
+                    item = (index, url, None, e)
+                finally:
+                    scheduler.task_done(url)
+                hand_over(item)
+        finally:
+            hand_over(None)
+
+    def new_parse_pool():
+        return ProcessPoolExecutor(max_workers=parse_workers,
+                                   mp_context=multiprocessing.get_context(PARSE_START_METHOD))
+
+    def collect(futures):
+        for future in futures:
+            index = in_flight.pop(future)
+            try:
+                outcome = (future.result(), None)
+            except BrokenProcessPool:
+                # A parser process died, possibly on another page; try again next run
+                outcome = (None, FetchDeferred("Parser process died before the page was extracted"))
+            except Exception as e:
+                outcome = (None, e)
+            results.set(index, *outcome)
+
+    def extract_page(index, url, page):
+        nonlocal parse_pool, pool_restarts
+        if parse_pool is None:
+            try:
+                outcome = (extract(page, url), None)
+            except Exception as e:
+                outcome = (None, e)
+            results.set(index, *outcome)
+            return
+        while True:
+            try:
+                in_flight[parse_pool.submit(extract, page, url)] = index
+                return
+            except BrokenProcessPool:
+                parse_pool.shutdown(wait=False, cancel_futures=True)
+                if pool_restarts >= MAX_PARSE_POOL_RESTARTS:
+                    print("Parser processes keep dying; leaving the remaining pages for the next run")
+                    results.set(index, None, FetchDeferred("Parser processes kept dying"))
+                    stop.set()
+                    return
+                print("A parser process died; starting new parser processes")
+                pool_restarts += 1
+                parse_pool = new_parse_pool()
+
+    worker_count = max(1, min(max_workers, len(urls)))
+    parse_pool = new_parse_pool() if parse_workers else None
+    pool_restarts = 0
+    in_flight = {}
+    try:
+        with ThreadPoolExecutor(max_workers=worker_count) as io_pool:
+            for _ in range(worker_count):
+                io_pool.submit(downloader)
+
+            try:
+                finished = 0
+                while finished < worker_count and not stop.is_set():
+                    # Report finished extractions while waiting for the next page
+                    collect([future for future in in_flight if future.done()])
+                    try:
+                        item = pages.get(timeout=1)
+                    except queue.Empty:
+                        continue
+                    if item is None:
+                        finished += 1
+                        continue
+                    index, url, page, error = item
+                    if error is not None:
+                        results.set(index, None, error)
+                        continue
+                    # Keep the pages handed to the pool bounded as well
+                    while len(in_flight) >= queue_size:
+                        done, _ = wait(list(in_flight), return_when=FIRST_COMPLETED)
+                        collect(done)
+                    extract_page(index, url, page)
+            finally:
+                # Let the download threads finish if this loop failed, so leaving
+                # the executor does not wait on them forever
+                stop.set()
+
+        collect(wait(list(in_flight)).done)
+    finally:
+        if parse_pool is not None:
+            parse_pool.shutdown(cancel_futures=True)
+
+    return results.finish()
@@ -0,0 +1,37 @@
+import os
+import tempfile
+import contextlib
+
+# Generated files are committed and served next to the dashboard
+DEFAULT_FILE_MODE = 0o644
+
+@contextlib.contextmanager
+def atomic_write(path, mode='w', encoding='utf-8', newline=None, file_mode=DEFAULT_FILE_MODE):
+    """
+    Write a file through a temporary file next to it that replaces it atomically
+
+    Readers never see a half-written file, and the old file stays in place
+    if writing fails.
+
+    Args:
+        path: File to write
+        mode: 'w' for text or 'wb' for bytes
+        encoding: Text encoding, ignored in binary mode
+        newline: Newline translation as for open(), e.g. '' for the csv module
+        file_mode: Permissions of the written file; mkstemp would leave it
+            readable by its owner only
+
+    Yields:
+        The open temporary file
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, temp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    try:
+        binary = 'b' in mode
+        with os.fdopen(fd, mode, encoding=None if binary else encoding, newline=None if binary else newline) as f:
+            yield f
+        os.chmod(temp_path, file_mode)
+        os.replace(temp_path, path)
+    except BaseException:
+        os.unlink(temp_path)
+        raise
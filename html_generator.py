@@ -1,6 +1,16 @@
+import re
 import html
-import datetime
 import json
+import datetime
+from file_utils import atomic_write
+
+TIMESTAMP_PATTERN = re.compile(r'(<p class="timestamp">Last updated: )(\d{4}-\d{2}-\d{2})')
+
+def current_date():
+    """
+    Date shown as the last update of the dashboard, without time components
+    """
+    return datetime.datetime.now().strftime('%Y-%m-%d')
 
 def generate_html_head_and_styles():
     """
@@ -244,26 +254,24 @@ def generate_html_head_and_styles():
     <div class="news-grid">
 """
 
-def generate_news_items_html(news_items):
+def iter_news_items_html(news_items):
     """
-    Generate HTML for each news item
+    Generate the HTML of the news item cards one card at a time
     
     Args:
-        news_items: List of news items as dictionaries
+        news_items: Iterable of NewsItem records
         
-    Returns:
-        HTML string containing all news item cards
+    Yields:
+        HTML string of one news item card
     """
-    html_content = ""
     for item in news_items:
-        # Convert all values to strings to avoid NoneType errors
-        company = html.escape(str(item.get("company", "")))
-        title = html.escape(str(item.get("title", "No title")))
-        url = html.escape(str(item.get("url", "#")))
-        source = html.escape(str(item.get("source", "Unknown source")))
-        body = html.escape(str(item.get("body", "No description available")))
-        date = html.escape(str(item.get("date", "")))
-        image = html.escape(str(item.get("image", "")))
+        company = html.escape(item.company)
+        title = html.escape(item.title)
+        url = html.escape(item.url)
+        source = html.escape(item.source)
+        body = html.escape(item.body)
+        date = html.escape(item.date)
+        image = html.escape(item.image)
         
         # Only add company tag if we found a valid company name
         company_tag = f'<span class="company-tag">{company}</span>' if company else ''
@@ -279,7 +287,7 @@ def generate_news_items_html(news_items):
             title_html = f'<h3 class="news-title"><a href="{url}" target="_blank">{title}</a></h3>'
             date_html = f'<div class="news-date">{date}</div>'
         
-        html_content += f"""
+        yield f"""
     <div class="news-card">
         {company_tag}
         {image_html}
@@ -289,24 +297,38 @@ def generate_news_items_html(news_items):
         {date_html}
     </div>
     """
-    return html_content
 
-def generate_chatbot_html(news_data_for_js):
+def iter_script_json(value):
     """
-    Generate the HTML for the chatbot section
+    Encode a value as JSON for an inline <script> block, chunk by chunk
+    
+    "</" is written as "<\\/" so article text containing "</script>" cannot
+    close the block early. Strings are encoded as single chunks, so no
+    "</" is ever split between two chunks.
     
     Args:
-        news_data_for_js: List of news items prepared for JavaScript
+        value: JSON-serializable value
         
-    Returns:
-        HTML string containing the chatbot section and closing tags
+    Yields:
+        JSON text chunks
+    """
+    for chunk in json.JSONEncoder().iterencode(value):
+        yield chunk.replace("</", "<\\/")
+
+def write_chatbot_html(out, card_data, data_manifest, js_code, debug=False):
     """
-    # Use date-only format without time components
-    current_date = datetime.datetime.now().strftime('%Y-%m-%d')
+    Write the chatbot section and closing tags
     
-    return f"""
+    Args:
+        out: Text file the dashboard is written to
+        card_data: Article metadata from data_shards.write_data_shards
+        data_manifest: Manifest of the article content shards, loaded by the chatbot on demand
+        js_code: Chatbot JavaScript, written at the script slot after the data
+        debug: Let the chatbot log its search steps to the browser console
+    """
+    out.write(f"""
     </div>
-    <p class="timestamp">Last updated: {current_date}<br>Please reload this web page by pressing shortcut keys — Command (⌘)-R on Mac or Ctrl+R on Windows — if date appears older than a week.</p>
+    <p class="timestamp">Last updated: {current_date()}<br>Please reload this web page by pressing shortcut keys — Command (⌘)-R on Mac or Ctrl+R on Windows — if date appears older than a week.</p>
     
     <!-- Chatbot UI - Added title attribute and more visible text -->
     <button class="chat-toggle-button" title="Open Chat Assistant">💬</button>
@@ -327,9 +349,62 @@ def generate_chatbot_html(news_data_for_js):
     </div>
     
     <script>
-        const newsData = {json.dumps(news_data_for_js)};
-        const DEBUG = true;
+        const newsData = """)
+    for chunk in iter_script_json(card_data):
+        out.write(chunk)
+    out.write(";\n        const newsDataManifest = ")
+    for chunk in iter_script_json(data_manifest):
+        out.write(chunk)
+    out.write(f""";
+        const DEBUG = {'true' if debug else 'false'};
+    """)
+    out.write(js_code)
+    out.write("""
     </script>
 </body>
 </html>
-"""
+""")
+
+def write_dashboard(path, news_items, card_data, data_manifest, js_code, debug=False):
+    """
+    Write the dashboard HTML section by section, replacing the file atomically
+    
+    Cards and article metadata are streamed to a temporary file next to the
+    dashboard, so the page is never held in memory as a whole and readers
+    never see a half-written file.
+    
+    Args:
+        path: Output file path
+        news_items: Iterable of NewsItem records shown as cards
+        card_data: Article metadata from data_shards.write_data_shards
+        data_manifest: Manifest of the article content shards
+        js_code: Chatbot JavaScript from js_generator.generate_chatbot_js
+        debug: Let the chatbot log its search steps to the browser console
+    """
+    with atomic_write(path) as out:
+        out.write(generate_html_head_and_styles())
+        for card in iter_news_items_html(news_items):
+            out.write(card)
+        write_chatbot_html(out, card_data, data_manifest, js_code, debug)
+
+def refresh_timestamp(path):
+    """
+    Set the last-updated date of an existing dashboard to today
+
+    Runs that find nothing to rebuild still checked the news, so the page
+    should not look stale.
+
+    Args:
+        path: Dashboard file path
+
+    Returns:
+        True if the file was rewritten
+    """
+    with open(path, 'r', encoding='utf-8', newline='') as f:
+        page = f.read()
+    updated = TIMESTAMP_PATTERN.sub(lambda match: match.group(1) + current_date(), page, count=1)
+    if updated == page:
+        return False
+    with atomic_write(path, newline='') as out:
+        out.write(updated)
+    return True
@@ -0,0 +1,118 @@
+from bs4 import BeautifulSoup
+
+# Optional faster parsers; extraction falls back to html.parser without them
+try:
+    import lxml  # noqa: F401
+    HAS_LXML = True
+except ImportError:
+    HAS_LXML = False
+
+try:
+    from selectolax.lexbor import LexborHTMLParser as SelectolaxParser
+    HAS_SELECTOLAX = True
+except ImportError:
+    try:
+        from selectolax.parser import HTMLParser as SelectolaxParser
+        HAS_SELECTOLAX = True
+    except ImportError:
+        HAS_SELECTOLAX = False
+
+# Fastest first; "auto" picks the first one that is installed
+BACKEND_PREFERENCE = ["selectolax", "lxml", "html.parser"]
+
+class SoupBackend:
+    """
+    BeautifulSoup backend, using either the pure-Python html.parser or lxml tree builder
+    """
+
+    def __init__(self, features='html.parser'):
+        self.name = features
+        self.features = features
+
+    def parse(self, html):
+        return BeautifulSoup(html, self.features)
+
+    def select(self, node, selector):
+        return node.select(selector)
+
+    def select_one(self, node, selector):
+        return node.select_one(selector)
+
+    def remove(self, node, selector):
+        for element in node.select(selector):
+            element.decompose()
+
+    def text(self, node, separator='', strip=False):
+        return node.get_text(separator=separator, strip=strip)
+
+    def body(self, document):
+        return document.body
+
+class SelectolaxBackend:
+    """
+    selectolax backend, a C HTML parser with its own node API
+    """
+
+    name = 'selectolax'
+
+    def __init__(self):
+        # skip_empty mirrors BeautifulSoup dropping whitespace-only strings when stripping,
+        # but only newer selectolax releases support it
+        try:
+            SelectolaxParser('<p> </p>').body.text(strip=True, skip_empty=True)
+            self._skip_empty = {'skip_empty': True}
+        except TypeError:
+            self._skip_empty = {}
+
+    def parse(self, html):
+        return SelectolaxParser(html)
+
+    def select(self, node, selector):
+        return node.css(selector)
+
+    def select_one(self, node, selector):
+        return node.css_first(selector)
+
+    def remove(self, node, selector):
+        for element in node.css(selector):
+            element.decompose()
+
+    def text(self, node, separator='', strip=False):
+        if strip:
+            return node.text(separator=separator, strip=True, **self._skip_empty)
+        return node.text(separator=separator)
+
+    def body(self, document):
+        return document.body
+
+def available_backends():
+    """
+    List the parser backends that can be used in this environment
+
+    Returns:
+        Backend names, fastest first
+    """
+    available = {"html.parser": True, "lxml": HAS_LXML, "selectolax": HAS_SELECTOLAX}
+    return [name for name in BACKEND_PREFERENCE if available[name]]
+
+def get_backend(name="auto"):
+    """
+    Create a parser backend by name
+
+    Args:
+        name: "html.parser", "lxml", "selectolax" or "auto" for the fastest installed one
+
+    Returns:
+        Backend object used by article_extractor
+
+    Raises:
+        ValueError: If the backend is unknown or its package is not installed
+    """
+    if name == "auto":
+        name = available_backends()[0]
+    if name not in available_backends():
+        raise ValueError(f"HTML parser backend '{name}' is not available "
+                         f"(available: {', '.join(available_backends())})")
+    if name == "selectolax":
+        return SelectolaxBackend()
+    return SoupBackend(name)
@@ -1,3 +1,6 @@
+import json
+from search_index import STOP_WORDS
+
 def generate_chatbot_js():
     """
     Generate the JavaScript code for the chatbot functionality
@@ -5,7 +8,362 @@ def generate_chatbot_js():
     Returns:
         JavaScript code as a string
     """
-    return """
+    # The query terms must be extracted like search_index.tokenize extracts article terms
+    return f"""
+        const SEARCH_STOP_WORDS = {json.dumps(sorted(STOP_WORDS))};""" + """
+        
+        // Chatbot search. It runs in a Web Worker built from the source of this
+        // function, or on the page where workers are unavailable, and must not
+        // use anything from outside it. The card data arrives once in an "init"
+        // message; "query" and "snippet" messages are answered with the same id.
+        function chatbotSearchWorker(scope) {
+            const BM25_K1 = 1.2;
+            const BM25_B = 0.75;
+            // Scales BM25 to the company boosts below
+            const BM25_WEIGHT = 2;
+            const QUERY_CACHE_SIZE = 50;
+            
+            let DEBUG = false;
+            let newsData = [];
+            let newsDataManifest = {shards: []};
+            let stopWords = new Set();
+            const articlesByCompany = new Map();
+            // Results of recent questions, least recently used first
+            const queryCache = new Map();
+            
+            // Full article texts live in content-hashed shards next to the page
+            // and are fetched once, the first time a question needs them
+            let contentLoading = null;
+            // Inverted index built by search_index.py, loaded with the content
+            let searchIndex = null;
+            let namedArticles = new Set();
+            
+            function init(message) {
+                DEBUG = message.debug;
+                newsData = message.articles;
+                newsDataManifest = message.manifest;
+                stopWords = new Set(message.stopWords);
+                newsData.forEach((article, doc) => {
+                    const company = article.company.toLowerCase();
+                    if (!articlesByCompany.has(company)) articlesByCompany.set(company, []);
+                    articlesByCompany.get(company).push(doc);
+                });
+            }
+            
+            function fetchJson(url) {
+                return fetch(url).then(response => {
+                    if (!response.ok) throw new Error(`${url}: HTTP ${response.status}`);
+                    return response.json();
+                });
+            }
+            
+            function loadFullContent() {
+                if (!contentLoading) {
+                    const articlesByShard = newsDataManifest.shards.map(() => []);
+                    newsData.forEach(article => articlesByShard[article.shard].push(article));
+                    const shardsLoaded = newsDataManifest.shards.map((url, shard) =>
+                        fetchJson(url).then(contents => {
+                            articlesByShard[shard].forEach(article => {
+                                const [text, paragraphs, lead] = contents[article.offset];
+                                article.full_content = text;
+                                article.paragraphs = paragraphs.map(([start, end, sentences]) => [
+                                    start, end,
+                                    sentences.map(([from, to, terms]) => [from, to, new Set(terms.split(' '))])
+                                ]);
+                                article.lead = lead;
+                            });
+                        })
+                    );
+                    const indexLoaded = fetchJson(newsDataManifest.index).then(index => {
+                        searchIndex = index;
+                        namedArticles = new Set(index.names);
+                    });
+                    contentLoading = Promise.all([...shardsLoaded, indexLoaded]).catch(error => {
+                        // Answer from titles and summaries, and try again on the next question
+                        console.error('Could not load the article content:', error);
+                        contentLoading = null;
+                    });
+                }
+                return contentLoading;
+            }
+            
+            // Terms are extracted the same way search_index.py tokenizes articles
+            function tokenize(text) {
+                return text.toLowerCase()
+                    .replace(/[^a-z0-9]+/g, ' ')
+                    .split(' ')
+                    .filter(term => term.length > 2 && !stopWords.has(term));
+            }
+            
+            function bm25Scores(terms) {
+                const scores = new Map();
+                const matched = new Map();
+                if (!searchIndex) {
+                    // Without the index only the titles and summaries can be searched
+                    newsData.forEach((article, doc) => {
+                        const text = (article.title + ' ' + article.body).toLowerCase();
+                        terms.forEach(term => {
+                            if (text.includes(term)) {
+                                scores.set(doc, (scores.get(doc) || 0) + 1);
+                                matched.set(doc, (matched.get(doc) || 0) + 1);
+                            }
+                        });
+                    });
+                    return {scores, matched};
+                }
+                const {count, avgdl, lengths, postings} = searchIndex;
+                new Set(terms).forEach(term => {
+                    const list = postings[term];
+                    if (!list) return;
+                    const df = list.length / 2;
+                    const idf = Math.log(1 + (count - df + 0.5) / (df + 0.5));
+                    for (let i = 0; i < list.length; i += 2) {
+                        const doc = list[i];
+                        const tf = list[i + 1];
+                        const norm = tf + BM25_K1 * (1 - BM25_B + BM25_B * lengths[doc] / avgdl);
+                        scores.set(doc, (scores.get(doc) || 0) + idf * tf * (BM25_K1 + 1) / norm);
+                        matched.set(doc, (matched.get(doc) || 0) + 1);
+                    }
+                });
+                return {scores, matched};
+            }
+            
+            function companyScore(company, lowerQuestion, keywords, isCompanyQuery) {
+                if (!company) return 0;
+                let score = 0;
+                
+                if (lowerQuestion.includes(company)) {
+                    score += 15;
+                }
+                
+                if (lowerQuestion.trim() === company) {
+                    score += 30;
+                }
+                
+                if (lowerQuestion.trim().startsWith(company)) {
+                    score += 25;
+                }
+                if (company.startsWith(lowerQuestion.trim())) {
+                    score += 20;
+                }
+                
+                if (isCompanyQuery && !company.includes(lowerQuestion) && !lowerQuestion.includes(company)) {
+                    const companyFirstWord = company.split(' ')[0].toLowerCase();
+                    const queryFirstWord = lowerQuestion.trim().split(' ')[0].toLowerCase();
+                    
+                    if (companyFirstWord !== queryFirstWord) {
+                        score -= 50;
+                    }
+                }
+                
+                keywords.forEach(keyword => {
+                    if (keyword.length > 2 && company === keyword) {
+                        score += 18;
+                    }
+                    else if (keyword.length > 2 && company.includes(keyword)) {
+                        score += 5;
+                    }
+                    if (keyword.length > 2 && keyword.includes(company)) {
+                        score += 10;
+                    }
+                });
+                
+                return score;
+            }
+            
+            // Paragraphs and sentences are segmented by search_index.py, so picking
+            // the passage to quote only compares the question terms with term sets
+            function bestSnippet(article, terms) {
+                const content = article.full_content;
+                if (!content) return '';
+                let best = null;
+                let bestCount = 0;
+                (article.paragraphs || []).forEach(([start, end, sentences]) => {
+                    const found = new Set();
+                    let bestSentence = null;
+                    let bestSentenceCount = 0;
+                    sentences.forEach(([from, to, sentenceTerms]) => {
+                        const count = terms.filter(term => sentenceTerms.has(term)).length;
+                        terms.forEach(term => { if (sentenceTerms.has(term)) found.add(term); });
+                        if (count > bestSentenceCount) {
+                            bestSentence = from;
+                            bestSentenceCount = count;
+                        }
+                    });
+                    if (found.size > bestCount) {
+                        // Long paragraphs are quoted from their best sentence on
+                        best = [end - start > 300 ? bestSentence : start, end];
+                        bestCount = found.size;
+                    }
+                });
+                if (best) {
+                    const passage = content.substring(best[0], best[1]);
+                    return passage.length > 300 ? passage.substring(0, 300) + '...' : passage;
+                }
+                if (article.lead) {
+                    return content.substring(article.lead[0], article.lead[1]);
+                }
+                return content.substring(0, 300);
+            }
+            
+            function companyExists(lowerQuestion) {
+                const allCompanies = [...articlesByCompany.keys()];
+                if (DEBUG) {
+                    console.log('All companies:', allCompanies);
+                }
+                
+                const exactCompanyMatch = allCompanies.find(company =>
+                    company.toLowerCase() === lowerQuestion.trim()
+                );
+                
+                const validPartialMatch = allCompanies.some(company => {
+                    const companyWords = company.toLowerCase().split(/\\s+/);
+                    const queryWords = lowerQuestion.toLowerCase().trim().split(/\\s+/);
+                    
+                    if (company.toLowerCase() === lowerQuestion.toLowerCase().trim()) {
+                        return true;
+                    }
+                    
+                    if (company.toLowerCase().includes(lowerQuestion.toLowerCase().trim())) {
+                        return true;
+                    }
+                    
+                    if (lowerQuestion.toLowerCase().trim().includes(company.toLowerCase())) {
+                        return true;
+                    }
+                    
+                    if (companyWords.length > 1) {
+                        if (queryWords.includes(companyWords[0]) && companyWords[0].length > 3) {
+                            return true;
+                        }
+                        
+                        const queryPhrase = queryWords.join(' ');
+                        
+                        for (let i = 0; i < companyWords.length - 1; i++) {
+                            const phrase = companyWords[i] + ' ' + companyWords[i+1];
+                            if (queryPhrase.includes(phrase)) {
+                                return true;
+                            }
+                        }
+                    }
+                    
+                    return false;
+                });
+                
+                return exactCompanyMatch !== undefined || validPartialMatch;
+            }
+            
+            // Ranks the articles for a question; returns {missingCompany, terms, results, snippet}
+            // where results are {doc, score} best first and snippet quotes the best article
+            function search(question) {
+                const lowerQuestion = question.toLowerCase();
+                
+                if (DEBUG) {
+                    console.log('Processing query:', question);
+                    console.log('Available articles:', newsData.length);
+                }
+                
+                const isCompanyQuery = lowerQuestion.split(' ').length <= 3;
+                
+                if (isCompanyQuery && !companyExists(lowerQuestion)) {
+                    return {missingCompany: true, terms: [], results: [], snippet: ''};
+                }
+                
+                let keywords = [];
+                
+                const quoteRegex = /"([^"]+)"/g;
+                let quoteMatch;
+                while ((quoteMatch = quoteRegex.exec(question)) !== null) {
+                    keywords.push(quoteMatch[1].toLowerCase());
+                }
+                
+                const terms = tokenize(lowerQuestion);
+                keywords = [...keywords, ...terms];
+                
+                if (DEBUG) {
+                    console.log('Extracted keywords:', keywords);
+                }
+                
+                // Company boosts are worked out once per company, text relevance
+                // from the postings of the query terms only
+                const companyScores = new Map();
+                articlesByCompany.forEach((docs, company) => {
+                    companyScores.set(company, companyScore(company, lowerQuestion, keywords, isCompanyQuery));
+                });
+                const {scores: textScores, matched} = bm25Scores(terms);
+                
+                const candidates = new Set(textScores.keys());
+                companyScores.forEach((boost, company) => {
+                    if (boost > 0) articlesByCompany.get(company).forEach(doc => candidates.add(doc));
+                });
+                
+                const asksForPerson = lowerQuestion.includes('who') || lowerQuestion.includes('person');
+                const uniqueTerms = new Set(terms).size;
+                const results = [];
+                candidates.forEach(doc => {
+                    const article = newsData[doc];
+                    let score = companyScores.get(article.company.toLowerCase()) || 0;
+                    score += BM25_WEIGHT * (textScores.get(doc) || 0);
+                    
+                    // Every term of a longer question appears in the article
+                    if (uniqueTerms > 1 && matched.get(doc) === uniqueTerms) {
+                        score += 10;
+                    }
+                    
+                    if (asksForPerson && searchIndex && namedArticles.has(doc)) {
+                        score += 2;
+                    }
+                    
+                    if (score > 0) {
+                        if (DEBUG) {
+                            console.log(`Article: ${article.title}, Score: ${score}`);
+                        }
+                        results.push({doc, score});
+                    }
+                });
+                
+                results.sort((a, b) => b.score - a.score);
+                const snippet = results.length > 0 ? bestSnippet(newsData[results[0].doc], terms) : '';
+                return {missingCompany: false, terms, results, snippet};
+            }
+            
+            function cachedSearch(question) {
+                const key = question.toLowerCase();
+                if (queryCache.has(key)) {
+                    const result = queryCache.get(key);
+                    queryCache.delete(key);
+                    queryCache.set(key, result);
+                    return result;
+                }
+                const result = search(question);
+                // Answers given without the index are not worth keeping
+                if (searchIndex) {
+                    queryCache.set(key, result);
+                    if (queryCache.size > QUERY_CACHE_SIZE) {
+                        queryCache.delete(queryCache.keys().next().value);
+                    }
+                }
+                return result;
+            }
+            
+            scope.onmessage = event => {
+                const message = event.data;
+                if (message.type === 'init') {
+                    init(message);
+                    return;
+                }
+                loadFullContent().then(() => {
+                    let result = null;
+                    if (message.type === 'query') {
+                        result = cachedSearch(message.question);
+                    } else if (message.type === 'snippet') {
+                        result = bestSnippet(newsData[message.doc], message.terms);
+                    }
+                    scope.postMessage({id: message.id, result});
+                });
+            };
+        }
+        
         document.addEventListener('DOMContentLoaded', () => {
             const chatToggle = document.querySelector('.chat-toggle-button');
             const chatContainer = document.querySelector('.chatbot-container');
@@ -33,6 +391,68 @@ def generate_chatbot_js():
                 }, 300);
             });
             
+            // Searching runs off the main thread so the page stays responsive
+            // however many articles there are
+            let searchWorker = null;
+            let nextRequestId = 0;
+            const pendingRequests = new Map();
+            
+            function startSearch(onPage) {
+                searchWorker = onPage ? createPageSearch() : createSearchWorker();
+                searchWorker.onmessage = event => {
+                    const request = pendingRequests.get(event.data.id);
+                    if (request) {
+                        pendingRequests.delete(event.data.id);
+                        request.resolve(event.data.result);
+                    }
+                };
+                // A worker built from a blob: URL cannot resolve relative URLs
+                const absolute = url => new URL(url, location.href).href;
+                searchWorker.postMessage({
+                    type: 'init',
+                    articles: newsData,
+                    manifest: {shards: newsDataManifest.shards.map(absolute), index: absolute(newsDataManifest.index)},
+                    stopWords: SEARCH_STOP_WORDS,
+                    debug: DEBUG
+                });
+                pendingRequests.forEach((request, id) => searchWorker.postMessage({id, ...request.message}));
+            }
+            
+            function createSearchWorker() {
+                try {
+                    const source = '(' + chatbotSearchWorker.toString() + ')(self);';
+                    const worker = new Worker(URL.createObjectURL(new Blob([source], {type: 'text/javascript'})));
+                    worker.onerror = error => {
+                        // E.g. a content security policy refusing blob: workers
+                        console.error('Search worker failed, searching on the page instead:', error.message);
+                        worker.terminate();
+                        startSearch(true);
+                    };
+                    return worker;
+                } catch (error) {
+                    console.error('Search worker unavailable, searching on the page instead:', error);
+                    return createPageSearch();
+                }
+            }
+            
+            function createPageSearch() {
+                const page = {onmessage: null};
+                const scope = {postMessage: data => setTimeout(() => page.onmessage({data}))};
+                chatbotSearchWorker(scope);
+                page.postMessage = data => setTimeout(() => scope.onmessage({data}));
+                return page;
+            }
+            
+            function callSearch(message) {
+                return new Promise(resolve => {
+                    const id = nextRequestId++;
+                    pendingRequests.set(id, {message, resolve});
+                    searchWorker.postMessage({id, ...message});
+                });
+            }
+            
+            startSearch(false);
+            
             function sendMessage() {
                 const question = chatInput.value.trim();
                 if (!question) return;
@@ -90,294 +510,97 @@ def generate_chatbot_js():
             function processQuery(question) {
                 const lowerQuestion = question.toLowerCase();
                 
-                if (DEBUG) {
-                    console.log('Processing query:', question);
-                    console.log('Available articles:', newsData.length);
-                }
-                
-                const isCompanyQuery = lowerQuestion.split(' ').length <= 3;
-                
-                if (isCompanyQuery) {
-                    const allCompanies = [...new Set(newsData.map(article => article.company.toLowerCase()))];
-                    console.log('All companies:', allCompanies);
-                    
-                    const exactCompanyMatch = allCompanies.find(company => 
-                        company.toLowerCase() === lowerQuestion.trim()
-                    );
-                    
-                    const validPartialMatch = allCompanies.some(company => {
-                        const companyWords = company.toLowerCase().split(/\\s+/);
-                        const queryWords = lowerQuestion.toLowerCase().trim().split(/\\s+/);
-                        
-                        if (company.toLowerCase() === lowerQuestion.toLowerCase().trim()) {
-                            return true;
-                        }
-                        
-                        if (company.toLowerCase().includes(lowerQuestion.toLowerCase().trim())) {
-                            return true;
-                        }
-                        
-                        if (lowerQuestion.toLowerCase().trim().includes(company.toLowerCase())) {
-                            return true;
-                        }
-                        
-                        if (companyWords.length > 1) {
-                            if (queryWords.includes(companyWords[0]) && companyWords[0].length > 3) {
-                                return true;
-                            }
-                            
-                            const companyPhrase = companyWords.join(' ');
-                            const queryPhrase = queryWords.join(' ');
-                            
-                            for (let i = 0; i < companyWords.length - 1; i++) {
-                                const phrase = companyWords[i] + ' ' + companyWords[i+1];
-                                if (queryPhrase.includes(phrase)) {
-                                    return true;
-                                }
-                            }
-                        }
-                        
-                        return false;
-                    });
-                    
-                    const companyExists = exactCompanyMatch !== undefined || validPartialMatch;
-                    
-                    if (!companyExists) {
+                callSearch({type: 'query', question}).then(({missingCompany, terms, results, snippet}) => {
+                    if (missingCompany) {
                         addMessage(`I'm sorry, I don't have any news articles about "${lowerQuestion}". Would you like information about another company?`, 'bot');
                         conversationState.mode = 'initial';
                         return;
                     }
-                }
-                
-                let keywords = [];
-                
-                const quoteRegex = /"([^"]+)"/g;
-                let quoteMatch;
-                while ((quoteMatch = quoteRegex.exec(question)) !== null) {
-                    keywords.push(quoteMatch[1].toLowerCase());
-                }
-                
-                const stopWords = new Set([
-                    'a', 'an', 'the', 'and', 'or', 'but', 'is', 'are', 'was', 'were', 
-                    'to', 'of', 'in', 'on', 'at', 'by', 'for', 'with', 'about', 'from',
-                    'these', 'those', 'this', 'that', 'have', 'has', 'had', 'do', 'does',
-                    'did', 'can', 'could', 'will', 'would', 'should', 'may', 'might'
-                ]);
-                
-                const wordKeywords = lowerQuestion
-                    .replace(/[^a-zA-Z0-9 ]/g, ' ')
-                    .split(' ')
-                    .filter(word => word.length > 2 && !stopWords.has(word.toLowerCase()));
-                    
-                keywords = [...keywords, ...wordKeywords];
-                
-                if (DEBUG) {
-                    console.log('Extracted keywords:', keywords);
-                }
-                
-                let relevantArticles = [];
-                newsData.forEach(article => {
-                    let score = 0;
-                    const title = article.title.toLowerCase();
-                    const body = article.body.toLowerCase();
-                    const fullContent = article.full_content ? article.full_content.toLowerCase() : '';
-                    const company = article.company.toLowerCase();
-                    
-                    if (company && lowerQuestion.includes(company)) {
-                        score += 15;
-                    }
-                    
-                    if (company && lowerQuestion.trim() === company) {
-                        score += 30;
-                    }
-                    
-                    if (company && lowerQuestion.trim().startsWith(company)) {
-                        score += 25;
-                    }
-                    if (company && company.startsWith(lowerQuestion.trim())) {
-                        score += 20;
-                    }
                     
-                    if (isCompanyQuery && company && !company.includes(lowerQuestion) && !lowerQuestion.includes(company)) {
-                        const companyFirstWord = company.split(' ')[0].toLowerCase();
-                        const queryFirstWord = lowerQuestion.trim().split(' ')[0].toLowerCase();
-                        
-                        if (companyFirstWord !== queryFirstWord) {
-                            score -= 50;
-                        }
-                    }
+                    const relevantArticles = results.map(({doc, score}) => ({...newsData[doc], doc, score}));
                     
-                    if (fullContent && fullContent.includes(lowerQuestion)) {
-                        score += 10;
-                    }
+                    conversationState.relevantArticles = relevantArticles;
+                    conversationState.terms = terms;
+                    conversationState.currentArticleIndex = 0;
                     
-                    keywords.forEach(keyword => {
-                        if (company && keyword.length > 2 && company === keyword) {
-                            score += 18;
-                        }
-                        else if (company && keyword.length > 2 && company.includes(keyword)) {
-                            score += 5;
-                        }
-                        if (company && keyword.length > 2 && keyword.includes(company)) {
-                            score += 10;
+                    if (DEBUG) {
+                        console.log('Relevant articles found:', relevantArticles.length);
+                        if (relevantArticles.length > 0) {
+                            console.log('Top article:', relevantArticles[0].title);
+                            console.log('Top score:', relevantArticles[0].score);
                         }
-                        
-                        if (title.includes(keyword)) score += 5;
-                        if (body.includes(keyword)) score += 3;
-                        
-                        if (fullContent) {
-                            if (keyword.length > 10 && fullContent.includes(keyword)) {
-                                score += 8;
-                            } else if (fullContent.includes(keyword)) {
-                                score += 2;
-                            }
-                            
-                            const keywordRegex = new RegExp(keyword, 'gi');
-                            const occurrences = (fullContent.match(keywordRegex) || []).length;
-                            score += Math.min(occurrences, 5) * 0.5;
-                        }
-                    });
-                    
-                    if (lowerQuestion.includes('who') || lowerQuestion.includes('person')) {
-                        const nameRegex = /([A-Z][a-z]+ [A-Z][a-z]+)/g;
-                        const names = fullContent ? (fullContent.match(nameRegex) || []) : [];
-                        if (names.length > 0) score += 2;
                     }
                     
-                    if (score > 0) {
-                        if (DEBUG) {
-                            console.log(`Article: ${article.title}, Score: ${score}`);
-                        }
-                        relevantArticles.push({...article, score});
-                    }
-                });
-                
-                relevantArticles.sort((a, b) => b.score - a.score);
-                
-                conversationState.relevantArticles = relevantArticles;
-                conversationState.currentArticleIndex = 0;
-                
-                if (DEBUG) {
-                    console.log('Relevant articles found:', relevantArticles.length);
                     if (relevantArticles.length > 0) {
-                        console.log('Top article:', relevantArticles[0].title);
-                        console.log('Top score:', relevantArticles[0].score);
-                    }
-                }
-                
-                if (relevantArticles.length > 0) {
-                    const mostRelevant = relevantArticles[0];
-                    let response = "";
-                    
-                    let informativeSnippet = '';
-                    if (mostRelevant.full_content) {
-                        const fullContent = mostRelevant.full_content;
-                        
-                        const paragraphs = fullContent.split(/\\n+/)
-                            .filter(p => p.trim().length > 50);
+                        const mostRelevant = relevantArticles[0];
+                        let response = "";
                         
-                        let foundRelevantSnippet = false;
-                        for (const paragraph of paragraphs) {
-                            const lowerPara = paragraph.toLowerCase();
-                            const matchedKeywords = keywords.filter(kw => lowerPara.includes(kw));
-                            
-                            if (matchedKeywords.length >= 2) {
-                                informativeSnippet = paragraph.trim().substring(0, 300) + '...';
-                                foundRelevantSnippet = true;
-                                break;
-                            }
+                        if (lowerQuestion.includes('what') && lowerQuestion.includes('company')) {
+                            response = `${mostRelevant.company}: Based on the news, ${mostRelevant.company} has been mentioned in relation to: "${mostRelevant.title}"`;
+                        } else if (lowerQuestion.includes('latest') || lowerQuestion.includes('recent')) {
+                            response = `${mostRelevant.company}: The latest news I found is: "${mostRelevant.title}". ${mostRelevant.body.substring(0, 150)}`;
+                        } else if (snippet) {
+                            response = `${mostRelevant.company}: ${snippet}`;
+                        } else {
+                            response = `${mostRelevant.company}: ${mostRelevant.title} ${mostRelevant.body.substring(0, 150)}`;
                         }
                         
-                        if (!foundRelevantSnippet) {
-                            for (const paragraph of paragraphs) {
-                                if (keywords.some(keyword => paragraph.toLowerCase().includes(keyword))) {
-                                    informativeSnippet = paragraph.trim().substring(0, 300);
-                                    foundRelevantSnippet = true;
-                                    break;
-                                }
-                            }
-                        }
+                        addMessageWithCitation(response, `${mostRelevant.source}`, mostRelevant.url);
                         
-                        if (!foundRelevantSnippet && fullContent.length > 0) {
-                            if (fullContent.length > 500) {
-                                const middleStart = Math.floor(fullContent.length / 3);
-                                const middleContent = fullContent.substring(middleStart, middleStart + 500);
-                                const sentences = middleContent.split(/[.!?] /).filter(s => s.length > 30);
-                                
-                                if (sentences.length > 0) {
-                                    informativeSnippet = sentences[0].trim();
-                                } else {
-                                    informativeSnippet = fullContent.substring(0, 300);
-                                }
-                            } else {
-                                informativeSnippet = fullContent.substring(0, 300);
-                            }
+                        if (relevantArticles.length > 1) {
+                            setTimeout(() => {
+                                addMessage(`I also found ${relevantArticles.length - 1} more articles that might be relevant. Would you like to know more about any specific topic?`, 'bot');
+                                conversationState.mode = 'offering_more';
+                            }, 1000);
                         }
-                    }
-                    
-                    if (lowerQuestion.includes('what') && lowerQuestion.includes('company')) {
-                        response = `${mostRelevant.company}: Based on the news, ${mostRelevant.company} has been mentioned in relation to: "${mostRelevant.title}"`;
-                    } else if (lowerQuestion.includes('latest') || lowerQuestion.includes('recent')) {
-                        response = `${mostRelevant.company}: The latest news I found is: "${mostRelevant.title}". ${mostRelevant.body.substring(0, 150)}`;
-                    } else if (informativeSnippet) {
-                        response = `${mostRelevant.company}: ${informativeSnippet}`;
                     } else {
-                        response = `${mostRelevant.company}: ${mostRelevant.title} ${mostRelevant.body.substring(0, 150)}`;
-                    }
-                    
-                    addMessageWithCitation(response, `${mostRelevant.source}`, mostRelevant.url);
-                    
-                    if (relevantArticles.length > 1) {
-                        setTimeout(() => {
-                            addMessage(`I also found ${relevantArticles.length - 1} more articles that might be relevant. Would you like to know more about any specific topic?`, 'bot');
-                            conversationState.mode = 'offering_more';
-                        }, 1000);
+                        addMessage(`I couldn't find any information about that in the current news articles. Could you try asking something else?`, 'bot');
+                        conversationState.mode = 'initial';
                     }
-                } else {
-                    addMessage(`I couldn't find any information about that in the current news articles. Could you try asking something else?`, 'bot');
-                    conversationState.mode = 'initial';
-                }
+                });
             }
             
             const conversationState = {
                 mode: 'initial',
                 currentQuery: '',
                 relevantArticles: [],
+                terms: [],
                 currentArticleIndex: 0
             };
             
             function handleFollowUp(response) {
                 const lowerResponse = response.toLowerCase().trim();
                 
-                if (conversationState.mode === 'offering_more' && 
-                    (lowerResponse === 'yes' || lowerResponse === 'sure' || 
+                if (conversationState.mode === 'offering_more' &&
+                    (lowerResponse === 'yes' || lowerResponse === 'sure' ||
                      lowerResponse === 'ok' || lowerResponse.includes('yes'))) {
                     
                     if (conversationState.relevantArticles.length > conversationState.currentArticleIndex + 1) {
                         conversationState.currentArticleIndex++;
                         const nextArticle = conversationState.relevantArticles[conversationState.currentArticleIndex];
-                        
-                        let response = '';
-                        if (nextArticle.full_content) {
-                            const snippet = nextArticle.full_content.substring(0, 300);
-                            response = `${nextArticle.company}: ${snippet}`;
-                        } else {
-                            response = `${nextArticle.company}: ${nextArticle.title}. ${nextArticle.body.substring(0, 150)}`;
-                        }
-                        
-                        addMessageWithCitation(response, `${nextArticle.source}`, nextArticle.url);
-                        
                         const remaining = conversationState.relevantArticles.length - conversationState.currentArticleIndex - 1;
-                        if (remaining > 0) {
-                            setTimeout(() => {
-                                addMessage(`I have ${remaining} more articles that might interest you. Would you like to see another one?`, 'bot');
-                            }, 1000);
-                        } else {
-                            setTimeout(() => {
-                                addMessage(`That's all the relevant articles I found. Is there something else you'd like to know about?`, 'bot');
-                                conversationState.mode = 'initial';
-                            }, 1000);
-                        }
+                        
+                        callSearch({type: 'snippet', doc: nextArticle.doc, terms: conversationState.terms}).then(snippet => {
+                            let response = '';
+                            if (snippet) {
+                                response = `${nextArticle.company}: ${snippet}`;
+                            } else {
+                                response = `${nextArticle.company}: ${nextArticle.title}. ${nextArticle.body.substring(0, 150)}`;
+                            }
+                            
+                            addMessageWithCitation(response, `${nextArticle.source}`, nextArticle.url);
+                            
+                            if (remaining > 0) {
+                                setTimeout(() => {
+                                    addMessage(`I have ${remaining} more articles that might interest you. Would you like to see another one?`, 'bot');
+                                }, 1000);
+                            } else {
+                                setTimeout(() => {
+                                    addMessage(`That's all the relevant articles I found. Is there something else you'd like to know about?`, 'bot');
+                                    conversationState.mode = 'initial';
+                                }, 1000);
+                            }
+                        });
                         return true;
                     }
                 }
@@ -5,69 +5,190 @@ This script coordinates the overall process of generating the HTML dashboard.
 """
 
 import os
-import datetime
-from data_loader import load_news_items, create_company_mapping
-from web_utils import fetch_url_content
-from cache_manager import load_cache, save_cache, prepare_news_data
-from html_generator import generate_html_head_and_styles, generate_news_items_html, generate_chatbot_html
+import time
+import argparse
+import functools
+from data_loader import load_news_items
+from company_index import CompanyIndex, attribute_companies, DEFAULT_COMPANY_INDEX_FILE
+from web_utils import (fetch_article, download_article, extract_article, configure_session_pool, configure_download_limit, close_sessions,
+                       get_rate_limit_stats, DEFAULT_POOL_SIZE, DEFAULT_MAX_DOWNLOAD_BYTES)
+from cache_manager import load_cache, save_cache, prepare_news_data, load_article_bodies, cache_key_for, DEFAULT_RETRY_BASE_HOURS, DEFAULT_CACHE_FILE
+from cache_retention import apply_retention, compact_cache, DEFAULT_TTL_DAYS, DEFAULT_MAX_ENTRIES, DEFAULT_MAX_BYTES
+from fetch_engine import DEFAULT_MAX_WORKERS, DEFAULT_PARSE_WORKERS
+from article_extractor import configure_parser_backend, configure_extraction_method, EXTRACTION_METHODS
+from html_parsers import available_backends
+from telemetry import get_telemetry, write_report, DEFAULT_REPORT_FILE
+from news_manifest import (load_manifest, save_manifest, company_fingerprints, changed_since_build, build_version,
+                           DEFAULT_MANIFEST_FILE)
+from html_generator import write_dashboard, refresh_timestamp
+from data_shards import write_data_shards, DEFAULT_DATA_DIR
+from search_index import build_search_index
 from js_generator import generate_chatbot_js
 
-def format_date_only(date_str):
-    """Format a date string to YYYY-MM-DD format"""
-    if not date_str:
-        return ""
-    try:
-        if isinstance(date_str, str) and 'T' in date_str:
-            # Handle ISO format
-            date_str = date_str.split('T')[0]
-        elif isinstance(date_str, datetime.datetime):
-            date_str = date_str.strftime("%Y-%m-%d")
-        return date_str
-    except:
-        return date_str
+def parse_args(argv=None):
+    """
+    Parse command line options for the dashboard generator
+    
+    Args:
+        argv: List of arguments to parse, defaults to sys.argv
+        
+    Returns:
+        argparse.Namespace with the parsed options
+    """
+    parser = argparse.ArgumentParser(description="Generate the company news HTML dashboard")
+    parser.add_argument("command", nargs="?", default="build", choices=["build", "compact"],
+                        help="build the dashboard (default), or compact the article cache and exit")
+    parser.add_argument("--cache", default=DEFAULT_CACHE_FILE,
+                        help="Article cache: an SQLite database, or a .json file for the legacy format")
+    parser.add_argument("--workers", type=int, default=DEFAULT_MAX_WORKERS,
+                        help="Maximum number of articles fetched concurrently")
+    parser.add_argument("--parse-workers", type=int, default=DEFAULT_PARSE_WORKERS,
+                        help="Number of processes extracting article text (0 extracts in the main process)")
+    parser.add_argument("--pool-size", type=int, default=DEFAULT_POOL_SIZE,
+                        help="Maximum number of keep-alive connections kept open per host")
+    parser.add_argument("--max-download-bytes", type=int, default=DEFAULT_MAX_DOWNLOAD_BYTES,
+                        help="Stop downloading a page after this many bytes")
+    parser.add_argument("--parser", default="auto", choices=["auto"] + available_backends(),
+                        help="HTML parser backend used for article extraction")
+    parser.add_argument("--extractor", default="cascade", choices=EXTRACTION_METHODS,
+                        help="Article extraction method: single-pass density scoring or the selector cascade")
+    parser.add_argument("--revalidate-days", type=float, default=None,
+                        help="Revalidate cached articles with conditional requests after this many days")
+    parser.add_argument("--time-budget", type=float, default=None,
+                        help="Seconds the whole run may take; fetching stops in time for the dashboard to be written")
+    parser.add_argument("--retry-base-hours", type=float, default=DEFAULT_RETRY_BASE_HOURS,
+                        help="Hours before a failed article is retried, doubling with every further failure")
+    parser.add_argument("--cache-ttl-days", type=float, default=DEFAULT_TTL_DAYS,
+                        help="Evict cached articles no longer in the news CSV after this many days unused")
+    parser.add_argument("--cache-max-entries", type=int, default=DEFAULT_MAX_ENTRIES,
+                        help="Evict the least recently used unreferenced articles beyond this many entries")
+    parser.add_argument("--cache-max-bytes", type=int, default=DEFAULT_MAX_BYTES,
+                        help="Evict the least recently used unreferenced articles beyond this cache size")
+    parser.add_argument("--report", default=DEFAULT_REPORT_FILE,
+                        help="JSON file the run's cache, fetch and extraction statistics are written to")
+    parser.add_argument("--manifest", default=DEFAULT_MANIFEST_FILE,
+                        help="News manifest recording the company news the dashboard was last built from")
+    parser.add_argument("--company-index", default=DEFAULT_COMPANY_INDEX_FILE,
+                        help="JSON index of the news in the news-<company>.csv files, updated incrementally")
+    parser.add_argument("--data-dir", default=DEFAULT_DATA_DIR,
+                        help="Directory next to the dashboard for the article content shards")
+    parser.add_argument("--debug", action="store_true",
+                        help="Build a dashboard whose chatbot logs its search steps to the browser console")
+    parser.add_argument("--force", action="store_true",
+                        help="Rebuild the dashboard and fetch articles of every company, changed or not")
+    return parser.parse_args(argv)
 
-def main():
+def main(argv=None):
     """
     Main function that coordinates the process of generating the HTML dashboard
     """
-    print("Starting HTML dashboard generation...")
+    args = parse_args(argv)
+    started = time.monotonic()
+    telemetry = get_telemetry()
+    if args.command == "build":
+        print("Starting HTML dashboard generation...")
     
     # Step 1: Load news items from CSV
     news_items = load_news_items()
     print(f"Loaded {len(news_items)} news items")
+    referenced_keys = {cache_key_for(item) for item in news_items}
     
-    # Format dates to YYYY-MM-DD
-    for item in news_items:
-        if 'date' in item:
-            item['date'] = format_date_only(item['date'])
+    if args.command == "compact":
+        if args.cache.endswith(".json"):
+            print("Compaction needs the SQLite cache; the JSON cache is rewritten on every save")
+            return
+        compact_cache(args.cache, referenced_keys, ttl_days=args.cache_ttl_days,
+                      max_entries=args.cache_max_entries, max_bytes=args.cache_max_bytes)
+        return
     
-    # Step 2: Create company mapping
-    company_mapping = create_company_mapping()
-    print(f"Created mapping for {len(company_mapping)} titles to companies")
+    # Step 2: Attribute news to companies through the persistent company index
+    company_index = CompanyIndex(args.company_index)
+    parsed, dropped = company_index.refresh()
+    company_index.save()
+    filled, mismatched = attribute_companies(news_items, company_index)
+    print(f"Company index covers {len(company_index.files)} companies ({parsed} re-read); "
+          f"filled in {filled} companies, {mismatched} disagree")
+    
+    # Only companies whose news changed since the last build are fetched again
+    fingerprints = company_fingerprints(news_items)
+    manifest = load_manifest(args.manifest)
+    changed_companies = changed_since_build(manifest, fingerprints)
+    # A change to the generating code rebuilds the page, from the cache unless news changed too
+    version = build_version()
+    code_changed = manifest.get("build_version") != version
+    if not changed_companies and not code_changed and not args.force and os.path.exists("index.html"):
+        print("No company news changed since the last build; keeping the existing dashboard")
+        if refresh_timestamp("index.html"):
+            print("Updated the date of the existing dashboard")
+        return
+    if args.force:
+        print("Rebuilding the dashboard for all companies")
+    else:
+        if code_changed:
+            print("The dashboard code changed since the last build; rebuilding the dashboard")
+        if changed_companies:
+            print(f"News changed for {len(changed_companies)} companies: {', '.join(sorted(changed_companies))}")
     
     # Step 3: Load cache
-    cached_news_data = load_cache()
+    with telemetry.stage("load_cache"):
+        cached_news_data = load_cache(args.cache)
     
     # Step 4: Prepare news data for JavaScript, fetching full content where needed
-    news_data_for_js, updated_cache = prepare_news_data(news_items, cached_news_data, fetch_url_content)
-    
-    # Step 5: Save updated cache
-    save_cache(updated_cache)
+    configure_session_pool(args.pool_size)
+    configure_download_limit(args.max_download_bytes)
+    configure_parser_backend(args.parser)
+    configure_extraction_method(args.extractor)
+    # Pages are downloaded on threads and extracted on a process pool
+    extract = functools.partial(extract_article, backend=args.parser, method=args.extractor)
+    try:
+        news_data_for_js, updated_cache = prepare_news_data(
+            news_items, cached_news_data, fetch_article,
+            max_workers=args.workers,
+            revalidate_days=args.revalidate_days,
+            retry_base_hours=args.retry_base_hours,
+            download=download_article,
+            extract=extract,
+            parse_workers=args.parse_workers,
+            deadline=started + args.time_budget if args.time_budget else None,
+            refresh=None if args.force else lambda item: item.company in changed_companies)
+    finally:
+        close_sessions()
     
-    # Step 6: Generate HTML content
-    html_content = generate_html_head_and_styles()
-    html_content += generate_news_items_html(news_items)
-    html_content += generate_chatbot_html(news_data_for_js)
+    # Report the hosts that cost the most wall-clock time
+    for host, stats in get_rate_limit_stats().items():
+        if stats["wait_seconds"] or stats["throttled"] or stats["forbidden"]:
+            print(f"Rate limiting for {host}: waited {stats['wait_seconds']}s, "
+                  f"{stats['throttled']} throttled, {stats['forbidden']} forbidden, "
+                  f"rate {stats['rate']}/s{', circuit open' if stats['circuit_open'] else ''}")
     
-    # Insert the JavaScript before the closing </script> tag
-    js_code = generate_chatbot_js()
-    html_content = html_content.replace('</script>', f'{js_code}\n    </script>')
+    # Step 5: Drop stale cache entries and save updated cache
+    with telemetry.stage("save_cache"):
+        if not args.cache.endswith(".json"):
+            retention = apply_retention(updated_cache, referenced_keys, ttl_days=args.cache_ttl_days,
+                                        max_entries=args.cache_max_entries, max_bytes=args.cache_max_bytes)
+            telemetry.increment("retention", "evicted", retention["removed"])
+        save_cache(updated_cache, args.cache)
     
-    # Step 7: Write the HTML file
-    with open("index.html", "w", encoding="utf-8") as file:
-        file.write(html_content)
+    with telemetry.stage("render"):
+        # Step 6: Read the cached article bodies that are shown
+        load_article_bodies(news_data_for_js, updated_cache)
+        # Step 7: Write the article content and its search index as files the chatbot loads on demand
+        card_data, data_manifest = write_data_shards(news_data_for_js, args.data_dir,
+                                                     extra={"index": build_search_index(news_data_for_js)})
+        
+        # Step 8: Stream the HTML file, inserting the JavaScript at its slot
+        write_dashboard("index.html", news_items, card_data, data_manifest, generate_chatbot_js(), debug=args.debug)
     
     print("HTML dashboard created successfully!")
+    # Companies with deferred articles count as changed until they are complete
+    incomplete = {article["company"] for article in news_data_for_js if article["extraction_status"] == "deferred"}
+    manifest["built"] = {company: fingerprint for company, fingerprint in fingerprints.items()
+                         if company not in incomplete}
+    manifest["build_version"] = version
+    save_manifest(manifest, args.manifest)
+    
+    # Step 9: Write the run report next to the dashboard
+    write_report(args.report, rate_limits=get_rate_limit_stats())
 
 if __name__ == "__main__":
     main()
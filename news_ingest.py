@@ -0,0 +1,267 @@
+#!/usr/bin/env python3
+"""
+Search the latest news for every tracked company and write the news CSV files.
+
+Reads the companies from companies.json, runs the DuckDuckGo news searches
+on a bounded thread pool behind a shared adaptive rate limiter, and writes
+news-<company>.csv plus aggregated-news.csv with proper CSV quoting. The
+results of each company are fingerprinted in news-manifest.json so only
+companies with new results are rewritten, and main.py can tell which
+companies changed since the dashboard was last built.
+
+companies.json holds {"max_results": 2, "companies": [...]}, where each
+company is a name or an object {"name": ..., "query": ..., "max_results": ...}.
+
+Usage:
+    python news_ingest.py [--config companies.json] [--workers 4]
+"""
+
+import os
+import csv
+import sys
+import json
+import time
+import random
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+from rate_limiter import DomainRateLimiter
+from file_utils import atomic_write
+from news_manifest import load_manifest, save_manifest, record_company, checked_within, DEFAULT_MANIFEST_FILE
+
+# The package was renamed from duckduckgo_search to ddgs
+try:
+    from duckduckgo_search import DDGS
+    from duckduckgo_search.exceptions import RatelimitException
+except ImportError:
+    try:
+        from ddgs import DDGS
+        from ddgs.exceptions import RatelimitException
+    except ImportError:
+        DDGS = None
+
+        class RatelimitException(Exception):
+            pass
+
+DEFAULT_CONFIG_FILE = "companies.json"
+AGGREGATED_CSV = "aggregated-news.csv"
+NEWS_FIELDS = ["date", "title", "body", "url", "image", "source"]
+AGGREGATED_FIELDS = ["company"] + NEWS_FIELDS
+
+DEFAULT_WORKERS = 4
+DEFAULT_MAX_RESULTS = 2
+DEFAULT_MAX_RETRIES = 5
+DEFAULT_RETRY_BASE_DELAY = 15
+# Searches per second across all workers; halved whenever DuckDuckGo pushes back
+DEFAULT_SEARCH_RATE = 0.5
+PROVIDER = "duckduckgo"
+
+def load_companies(config_file=DEFAULT_CONFIG_FILE):
+    """
+    Load the tracked companies from the config file
+
+    Args:
+        config_file: Path to the JSON config
+
+    Returns:
+        List of dictionaries with the company name, search query and max_results
+    """
+    with open(config_file, 'r', encoding='utf-8') as f:
+        config = json.load(f)
+    default_max_results = config.get("max_results", DEFAULT_MAX_RESULTS)
+    companies = []
+    for entry in config["companies"]:
+        if isinstance(entry, str):
+            entry = {"name": entry}
+        name = entry["name"]
+        companies.append({
+            "name": name,
+            # Multi-word names are searched as a phrase
+            "query": entry.get("query") or (f'"{name}"' if " " in name else name),
+            "max_results": entry.get("max_results", default_max_results),
+        })
+    return companies
+
+def company_csv_path(name, directory="."):
+    """
+    Get the path of a company's news CSV
+    """
+    return os.path.join(directory, f"news-{name}.csv")
+
+def write_csv(path, fields, rows):
+    """
+    Write rows to a CSV file, replacing it atomically
+
+    Args:
+        path: Output file path
+        fields: Column names
+        rows: Iterable of dictionaries; keys outside fields are ignored
+    """
+    with atomic_write(path, newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=fields, extrasaction='ignore')
+        writer.writeheader()
+        writer.writerows(rows)
+
+def read_csv(path):
+    """
+    Read the rows of a CSV file, or an empty list if it does not exist
+    """
+    if not os.path.exists(path):
+        return []
+    with open(path, 'r', encoding='utf-8', newline='') as f:
+        return list(csv.DictReader(f))
+
+def search_news(query, max_results, limiter, max_retries=DEFAULT_MAX_RETRIES,
+                base_delay=DEFAULT_RETRY_BASE_DELAY):
+    """
+    Search the news for a query, retrying with backoff
+
+    Args:
+        query: Search query
+        max_results: Maximum number of results
+        limiter: DomainRateLimiter shared by all searches
+        max_retries: Maximum number of attempts
+        base_delay: Wait after the first failure in seconds, growing with every attempt
+
+    Returns:
+        List of result dictionaries with the NEWS_FIELDS keys
+    """
+    if DDGS is None:
+        raise RuntimeError("News ingestion needs the duckduckgo-search package")
+    for attempt in range(1, max_retries + 1):
+        limiter.acquire(PROVIDER)
+        try:
+            results = DDGS().news(query, max_results=max_results)
+            limiter.record_success(PROVIDER)
+            return results
+        except RatelimitException as e:
+            # Slows every worker down, not just this one
+            pause = limiter.record_throttle(PROVIDER)
+            error = e
+            print(f"Rate limited searching {query}, slowing searches down for {pause:.1f} seconds")
+        except Exception as e:
+            error = e
+        if attempt < max_retries:
+            wait_time = base_delay * attempt + random.uniform(0, 10)
+            print(f"Search attempt {attempt} for {query} failed ({error}). Retrying in {wait_time:.0f} seconds...")
+            time.sleep(wait_time)
+    raise error
+
+def search_company(company, limiter, max_retries=DEFAULT_MAX_RETRIES, base_delay=DEFAULT_RETRY_BASE_DELAY):
+    """
+    Search the news of one company
+
+    Args:
+        company: Company dictionary from load_companies
+        limiter: DomainRateLimiter shared by all searches
+        max_retries: Maximum number of search attempts
+        base_delay: Wait after the first failed attempt in seconds
+
+    Returns:
+        List of news rows, or None if every attempt failed
+    """
+    try:
+        rows = search_news(company["query"], company["max_results"], limiter, max_retries, base_delay)
+    except Exception as e:
+        print(f"Warning: Search for {company['name']} failed ({e})")
+        return None
+    print(f"Found {len(rows)} news items for {company['name']}")
+    return rows
+
+def ingest(companies, workers=DEFAULT_WORKERS, directory=".", max_retries=DEFAULT_MAX_RETRIES,
+           base_delay=DEFAULT_RETRY_BASE_DELAY, search_rate=DEFAULT_SEARCH_RATE,
+           manifest_file=DEFAULT_MANIFEST_FILE, min_interval_hours=0):
+    """
+    Search the news of all companies concurrently and write the CSV files
+
+    Each company's results are fingerprinted in the manifest, and only the
+    CSV files of companies whose results changed are rewritten. Companies
+    whose search fails, or that were searched less than min_interval_hours
+    ago, keep their previous results.
+
+    Args:
+        companies: List of company dictionaries from load_companies
+        workers: Maximum number of searches in flight. All searches go to one host
+            through a limiter without burst, so search_rate caps the throughput and
+            more workers only help while searches are slow to answer
+        directory: Directory of the CSV files
+        max_retries: Maximum number of search attempts per company
+        base_delay: Wait after the first failed attempt in seconds
+        search_rate: Searches per second allowed across all workers
+        manifest_file: Path of the news manifest
+        min_interval_hours: Skip companies searched less than this many hours ago
+
+    Returns:
+        (aggregated rows in the order of the companies, list of changed company names)
+    """
+    manifest = load_manifest(manifest_file)
+    due = [company for company in companies
+           if not checked_within(manifest, company["name"], min_interval_hours)]
+    if len(due) < len(companies):
+        print(f"Skipping {len(companies) - len(due)} companies searched in the last {min_interval_hours} hours")
+
+    limiter = DomainRateLimiter(initial_rate=search_rate, min_rate=search_rate / 16, max_rate=search_rate * 2,
+                                burst=1, max_wait=600)
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        found = dict(zip([company["name"] for company in due], executor.map(
+            lambda company: search_company(company, limiter, max_retries, base_delay), due)))
+
+    aggregated = []
+    changed = []
+    for company in companies:
+        name = company["name"]
+        path = company_csv_path(name, directory)
+        rows = found.get(name)
+        if rows is None:
+            # Not searched this run, or the search failed: keep the previous results
+            rows = read_csv(path)
+            if not os.path.exists(path):
+                write_csv(path, NEWS_FIELDS, [])
+                changed.append(name)
+        elif record_company(manifest, name, rows) or not os.path.exists(path):
+            write_csv(path, NEWS_FIELDS, rows)
+            changed.append(name)
+        if rows:
+            aggregated.extend({"company": name, **row} for row in rows)
+        else:
+            # Dateless, so the placeholder and the company's fingerprint stay the same from day to day
+            aggregated.append({"company": name, "date": "", "title": "No news"})
+
+    # Companies dropped from the config leave the aggregated CSV too
+    removed = set(manifest["companies"]) - {company["name"] for company in companies}
+    for name in removed:
+        del manifest["companies"][name]
+    save_manifest(manifest, manifest_file)
+
+    aggregated_path = os.path.join(directory, AGGREGATED_CSV)
+    if changed or removed or not os.path.exists(aggregated_path):
+        write_csv(aggregated_path, AGGREGATED_FIELDS, aggregated)
+        print(f"Aggregated news CSV created with {len(aggregated)} entries; "
+              f"changed: {', '.join(changed) or 'none'}{'; removed: ' + ', '.join(sorted(removed)) if removed else ''}")
+    else:
+        print("No company has new results; aggregated news CSV left unchanged")
+    return aggregated, changed
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Search company news and write the news CSV files")
+    parser.add_argument("--config", default=DEFAULT_CONFIG_FILE, help="JSON file listing the tracked companies")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS,
+                        help="Maximum number of concurrent searches; throughput is capped by --search-rate, "
+                             "so more workers only help while searches are slow to answer")
+    parser.add_argument("--search-rate", type=float, default=DEFAULT_SEARCH_RATE,
+                        help="Searches per second across all workers")
+    parser.add_argument("--max-retries", type=int, default=DEFAULT_MAX_RETRIES,
+                        help="Maximum number of search attempts per company")
+    parser.add_argument("--manifest", default=DEFAULT_MANIFEST_FILE,
+                        help="JSON file with the fingerprint of every company's results")
+    parser.add_argument("--min-interval-hours", type=float, default=0,
+                        help="Skip companies searched less than this many hours ago")
+    args = parser.parse_args(argv)
+
+    companies = load_companies(args.config)
+    print(f"Searching news for {len(companies)} companies with {args.workers} workers")
+    ingest(companies, workers=args.workers, max_retries=args.max_retries, search_rate=args.search_rate,
+           manifest_file=args.manifest, min_interval_hours=args.min_interval_hours)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
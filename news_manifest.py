@@ -0,0 +1,157 @@
+import os
+import json
+import hashlib
+import datetime
+from file_utils import atomic_write
+
+DEFAULT_MANIFEST_FILE = "news-manifest.json"
+# Modules whose code shapes the built dashboard; changing one rebuilds it even
+# when no news changed
+BUILD_MODULES = ("main", "html_generator", "js_generator", "data_shards", "search_index")
+
+def fingerprint_rows(rows):
+    """
+    Fingerprint the news results of one company
+
+    Only the identity of each item counts, not its order or the search
+    snippet, which the search engine rewords between runs.
+
+    Args:
+        rows: Iterable of news row dictionaries
+
+    Returns:
+        Hex SHA-256 digest of the sorted (url, title, date) tuples
+    """
+    digest = hashlib.sha256()
+    for url, title, date in sorted((row.get("url") or "", row.get("title") or "", row.get("date") or "")
+                                   for row in rows):
+        digest.update(f"{url}\t{title}\t{date}\n".encode('utf-8'))
+    return digest.hexdigest()
+
+def company_fingerprints(news_items):
+    """
+    Fingerprint the news items of every company in the aggregated CSV
+
+    Args:
+        news_items: List of data_loader.NewsItem records
+
+    Returns:
+        Dictionary mapping company names to fingerprints
+    """
+    by_company = {}
+    for item in news_items:
+        by_company.setdefault(item.company, []).append(item)
+    return {company: fingerprint_rows(rows) for company, rows in by_company.items()}
+
+def build_version(modules=BUILD_MODULES):
+    """
+    Fingerprint the code that generates the dashboard
+
+    Args:
+        modules: Names of the modules next to this one to include
+
+    Returns:
+        Hex SHA-256 digest of the modules' source files
+    """
+    directory = os.path.dirname(os.path.abspath(__file__))
+    digest = hashlib.sha256()
+    for name in modules:
+        with open(os.path.join(directory, f"{name}.py"), 'rb') as f:
+            digest.update(f"{name}\n".encode('utf-8'))
+            digest.update(f.read())
+    return digest.hexdigest()
+
+def load_manifest(path=DEFAULT_MANIFEST_FILE):
+    """
+    Load the news manifest
+
+    "companies" holds what ingestion last found for each company, "built"
+    the fingerprints the dashboard was last built from and "build_version"
+    the build_version of the code that built it.
+
+    Args:
+        path: Manifest file path
+
+    Returns:
+        Manifest dictionary, empty if the file does not exist or is unreadable
+    """
+    manifest = {}
+    if os.path.exists(path):
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                manifest = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"Error loading manifest {path}: {e}")
+    manifest.setdefault("companies", {})
+    manifest.setdefault("built", {})
+    return manifest
+
+def save_manifest(manifest, path=DEFAULT_MANIFEST_FILE):
+    """
+    Write the news manifest, replacing the file atomically
+
+    Args:
+        manifest: Manifest dictionary
+        path: Manifest file path
+    """
+    with atomic_write(path) as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+
+def record_company(manifest, name, rows):
+    """
+    Record the search results of a company
+
+    Args:
+        manifest: Manifest dictionary
+        name: Company name
+        rows: News rows found for the company
+
+    Returns:
+        True if the results differ from the ones recorded before
+    """
+    now = datetime.datetime.now(datetime.timezone.utc).isoformat(timespec='seconds')
+    fingerprint = fingerprint_rows(rows)
+    entry = manifest["companies"].setdefault(name, {})
+    changed = entry.get("fingerprint") != fingerprint
+    entry["fingerprint"] = fingerprint
+    entry["items"] = len(rows)
+    entry["checked_at"] = now
+    if changed:
+        entry["changed_at"] = now
+    return changed
+
+def checked_within(manifest, name, hours):
+    """
+    Check whether a company was searched less than the given number of hours ago
+
+    Args:
+        manifest: Manifest dictionary
+        name: Company name
+        hours: Minimum interval between searches, or 0 to always search
+
+    Returns:
+        True if the company does not need to be searched yet
+    """
+    checked_at = manifest["companies"].get(name, {}).get("checked_at")
+    if not hours or not checked_at:
+        return False
+    try:
+        checked = datetime.datetime.fromisoformat(checked_at)
+    except ValueError:
+        return False
+    return datetime.datetime.now(datetime.timezone.utc) - checked < datetime.timedelta(hours=hours)
+
+def changed_since_build(manifest, fingerprints):
+    """
+    Find the companies whose news differ from the last dashboard build
+
+    Args:
+        manifest: Manifest dictionary
+        fingerprints: Current fingerprints from company_fingerprints
+
+    Returns:
+        Set of company names that are new, changed or no longer present
+    """
+    built = manifest["built"]
+    changed = {company for company, fingerprint in fingerprints.items() if built.get(company) != fingerprint}
+    return changed | (set(built) - set(fingerprints))
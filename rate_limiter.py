@@ -0,0 +1,236 @@
+import threading
+import time
+import datetime
+from email.utils import parsedate_to_datetime
+
+DEFAULT_INITIAL_RATE = 1.0
+DEFAULT_MIN_RATE = 0.02
+DEFAULT_MAX_RATE = 4.0
+DEFAULT_BURST = 2
+DEFAULT_RATE_INCREASE = 0.05
+DEFAULT_BREAKER_THRESHOLD = 3
+DEFAULT_MAX_WAIT = 60
+
+class CircuitOpenError(Exception):
+    """
+    Raised when a host has been given up on for the rest of the run
+    """
+
+class RateLimitedError(Exception):
+    """
+    Raised when a host asks us to wait longer than we are willing to
+    """
+
+def parse_retry_after(value):
+    """
+    Parse a Retry-After header value
+
+    Args:
+        value: Header value, either a number of seconds or an HTTP date
+
+    Returns:
+        Number of seconds to wait, or None if the value is missing or invalid
+    """
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=datetime.timezone.utc)
+    return max(0.0, (retry_at - datetime.datetime.now(datetime.timezone.utc)).total_seconds())
+
+class TokenBucket:
+    """
+    Token bucket for a single host whose refill rate adapts to throttling:
+    it grows additively on success and halves whenever the host pushes back
+    """
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def reserve(self, now):
+        """
+        Take a token, going into debt if none is available
+
+        Args:
+            now: Current time.monotonic() value
+
+        Returns:
+            Seconds the caller has to wait before sending its request
+        """
+        self._refill(now)
+        wait = max(0.0, self.blocked_until - now)
+        if self.tokens < 1:
+            wait = max(wait, (1 - self.tokens) / self.rate)
+        self.tokens -= 1
+        return wait
+
+    def wait_needed(self, now):
+        """
+        Seconds until a token would be available, without taking one
+        """
+        self._refill(now)
+        wait = max(0.0, self.blocked_until - now)
+        if self.tokens < 1:
+            wait = max(wait, (1 - self.tokens) / self.rate)
+        return wait
+
+class DomainRateLimiter:
+    """
+    Per-host rate limiter with a circuit breaker.
+
+    Each host gets its own token bucket. 429/503 responses halve the host's
+    rate and honor Retry-After, successes slowly raise it again, and a host
+    that answers 403 several times in a row is skipped for the rest of the run.
+    """
+
+    def __init__(self, initial_rate=DEFAULT_INITIAL_RATE, min_rate=DEFAULT_MIN_RATE,
+                 max_rate=DEFAULT_MAX_RATE, burst=DEFAULT_BURST, rate_increase=DEFAULT_RATE_INCREASE,
+                 breaker_threshold=DEFAULT_BREAKER_THRESHOLD, max_wait=DEFAULT_MAX_WAIT):
+        """
+        Args:
+            initial_rate: Requests per second allowed for a host we know nothing about
+            min_rate: Lowest rate a host can be slowed down to
+            max_rate: Highest rate a host can be sped up to
+            burst: Number of requests that can be sent back to back
+            rate_increase: Requests per second added to a host's rate after each success
+            breaker_threshold: Consecutive 403 responses after which a host is given up on
+            max_wait: Longest wait in seconds accepted before failing a request instead
+        """
+        self.initial_rate = initial_rate
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.burst = burst
+        self.rate_increase = rate_increase
+        self.breaker_threshold = breaker_threshold
+        self.max_wait = max_wait
+        self._lock = threading.Lock()
+        self._buckets = {}
+        self._stats = {}
+
+    def _host_state(self, host):
+        if host not in self._buckets:
+            self._buckets[host] = TokenBucket(self.initial_rate, self.burst)
+            self._stats[host] = {
+                "requests": 0,
+                "successes": 0,
+                "throttled": 0,
+                "forbidden": 0,
+                "consecutive_forbidden": 0,
+                "wait_seconds": 0.0,
+                "circuit_open": False,
+            }
+        return self._buckets[host], self._stats[host]
+
+    def acquire(self, host, deadline=None):
+        """
+        Wait until a request to the host is allowed
+
+        Args:
+            host: Host the request is going to
+            deadline: time.monotonic() value the request has to be sent by, or None
+
+        Raises:
+            CircuitOpenError: If the host has been given up on
+            RateLimitedError: If the host would make us wait longer than max_wait
+                or past the deadline
+        """
+        with self._lock:
+            bucket, stats = self._host_state(host)
+            if stats["circuit_open"]:
+                raise CircuitOpenError(f"Skipping {host}: too many 403 responses this run")
+            now = time.monotonic()
+            if bucket.wait_needed(now) > self.max_wait:
+                raise RateLimitedError(f"Skipping {host}: rate limited for another "
+                                       f"{bucket.wait_needed(now):.0f} seconds")
+            if deadline is not None and now + bucket.wait_needed(now) >= deadline:
+                raise RateLimitedError(f"Skipping {host}: rate limited until after the deadline")
+            wait = bucket.reserve(now)
+            stats["requests"] += 1
+            stats["wait_seconds"] += wait
+        if wait > 0:
+            time.sleep(wait)
+
+    def record_success(self, host):
+        """
+        Record a successful response and speed the host up a little
+
+        Args:
+            host: Host that answered
+        """
+        with self._lock:
+            bucket, stats = self._host_state(host)
+            stats["successes"] += 1
+            stats["consecutive_forbidden"] = 0
+            bucket.rate = min(self.max_rate, bucket.rate + self.rate_increase)
+
+    def record_throttle(self, host, retry_after=None):
+        """
+        Record a 429/503 response and slow the host down
+
+        Args:
+            host: Host that answered
+            retry_after: Seconds from the Retry-After header, if any
+
+        Returns:
+            Seconds before the host will be contacted again
+        """
+        with self._lock:
+            bucket, stats = self._host_state(host)
+            stats["throttled"] += 1
+            bucket.rate = max(self.min_rate, bucket.rate / 2)
+            now = time.monotonic()
+            pause = retry_after if retry_after is not None else 1 / bucket.rate
+            bucket.blocked_until = max(bucket.blocked_until, now + pause)
+            # Drop any saved-up burst so the next request really waits
+            bucket.tokens = min(bucket.tokens, 0)
+            return max(0.0, bucket.blocked_until - now)
+
+    def record_forbidden(self, host):
+        """
+        Record a 403 response, opening the circuit after too many in a row
+
+        Args:
+            host: Host that answered
+
+        Returns:
+            True if the circuit for the host is now open
+        """
+        with self._lock:
+            bucket, stats = self._host_state(host)
+            stats["forbidden"] += 1
+            stats["consecutive_forbidden"] += 1
+            bucket.rate = max(self.min_rate, bucket.rate / 2)
+            if stats["consecutive_forbidden"] >= self.breaker_threshold:
+                stats["circuit_open"] = True
+            return stats["circuit_open"]
+
+    def stats(self):
+        """
+        Get the per-host limiter state for run statistics
+
+        Returns:
+            Dictionary mapping each host to its counters, current rate and circuit state,
+            ordered by the time spent waiting on the host
+        """
+        with self._lock:
+            report = {}
+            for host, stats in self._stats.items():
+                entry = {key: value for key, value in stats.items() if key != "consecutive_forbidden"}
+                entry["wait_seconds"] = round(entry["wait_seconds"], 2)
+                entry["rate"] = round(self._buckets[host].rate, 3)
+                report[host] = entry
+        return dict(sorted(report.items(), key=lambda item: item[1]["wait_seconds"], reverse=True))
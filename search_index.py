@@ -0,0 +1,136 @@
+import re
+from collections import Counter
+
+# Must match the term extraction of the chatbot's query parser (js_generator)
+TERM_PATTERN = re.compile(r'[a-z0-9]+')
+MIN_TERM_LENGTH = 3
+STOP_WORDS = frozenset([
+    'a', 'an', 'the', 'and', 'or', 'but', 'is', 'are', 'was', 'were',
+    'to', 'of', 'in', 'on', 'at', 'by', 'for', 'with', 'about', 'from',
+    'these', 'those', 'this', 'that', 'have', 'has', 'had', 'do', 'does',
+    'did', 'can', 'could', 'will', 'would', 'should', 'may', 'might'
+])
+# A term in the title counts like three in the article text, one in the summary like two
+FIELD_WEIGHTS = (("title", 3), ("body", 2), ("full_content", 1))
+NAME_PATTERN = re.compile(r'[A-Z][a-z]+ [A-Z][a-z]+')
+
+def tokenize(text):
+    """
+    Split text into index terms
+
+    Args:
+        text: Any text
+
+    Returns:
+        List of lowercase ASCII alphanumeric terms, without stop words and short terms
+    """
+    return [term for term in TERM_PATTERN.findall(text.lower())
+            if len(term) >= MIN_TERM_LENGTH and term not in STOP_WORDS]
+
+def build_search_index(news_data_for_js):
+    """
+    Build the inverted index the chatbot ranks articles with
+
+    Every article is tokenized once at build time. Term frequencies are
+    weighted by field (FIELD_WEIGHTS), and the chatbot scores them with
+    BM25 from the postings of the query terms alone.
+
+    Args:
+        news_data_for_js: List of news items with full content, in page order
+
+    Returns:
+        JSON-serializable dictionary:
+            "count": number of articles
+            "avgdl": average weighted article length
+            "lengths": weighted length of each article
+            "postings": term -> flat [article, weighted frequency, ...] list
+            "names": articles whose text mentions a capitalized first and last name
+    """
+    postings = {}
+    lengths = []
+    names = []
+    for doc, article in enumerate(news_data_for_js):
+        frequencies = Counter()
+        for field, weight in FIELD_WEIGHTS:
+            for term in tokenize(article.get(field) or ""):
+                frequencies[term] += weight
+        for term, frequency in frequencies.items():
+            postings.setdefault(term, []).extend((doc, frequency))
+        lengths.append(sum(frequencies.values()))
+        if NAME_PATTERN.search(article.get("full_content") or ""):
+            names.append(doc)
+    return {
+        "count": len(lengths),
+        "avgdl": round(sum(lengths) / len(lengths), 3) if lengths else 0,
+        "lengths": lengths,
+        "postings": postings,
+        "names": names,
+    }
+
+MIN_PARAGRAPH_CHARS = 50
+MIN_LEAD_SENTENCE_CHARS = 30
+SENTENCE_END = re.compile(r'(?<=[.!?])\s+')
+
+def _utf16_offsets(text):
+    """
+    Map string indexes to the UTF-16 indexes JavaScript uses for the same text
+    """
+    if text.isascii() or all(ord(char) < 0x10000 for char in text):
+        return None
+    offsets = [0]
+    for char in text:
+        offsets.append(offsets[-1] + (2 if ord(char) >= 0x10000 else 1))
+    return offsets
+
+def _lead_sentence(text):
+    # The first substantial sentence after the first third of a long article
+    if len(text) <= 500:
+        return None
+    start = len(text) // 3
+    middle = text[start:start + 500]
+    position = 0
+    for end in [match.start() for match in re.finditer(r'[.!?] ', middle)] + [len(middle)]:
+        sentence = middle[position:end]
+        if len(sentence) > MIN_LEAD_SENTENCE_CHARS:
+            stripped = sentence.strip()
+            first = start + position + sentence.index(stripped[0])
+            return first, first + len(stripped)
+        position = end + 2
+    return None
+
+def segment_article(text):
+    """
+    Split an article into the paragraphs and sentences answers are quoted from
+
+    Args:
+        text: Full article text
+
+    Returns:
+        JSON-serializable [paragraphs, lead] list with offsets in UTF-16 code units:
+            paragraphs: [start, end, sentences] for every paragraph longer than
+                MIN_PARAGRAPH_CHARS, sentences being [start, end, "space separated terms"]
+            lead: [start, end] of the sentence quoted when no paragraph matches the
+                question, or None to quote the beginning
+    """
+    offsets = _utf16_offsets(text)
+    convert = (lambda index: offsets[index]) if offsets else (lambda index: index)
+    paragraphs = []
+    for match in re.finditer(r'[^\n]+', text):
+        stripped = match.group().strip()
+        if len(stripped) <= MIN_PARAGRAPH_CHARS:
+            continue
+        start = match.start() + match.group().index(stripped[0])
+        end = start + len(stripped)
+        sentences = []
+        position = start
+        for boundary in [sentence_end.start() for sentence_end in SENTENCE_END.finditer(text, start, end)] + [end]:
+            sentence = text[position:boundary]
+            terms = sorted(set(tokenize(sentence)))
+            if terms:
+                sentences.append([convert(position), convert(boundary), " ".join(terms)])
+            position = boundary
+            while position < end and text[position].isspace():
+                position += 1
+        paragraphs.append([convert(start), convert(end), sentences])
+    lead = _lead_sentence(text)
+    return [paragraphs, [convert(lead[0]), convert(lead[1])] if lead else None]
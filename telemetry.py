@@ -0,0 +1,193 @@
+import json
+import time
+import datetime
+import threading
+import contextlib
+from collections import defaultdict
+from file_utils import atomic_write
+
+DEFAULT_REPORT_FILE = "run-report.json"
+# Upper bounds in seconds of the latency histogram buckets; slower requests fall in "inf"
+LATENCY_BUCKETS = (0.1, 0.25, 0.5, 1, 2, 5, 10, 30)
+
+class Histogram:
+    """
+    Count, total, maximum and bucketed distribution of durations
+    """
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, seconds):
+        index = next((i for i, bound in enumerate(self.buckets) if seconds <= bound), len(self.buckets))
+        self.counts[index] += 1
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+
+    def to_dict(self):
+        labels = [f"<={bound}" for bound in self.buckets] + ["inf"]
+        return {
+            "count": self.count,
+            "total_seconds": round(self.total, 3),
+            "mean_seconds": round(self.total / self.count, 3) if self.count else 0,
+            "max_seconds": round(self.max, 3),
+            "buckets": dict(zip(labels, self.counts)),
+        }
+
+class _DomainStats:
+    def __init__(self):
+        self.requests = 0
+        self.retries = 0
+        self.errors = 0
+        self.bytes = 0
+        self.failed_seconds = 0.0
+        self.status_codes = defaultdict(int)
+        self.latency = Histogram()
+        self.extraction = Histogram()
+
+    def to_dict(self):
+        return {
+            "requests": self.requests,
+            "retries": self.retries,
+            "errors": self.errors,
+            "bytes": self.bytes,
+            # Time spent on attempts that did not produce a page
+            "failed_seconds": round(self.failed_seconds, 3),
+            "status_codes": dict(sorted(self.status_codes.items())),
+            "latency": self.latency.to_dict(),
+            "extraction": self.extraction.to_dict(),
+        }
+
+class RunTelemetry:
+    """
+    Thread-safe collector of the measurements of one run.
+
+    Request timings are recorded by the download threads as they happen.
+    Extraction runs in worker processes, so its timings travel back in the
+    fetch results and are recorded by the caller.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.started_at = datetime.datetime.now(datetime.timezone.utc)
+        self._started = time.monotonic()
+        self._domains = defaultdict(_DomainStats)
+        self._counters = defaultdict(lambda: defaultdict(int))
+        self._stages = {}
+
+    def record_request(self, host, seconds, status_code=None, error=False):
+        """
+        Record one HTTP attempt
+
+        Args:
+            host: Host the request went to
+            seconds: Time until the response headers arrived or the attempt failed
+            status_code: HTTP status code, or None if no response was received
+            error: True if the attempt did not produce a usable response
+        """
+        with self._lock:
+            stats = self._domains[host]
+            stats.requests += 1
+            stats.latency.observe(seconds)
+            if status_code is not None:
+                stats.status_codes[str(status_code)] += 1
+            if error:
+                stats.errors += 1
+                stats.failed_seconds += seconds
+
+    def record_retry(self, host):
+        """
+        Record that a request to a host is being retried
+        """
+        with self._lock:
+            self._domains[host].retries += 1
+
+    def record_bytes(self, host, count):
+        """
+        Record the size of a downloaded body
+        """
+        with self._lock:
+            self._domains[host].bytes += count
+
+    def record_extraction(self, host, seconds):
+        """
+        Record the time spent extracting the text of one page
+        """
+        with self._lock:
+            self._domains[host].extraction.observe(seconds)
+
+    def increment(self, group, name, count=1):
+        """
+        Add to a named counter, e.g. increment("cache", "hit")
+        """
+        with self._lock:
+            self._counters[group][name] += count
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        """
+        Time a stage of the run; the time of repeated stages adds up
+        """
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._stages[name] = self._stages.get(name, 0.0) + time.monotonic() - start
+
+    def report(self, **extra):
+        """
+        Build the run report
+
+        Args:
+            extra: Additional top-level sections, e.g. rate limiter statistics
+
+        Returns:
+            JSON-serializable dictionary
+        """
+        with self._lock:
+            domains = {host: stats.to_dict() for host, stats in self._domains.items()}
+            report = {
+                "started_at": self.started_at.isoformat(timespec='seconds'),
+                "duration_seconds": round(time.monotonic() - self._started, 3),
+                "stages": {name: round(seconds, 3) for name, seconds in self._stages.items()},
+                "counters": {group: dict(counts) for group, counts in self._counters.items()},
+            }
+        # Domains that cost the most time first
+        report["domains"] = dict(sorted(domains.items(),
+                                        key=lambda item: item[1]["latency"]["total_seconds"], reverse=True))
+        totals = report["counters"].get("cache", {})
+        lookups = sum(totals.values())
+        report["cache_hit_ratio"] = round(totals.get("hit", 0) / lookups, 3) if lookups else None
+        report.update(extra)
+        return report
+
+_telemetry = RunTelemetry()
+
+def get_telemetry():
+    """
+    Get the collector of the current run
+    """
+    return _telemetry
+
+def write_report(path=DEFAULT_REPORT_FILE, **extra):
+    """
+    Write the run report as JSON, replacing the file atomically
+
+    Args:
+        path: Report file path
+        extra: Additional top-level sections passed to RunTelemetry.report
+
+    Returns:
+        The report dictionary
+    """
+    report = _telemetry.report(**extra)
+    with atomic_write(path) as f:
+        json.dump(report, f, indent=2)
+    print(f"Wrote run report to {path}")
+    return report
@@ -0,0 +1,52 @@
+import pytest
+from article_store import ArticleStore
+from cache_manager import store_article, resolve_cache_entry, load_cache, cache_key_for, CACHE_KEY_VERSION
+
+SECTION_URL = "https://example.com/news"
+
+def _store(cached_news_data, url, content):
+    article = {"url": url, "title": url.rsplit("/", 1)[-1], "full_content": content}
+    key = cache_key_for(article)
+    store_article(cached_news_data, key, article, {"canonical_url": SECTION_URL})
+    return key
+
+@pytest.fixture(params=["dict", "store"])
+def cache(request, tmp_path):
+    if request.param == "dict":
+        yield {}
+    else:
+        store = ArticleStore(str(tmp_path / "cache.sqlite3"))
+        yield store
+        store.close()
+
+def test_shared_canonical_url_keeps_each_article_body(cache):
+    first = _store(cache, "https://example.com/news/first-story", "Text of the first story")
+    second = _store(cache, "https://example.com/news/second-story", "Text of the second story")
+    assert resolve_cache_entry(cache, first)[1]["full_content"] == "Text of the first story"
+    assert resolve_cache_entry(cache, second)[1]["full_content"] == "Text of the second story"
+
+def test_same_content_under_a_canonical_url_is_shared(cache):
+    first = _store(cache, "https://example.com/news/story?utm_source=feed", "Same text")
+    second = _store(cache, "https://example.com/news/story?ocid=msn", "Same text")
+    assert first == second
+    key, entry = resolve_cache_entry(cache, first)
+    assert key == SECTION_URL and entry["full_content"] == "Same text"
+
+def test_kept_query_parameters_are_migrated(tmp_path):
+    path = str(tmp_path / "cache.sqlite3")
+    store = ArticleStore(path)
+    url = "https://example.com/article?src=feature&id=7"
+    store["https://example.com/article?id=7"] = {"url": url, "title": "Story", "full_content": "Body"}
+    store["https://example.com/copy"] = {"alias_of": "https://example.com/article?id=7",
+                                         "url": "https://example.com/copy", "title": "Copy"}
+    store.format_version = 3
+    store.close()
+
+    store = load_cache(path, legacy_cache_file=None)
+    try:
+        assert store.format_version == CACHE_KEY_VERSION
+        new_key = cache_key_for({"url": url})
+        assert resolve_cache_entry(store, new_key)[1]["full_content"] == "Body"
+        assert resolve_cache_entry(store, "https://example.com/copy")[0] == new_key
+    finally:
+        store.close()
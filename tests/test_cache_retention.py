@@ -0,0 +1,21 @@
+from article_store import ArticleStore
+from cache_manager import cache_key_for, CACHE_KEY_VERSION
+from cache_retention import compact_cache
+
+def test_compaction_migrates_keys_before_evicting(tmp_path):
+    path = str(tmp_path / "cache.sqlite3")
+    url = "https://example.com/article?src=feature&id=7"
+    store = ArticleStore(path)
+    store["https://example.com/article?id=7"] = {"url": url, "title": "Story", "full_content": "Body"}
+    store.format_version = 3
+    store.close()
+
+    result = compact_cache(path, {cache_key_for({"url": url})})
+
+    assert result["removed"] == 0
+    store = ArticleStore(path)
+    try:
+        assert store.format_version == CACHE_KEY_VERSION
+        assert store[cache_key_for({"url": url})]["full_content"] == "Body"
+    finally:
+        store.close()
@@ -0,0 +1,12 @@
+from canonical_urls import canonicalize_url
+
+def test_tracking_parameters_are_stripped():
+    url = "https://www.example.com/news/story/?utm_source=x&fbclid=abc&id=7&gclid=1&mc_cid=2"
+    assert canonicalize_url(url) == "https://example.com/news/story?id=7"
+
+def test_generic_parameters_are_kept():
+    url = "https://example.com/article?ref=42&src=feature&partner=acme&ei=3"
+    assert canonicalize_url(url) == "https://example.com/article?ei=3&partner=acme&ref=42&src=feature"
+
+def test_links_to_the_same_article_share_a_key():
+    assert canonicalize_url("http://Example.com:80/a/b/#top") == canonicalize_url("https://example.com/a/b")
@@ -0,0 +1,45 @@
+import os
+from company_index import CompanyIndex, stat_cache_path
+
+def _write_csv(directory, company, rows):
+    with open(os.path.join(directory, f"news-{company}.csv"), 'w', encoding='utf-8') as f:
+        f.write("title,url,date\n")
+        for title, url in rows:
+            f.write(f"{title},{url},2024-01-01\n")
+
+def test_fresh_checkout_leaves_the_index_unchanged(tmp_path):
+    _write_csv(tmp_path, "Acme", [("Acme raises funds", "https://news.example/acme?utm_source=x")])
+    _write_csv(tmp_path, "Globex", [("Globex hires", "https://news.example/globex")])
+    path = str(tmp_path / "company-index.json")
+    index = CompanyIndex(path)
+    assert index.refresh(str(tmp_path)) == (2, 0)
+    index.save()
+    with open(path, 'rb') as f:
+        saved = f.read()
+    assert b"mtime" not in saved
+
+    # A checkout gives the files new mtimes and has no stat cache
+    os.remove(stat_cache_path(path))
+    for name in os.listdir(tmp_path):
+        if name.endswith(".csv"):
+            os.utime(tmp_path / name, ns=(1, 1))
+    index = CompanyIndex(path)
+    assert index.refresh(str(tmp_path)) == (0, 0)
+    assert not index.modified
+    index.save()
+    with open(path, 'rb') as f:
+        assert f.read() == saved
+    assert index.lookup(url="https://news.example/acme") == {"Acme"}
+
+def test_changed_file_is_parsed_again(tmp_path):
+    _write_csv(tmp_path, "Acme", [("Old story", "https://news.example/old")])
+    index = CompanyIndex(str(tmp_path / "company-index.json"))
+    index.refresh(str(tmp_path))
+    index.save()
+    _write_csv(tmp_path, "Acme", [("New story", "https://news.example/new")])
+    os.utime(tmp_path / "news-Acme.csv", ns=(2, 2))
+
+    index = CompanyIndex(str(tmp_path / "company-index.json"))
+    assert index.refresh(str(tmp_path)) == (1, 0)
+    assert index.lookup(title="New story") == {"Acme"}
+    assert index.refresh(str(tmp_path)) == (0, 0)
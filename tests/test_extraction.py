@@ -0,0 +1,28 @@
+import io
+import os
+import contextlib
+import pytest
+from article_extractor import extract_article_text, EXTRACTION_METHODS
+from benchmark_parsers import load_corpus
+from extraction_regression import word_recall, snapshot_path
+
+CORPUS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "extraction_corpus")
+# Share of the expected words an extractor has to find
+MIN_RECALL = 0.95
+# Share of the extracted words that have to be expected, i.e. little boilerplate
+MIN_PRECISION = 0.85
+
+PAGES = load_corpus(CORPUS_DIR)
+
+def test_corpus_is_not_empty():
+    assert PAGES
+
+@pytest.mark.parametrize("method", EXTRACTION_METHODS)
+@pytest.mark.parametrize("url, html", PAGES, ids=[url for url, _ in PAGES])
+def test_extraction_matches_expected_text(url, html, method):
+    with open(snapshot_path(CORPUS_DIR, url), 'r', encoding='utf-8') as f:
+        expected = f.read()
+    with contextlib.redirect_stdout(io.StringIO()):
+        text = extract_article_text(html, url, method=method)
+    assert word_recall(expected, text) >= MIN_RECALL
+    assert word_recall(text, expected) >= MIN_PRECISION
@@ -0,0 +1,10 @@
+from html_generator import refresh_timestamp, current_date
+
+def test_refresh_timestamp_only_changes_the_date(tmp_path):
+    path = tmp_path / "index.html"
+    page = '<div>\r\n<p class="timestamp">Last updated: 2020-01-02<br>Reload</p>\r\n<script>x</script>'
+    path.write_bytes(page.encode('utf-8'))
+
+    assert refresh_timestamp(str(path))
+    assert path.read_bytes() == page.replace("2020-01-02", current_date()).encode('utf-8')
+    assert not refresh_timestamp(str(path))
@@ -0,0 +1,12 @@
+from news_manifest import build_version, company_fingerprints, changed_since_build
+from data_loader import NewsItem
+
+def test_build_version_depends_on_the_modules():
+    assert build_version() == build_version()
+    assert build_version(("html_generator",)) != build_version(("html_generator", "js_generator"))
+
+def test_changed_since_build():
+    items = [NewsItem(company="A", title="One", url="https://a.example/1", date="2024-01-01"),
+             NewsItem(company="B", title="No news")]
+    manifest = {"built": {"B": company_fingerprints(items)["B"], "C": "gone"}}
+    assert changed_since_build(manifest, company_fingerprints(items)) == {"A", "C"}
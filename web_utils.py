@@ -1,27 +1,158 @@
+import re
 import time
 import random
+import threading
+from urllib.parse import urlparse
 import requests
-from bs4 import BeautifulSoup
+from requests.adapters import HTTPAdapter
+from article_extractor import extract_article_text
+from canonical_urls import find_canonical_url
+from rate_limiter import DomainRateLimiter, CircuitOpenError, RateLimitedError, parse_retry_after
+from telemetry import get_telemetry
 
-# Function to handle rate limiting with exponential backoff
-def request_with_retry(url, headers=None, max_retries=3, base_delay=2):
+# Brotli responses can only be decoded when a brotli package is installed
+try:
+    import brotli  # noqa: F401
+    ACCEPT_ENCODING = 'gzip, deflate, br'
+except ImportError:
+    try:
+        import brotlicffi  # noqa: F401
+        ACCEPT_ENCODING = 'gzip, deflate, br'
+    except ImportError:
+        ACCEPT_ENCODING = 'gzip, deflate'
+
+DEFAULT_POOL_SIZE = 10
+# Pages are cut off after this many (decompressed) bytes; articles only keep 10,000 characters anyway
+DEFAULT_MAX_DOWNLOAD_BYTES = 2 * 1024 * 1024
+# Upper bound on the time spent reading a single response body
+DEFAULT_READ_DEADLINE = 30
+HTML_CONTENT_TYPES = ('text/html', 'application/xhtml+xml')
+
+_META_CHARSET_RE = re.compile(rb'<meta[^>]+charset=["\']?([A-Za-z0-9_\-]+)', re.IGNORECASE)
+
+_sessions = {}
+_session_lock = threading.Lock()
+_pool_size = DEFAULT_POOL_SIZE
+_max_download_bytes = DEFAULT_MAX_DOWNLOAD_BYTES
+_rate_limiter = DomainRateLimiter()
+
+class UnsupportedContentError(Exception):
+    """
+    Raised when a response is not an HTML page
+    """
+
+class DeadlineExceeded(Exception):
+    """
+    Raised when a download cannot finish before the deadline of the run
+    """
+
+def get_host(url):
+    """
+    Get the host name used to group requests per site
+    
+    Args:
+        url: URL to extract the host from
+        
+    Returns:
+        Lowercase host name without a leading "www."
+    """
+    host = (urlparse(url).hostname or "").lower()
+    if host.startswith("www."):
+        host = host[4:]
+    return host
+
+def configure_session_pool(pool_size=DEFAULT_POOL_SIZE):
+    """
+    Set the number of keep-alive connections kept open per host
+    
+    Sessions that already exist keep their pool; call this before fetching.
+    
+    Args:
+        pool_size: Maximum number of pooled connections per host
+    """
+    global _pool_size
+    _pool_size = max(1, int(pool_size))
+
+def configure_download_limit(max_bytes=DEFAULT_MAX_DOWNLOAD_BYTES):
+    """
+    Set how many bytes of a page are downloaded before the rest is dropped
+    
+    Args:
+        max_bytes: Maximum number of body bytes read per page
+    """
+    global _max_download_bytes
+    _max_download_bytes = max(1, int(max_bytes))
+
+def get_session(url):
+    """
+    Get the shared keep-alive session for the host of a URL
+    
+    Args:
+        url: URL that will be requested with the session
+        
+    Returns:
+        requests.Session reused for every request to the same host
+    """
+    host = get_host(url)
+    with _session_lock:
+        session = _sessions.get(host)
+        if session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=_pool_size)
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
+            _sessions[host] = session
+        return session
+
+def close_sessions():
+    """
+    Close all pooled sessions and their open connections
+    """
+    with _session_lock:
+        for session in _sessions.values():
+            session.close()
+        _sessions.clear()
+
+def get_rate_limit_stats():
     """
-    Make HTTP requests with exponential backoff for rate limiting
+    Get per-host rate limiter statistics for the current run
+    
+    Returns:
+        Dictionary mapping hosts to their request counts, waits, rate and circuit state
+    """
+    return _rate_limiter.stats()
+
+# Function to handle rate limiting with an adaptive per-host limiter
+def request_with_retry(url, headers=None, max_retries=3, base_delay=2, stream=False, deadline=None):
+    """
+    Make HTTP requests through the per-host rate limiter, reusing the pooled
+    keep-alive session of the URL's host. Throttling responses slow the host
+    down instead of backing off blindly, and network errors are retried with
+    exponential backoff
     
     Args:
         url: URL to request
         headers: Request headers
         max_retries: Maximum number of retry attempts
         base_delay: Base delay between retries in seconds
+        stream: Return before the body is downloaded; the caller must close the response
+        deadline: time.monotonic() value after which no attempt, wait or backoff may
+            continue, or None
         
     Returns:
         Response object or raises exception after max retries
+        
+    Raises:
+        CircuitOpenError: If the host keeps answering 403 and has been given up on
+        RateLimitedError: If the host asks for a longer wait than the limiter accepts
+        DeadlineExceeded: If the deadline passes before a response arrives
     """
     if headers is None:
         headers = {
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/96.0.4664.110 Safari/537.36',
             'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
             'Accept-Language': 'en-US,en;q=0.5',
+            'Accept-Encoding': ACCEPT_ENCODING,
             'Referer': 'https://www.google.com/',
             'DNT': '1',
             'Connection': 'keep-alive',
@@ -29,24 +160,56 @@ def request_with_retry(url, headers=None, max_retries=3, base_delay=2):
             'Cache-Control': 'max-age=0',
         }
     
+    host = get_host(url)
+    telemetry = get_telemetry()
     for attempt in range(max_retries):
+        if attempt:
+            telemetry.record_retry(host)
+        # Wait for the host's token bucket; raises if the host is blocked for this run
+        _rate_limiter.acquire(host, deadline)
+        started = time.monotonic()
+        timeout = 15
+        if deadline is not None:
+            if started >= deadline:
+                raise DeadlineExceeded(f"Deadline reached before requesting {url}")
+            timeout = min(timeout, deadline - started)
         try:
-            response = requests.get(url, headers=headers, timeout=15)
+            response = get_session(url).get(url, headers=headers, timeout=timeout, stream=stream)
+            telemetry.record_request(host, time.monotonic() - started, response.status_code,
+                                     error=not response.ok and response.status_code != 304)
+            
+            # 429 and 503 mean slow down: halve the host's rate and honor Retry-After
+            if response.status_code in (429, 503):
+                retry_after = parse_retry_after(response.headers.get('Retry-After'))
+                pause = _rate_limiter.record_throttle(host, retry_after)
+                response.close()
+                print(f"Rate limit hit (status code: {response.status_code}), slowing down {host} for {pause:.1f} seconds...")
+                continue
             
-            # Check if we hit rate limiting (status codes 429, 403, or 503 often indicate rate limiting)
-            if response.status_code in (429, 403, 503):
-                print(f"Rate limit hit (status code: {response.status_code}), retrying in {base_delay * (2**attempt)} seconds...")
-                time.sleep(base_delay * (2**attempt) + random.uniform(0, 1))  # Exponential backoff with jitter
+            # Repeated 403s mean we are blocked, so stop trying this host
+            if response.status_code == 403:
+                response.close()
+                if _rate_limiter.record_forbidden(host):
+                    raise CircuitOpenError(f"Giving up on {host} for this run after repeated 403 responses")
+                print(f"Forbidden (status code: 403) from {host}, retrying more slowly...")
                 continue
                 
             # Raise exception for other error codes
+            if not response.ok:
+                response.close()
             response.raise_for_status()
+            _rate_limiter.record_success(host)
             return response
             
         except requests.exceptions.RequestException as e:
+            if e.response is None:
+                # No response at all: connection, DNS or timeout error
+                telemetry.record_request(host, time.monotonic() - started, error=True)
             # Check if we've used all retries
             if attempt < max_retries - 1:
                 wait_time = base_delay * (2**attempt) + random.uniform(0, 1)
+                if deadline is not None and time.monotonic() + wait_time >= deadline:
+                    raise DeadlineExceeded(f"No time left to retry {url} after: {e}") from e
                 print(f"Request error: {e}. Retrying in {wait_time:.2f} seconds...")
                 time.sleep(wait_time)  # Exponential backoff with jitter
             else:
@@ -56,135 +219,250 @@ def request_with_retry(url, headers=None, max_retries=3, base_delay=2):
     # This should not be reached due to the raise in the loop, but just in case
     raise requests.exceptions.RequestException("Max retries exceeded")
 
-def fetch_url_content(url):
+def download_page(url, etag=None, last_modified=None, max_bytes=None, deadline=None):
     """
-    Fetch and extract article content from a URL
+    Download the raw HTML of a page, optionally as a conditional request.
+    The body is streamed and cut off after max_bytes, and non-HTML responses
+    are rejected from their headers before the body is read.
+    
+    Args:
+        url: URL to download
+        etag: ETag of a previously downloaded copy, sent as If-None-Match
+        last_modified: Last-Modified of a previously downloaded copy, sent as If-Modified-Since
+        max_bytes: Byte budget for the body, defaults to the configured download limit
+        deadline: time.monotonic() value by which the download must be done, or None
+        
+    Returns:
+        Dictionary with the status code, the HTML (empty when not modified)
+        and the ETag / Last-Modified validators of the response
+        
+    Raises:
+        UnsupportedContentError: If the response is not HTML
+        DeadlineExceeded: If the deadline passes before the page is downloaded
+    """
+    # Rotate between different user agents to reduce chance of being rate-limited
+    user_agents = [
+        'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/96.0.4664.110 Safari/537.36',
+        'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/15.0 Safari/605.1.15',
+        'Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/94.0.4606.81 Safari/537.36',
+        'Mozilla/5.0 (Windows NT 10.0; Win64; x64; rv:94.0) Gecko/20100101 Firefox/94.0',
+        'Mozilla/5.0 (iPhone; CPU iPhone OS 15_0 like Mac OS X) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/15.0 Mobile/15E148 Safari/604.1'
+    ]
+    
+    headers = {
+        'User-Agent': random.choice(user_agents),
+        'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
+        'Accept-Language': 'en-US,en;q=0.5',
+        'Accept-Encoding': ACCEPT_ENCODING,
+        'Referer': 'https://www.google.com/',
+        'DNT': '1',
+        'Connection': 'keep-alive',
+        'Upgrade-Insecure-Requests': '1',
+        'Cache-Control': 'max-age=0',
+    }
+    
+    if etag:
+        headers['If-None-Match'] = etag
+    if last_modified:
+        headers['If-Modified-Since'] = last_modified
+    
+    # Use the retry function for requests with increased max_retries and longer base delay
+    response = request_with_retry(url, headers=headers, max_retries=5, base_delay=3, stream=True,
+                                  deadline=deadline)
+    try:
+        not_modified = response.status_code == 304
+        html = ""
+        if not not_modified:
+            # Check the type before reading the body so PDFs and binaries are never downloaded
+            content_type = response.headers.get('Content-Type', '')
+            media_type = content_type.split(';')[0].strip().lower()
+            if media_type and media_type not in HTML_CONTENT_TYPES:
+                raise UnsupportedContentError(f"Unsupported content type '{media_type}'")
+            body = read_limited(response, max_bytes if max_bytes is not None else _max_download_bytes,
+                                deadline=deadline)
+            get_telemetry().record_bytes(get_host(url), len(body))
+            html = decode_html(body, content_type)
+    finally:
+        response.close()
+    
+    return {
+        "status_code": response.status_code,
+        "html": html,
+        # A 304 may omit the validators, in which case the old ones still apply
+        "etag": response.headers.get('ETag') or (etag if not_modified else None),
+        "last_modified": response.headers.get('Last-Modified') or (last_modified if not_modified else None),
+    }
+
+def read_limited(response, max_bytes, read_deadline=DEFAULT_READ_DEADLINE, deadline=None):
+    """
+    Read a streamed response body, stopping at a byte budget or a time limit
+    
+    Args:
+        response: Response requested with stream=True
+        max_bytes: Maximum number of bytes to read
+        read_deadline: Maximum number of seconds spent reading
+        deadline: time.monotonic() value by which the whole body must be read, or None
+        
+    Returns:
+        The body bytes that were read
+        
+    Raises:
+        DeadlineExceeded: If the deadline passes before the body is read; a cut-off
+            page would be mistaken for the article
+    """
+    chunks = []
+    size = 0
+    read_until = time.monotonic() + read_deadline
+    for chunk in response.iter_content(chunk_size=64 * 1024):
+        chunks.append(chunk)
+        size += len(chunk)
+        if size >= max_bytes:
+            print(f"Download of {response.url} truncated at {max_bytes} bytes")
+            break
+        if deadline is not None and time.monotonic() >= deadline:
+            raise DeadlineExceeded(f"Deadline reached while downloading {response.url}")
+        if time.monotonic() > read_until:
+            print(f"Download of {response.url} stopped after {read_deadline} seconds")
+            break
+    return b"".join(chunks)[:max_bytes]
+
+def decode_html(body, content_type=""):
+    """
+    Decode HTML bytes using the charset from the Content-Type header or a meta tag
+    
+    Args:
+        body: HTML bytes
+        content_type: Content-Type header of the response
+        
+    Returns:
+        Decoded HTML string; undecodable bytes are replaced
+    """
+    charset = None
+    if 'charset=' in content_type.lower():
+        charset = content_type.lower().split('charset=')[-1].split(';')[0].strip(' "\'')
+    else:
+        match = _META_CHARSET_RE.search(body[:4096])
+        if match:
+            charset = match.group(1).decode('ascii')
+    try:
+        return body.decode(charset or 'utf-8', errors='replace')
+    except LookupError:
+        return body.decode('utf-8', errors='replace')
+
+def download_article(url, etag=None, last_modified=None, deadline=None):
+    """
+    Network half of fetch_article: download a page without parsing it
     
     Args:
         url: URL to fetch content from
+        etag: ETag recorded for the cached copy
+        last_modified: Last-Modified recorded for the cached copy
+        deadline: time.monotonic() value by which the download must be done, or None
         
     Returns:
-        Extracted text content from the URL
+        Dictionary shaped like the result of fetch_article, plus "html" holding
+        the page still to be extracted (None when there is nothing to parse)
+        
+    Raises:
+        CircuitOpenError: If the host has been given up on for this run
+        RateLimitedError: If the host asks for a longer wait than the limiter accepts
+        DeadlineExceeded: If the deadline passes before the page is downloaded
     """
+    result = {"content": "", "etag": None, "last_modified": None, "not_modified": False,
+              "canonical_url": None, "html": None}
     try:
         # Don't process certain problematic URLs
         if "microsoft.com/en-us/investor/" in url:
-            return "Microsoft investor relations content is not available for extraction."
+            result["content"] = "Microsoft investor relations content is not available for extraction."
+            return result
         
-        # Rotate between different user agents to reduce chance of being rate-limited
-        user_agents = [
-            'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/96.0.4664.110 Safari/537.36',
-            'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/15.0 Safari/605.1.15',
-            'Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/94.0.4606.81 Safari/537.36',
-            'Mozilla/5.0 (Windows NT 10.0; Win64; x64; rv:94.0) Gecko/20100101 Firefox/94.0',
-            'Mozilla/5.0 (iPhone; CPU iPhone OS 15_0 like Mac OS X) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/15.0 Mobile/15E148 Safari/604.1'
-        ]
+        page = download_page(url, etag=etag, last_modified=last_modified, deadline=deadline)
+        result["etag"] = page["etag"]
+        result["last_modified"] = page["last_modified"]
+        if page["status_code"] == 304:
+            # Nothing changed, so skip parsing entirely
+            result["not_modified"] = True
+            return result
         
-        headers = {
-            'User-Agent': random.choice(user_agents),
-            'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
-            'Accept-Language': 'en-US,en;q=0.5',
-            'Referer': 'https://www.google.com/',
-            'DNT': '1',
-            'Connection': 'keep-alive',
-            'Upgrade-Insecure-Requests': '1',
-            'Cache-Control': 'max-age=0',
-        }
+        result["html"] = page["html"]
         
-        # Use the retry function for requests with increased max_retries and longer base delay
-        response = request_with_retry(url, headers=headers, max_retries=5, base_delay=3)
+    except (CircuitOpenError, RateLimitedError, DeadlineExceeded):
+        # The article is only skipped for this run; the caller defers it
+        raise
+    except Exception as e:
+        print(f"Error fetching content from {url}: {e}")
+        result["content"] = f"Content extraction failed: {str(e)}"
+    return result
+
+def extract_article(result, url, backend=None, method=None):
+    """
+    CPU half of fetch_article: extract the text of a downloaded page.
+    Safe to run in a worker process.
+    
+    Args:
+        result: Dictionary returned by download_article
+        url: URL the page was downloaded from
+        backend: Parser backend name, defaults to the configured backend
+        method: Extraction method, defaults to the configured method
         
-        # Parse the HTML content
-        soup = BeautifulSoup(response.text, 'html.parser')
+    Returns:
+        The same dictionary with "content", "canonical_url" and "extract_seconds"
+        filled in and "html" removed
+    """
+    html = result.pop("html", None)
+    if html is not None:
+        started = time.perf_counter()
+        try:
+            result["canonical_url"] = find_canonical_url(html, url)
+            result["content"] = extract_article_text(html, url, backend=backend, method=method)
+        except Exception as e:
+            print(f"Error extracting content from {url}: {e}")
+            result["content"] = f"Content extraction failed: {str(e)}"
+        # Measured here because this may run in a worker process; the caller records it
+        result["extract_seconds"] = time.perf_counter() - started
+    return result
+
+def fetch_article(url, etag=None, last_modified=None, deadline=None):
+    """
+    Fetch and extract article content from a URL, revalidating a cached copy
+    when validators are given
+    
+    Args:
+        url: URL to fetch content from
+        etag: ETag recorded for the cached copy
+        last_modified: Last-Modified recorded for the cached copy
+        deadline: time.monotonic() value by which the download must be done, or None
         
-        # Special handling for MSN URLs
-        if 'msn.com' in url:
-            print(f"Special handling for MSN URL: {url}")
-            # Find the main content container in MSN articles
-            article_body = soup.find('div', {'class': ['articlecontent', 'mainarticle', 'contentid', 'primary-content']}) or \
-                          soup.find('div', {'data-testid': ['article-body', 'content-canvas']}) or \
-                          soup.find('article') or \
-                          soup.find('div', {'class': 'article-body'})
-            
-            if article_body:
-                # Process only the article content
-                for element in article_body.find_all(['script', 'style', 'nav', 'aside']):
-                    element.decompose()
-                
-                # Extract paragraphs from the article body
-                paragraphs = article_body.find_all('p')
-                if paragraphs:
-                    return "\n\n".join([p.get_text(strip=True) for p in paragraphs if p.get_text(strip=True)])
-        
-        # Remove script, style, and nav elements for any site
-        for element in soup(['script', 'style', 'nav', 'header', 'footer', 'aside', 'form']):
-            element.decompose()
-        
-        # Try to find the article content using common selectors
-        content_selectors = [
-            'article', '.article', '.post-content', '.story', 'main', '#content', '.content',
-            '.post', '.entry-content', '.article-content', '.article__content', '.article-body'
-        ]
-        
-        article_content = None
-        for selector in content_selectors:
-            elements = soup.select(selector)
-            for element in elements:
-                # Only consider elements with substantial text
-                if len(element.get_text(strip=True)) > 150:
-                    article_content = element
-                    break
-            if article_content:
-                break
-        
-        # If no article content found, try to find all paragraphs
-        if not article_content:
-            paragraphs = soup.find_all('p')
-            if paragraphs:
-                # Only include paragraphs with reasonable length
-                text_paragraphs = [p.get_text(strip=True) for p in paragraphs if len(p.get_text(strip=True)) > 30]
-                if text_paragraphs:
-                    return "\n\n".join(text_paragraphs[:20])  # Limit to first 20 paragraphs
-
-        # Get text from article content if found
-        if article_content:
-            # Extract all paragraphs
-            paragraphs = article_content.find_all('p')
-            if paragraphs:
-                return "\n\n".join([p.get_text(strip=True) for p in paragraphs if p.get_text(strip=True)])
-            else:
-                # Fallback: get all text with paragraph structure
-                text = article_content.get_text(separator='\n', strip=True)
-                # Clean up white spaces but preserve paragraph structure
-                text = '\n\n'.join([' '.join(line.split()) for line in text.split('\n') if line.strip() and len(line) > 30])
-                return text
-                
-        # If no specific content found, use the whole body with cleaning
-        body_text = ""
-        if soup.body:
-            # Get all paragraphs in the body
-            paragraphs = soup.body.find_all('p')
-            if paragraphs:
-                body_text = "\n\n".join([p.get_text(strip=True) for p in paragraphs 
-                                      if len(p.get_text(strip=True)) > 30])
-        
-        # If we still don't have content, use the whole page text as a last resort
-        if not body_text:
-            text = soup.get_text(separator='\n', strip=True)
-            body_text = '\n\n'.join([' '.join(line.split()) for line in text.split('\n') 
-                                 if line.strip() and len(line.strip()) > 30])
-            
-        # Check if we have meaningful content
-        if len(body_text) < 100 or len(body_text.split()) < 20:
-            print(f"Warning: Extracted content is suspiciously short for {url}")
-            # Try a different approach for very short content
-            all_text = soup.get_text(separator=' ', strip=True)
-            if len(all_text) > 200:
-                return all_text[:10000]  # Use raw text as a last resort
-            
-        # Limit the content length
-        return body_text[:10000]
+    Returns:
+        Dictionary with the extracted "content", the "etag" and "last_modified"
+        validators, the page's rel=canonical link as "canonical_url" and
+        "not_modified", which is True when the server answered 304 and the
+        cached copy is still current (content is then empty)
         
-    except Exception as e:
-        print(f"Error fetching content from {url}: {e}")
-        return f"Content extraction failed: {str(e)}"
+    Raises:
+        CircuitOpenError: If the host has been given up on for this run
+        RateLimitedError: If the host asks for a longer wait than the limiter accepts
+        DeadlineExceeded: If the deadline passes before the page is downloaded
+    """
+    return extract_article(download_article(url, etag=etag, last_modified=last_modified, deadline=deadline), url)
+
+def fetch_url_content(url, deadline=None):
+    """
+    Fetch and extract article content from a URL
+    
+    Args:
+        url: URL to fetch content from
+        deadline: time.monotonic() value by which the download must be done, or None
+        
+    Returns:
+        Extracted text content from the URL
+        
+    Raises:
+        CircuitOpenError: If the host has been given up on for this run
+        RateLimitedError: If the host asks for a longer wait than the limiter accepts
+        DeadlineExceeded: If the deadline passes before the page is downloaded
+    """
+    result = fetch_article(url, deadline=deadline)
+    if "extract_seconds" in result:
+        get_telemetry().record_extraction(get_host(url), result["extract_seconds"])
+    return result["content"]